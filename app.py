@@ -1,169 +1,216 @@
-import json
-import sqlite3
-from datetime import datetime
+import uuid
 
 import cv2
 import pandas as pd
 import streamlit as st
-from deepface import DeepFace
-from ultralytics import YOLO
-
-# Load YOLOv8
-model = YOLO("yolov8n.pt")
-
-# Load product catalog
-@st.cache_data
-def load_catalog():
-    with open("catalog.json", "r") as f:
-        return json.load(f)
-
-# DB functions
-def get_all_products():
-    with sqlite3.connect("inventory.db") as conn:
-        return conn.execute("SELECT * FROM products").fetchall()
-
-def get_logs():
-    with sqlite3.connect("inventory.db") as conn:
-        return conn.execute("SELECT * FROM logs ORDER BY log_id DESC").fetchall()
-
-def update_inventory(product_id, direction):
-    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    with sqlite3.connect("inventory.db") as conn:
-        if direction == "in":
-            conn.execute("UPDATE products SET stock = stock + 1 WHERE product_id = ?", (product_id,))
-            conn.execute("INSERT INTO logs (product_id, in_time) VALUES (?, ?)", (product_id, now))
-        else:
-            conn.execute("UPDATE products SET stock = stock - 1 WHERE product_id = ?", (product_id,))
-            conn.execute("INSERT INTO logs (product_id, out_time) VALUES (?, ?)", (product_id, now))
-        conn.commit()
+import streamlit.components.v1 as components
+
+from bulk_import import import_products
+from change_feed import FEED_HOST, FEED_PORT, serve_feed_in_thread
+from db_utils import init_db
+from face_detector import FaceDetector
+from face_tracker import read_mood
+from inference_scheduler import get_scheduler
+from metrics import get_metrics, timer
+from model_registry import get_model, get_registry
+from recommend_cache import get_recommendation_cache
+from scan_pipeline import ScanPipeline
+from ui_panels import (
+    export_logs_panel,
+    inventory_overview,
+    manual_stock_update,
+    recent_logs,
+    scan_panel,
+    scanner_services,
+    stock_movement,
+)
+
+LIVE_FEED_HTML = """
+<div id="status" style="font-family: sans-serif; font-size: 13px; color: #b00"></div>
+<div id="feed" style="font-family: monospace; font-size: 13px; white-space: pre">Waiting for stock changes…</div>
+<script>
+let host = "localhost";
+try { host = window.parent.location.hostname || host; } catch (e) {}
+const url = `http://${host}:__FEED_PORT__/events`;
+const status = document.getElementById("status");
+const rows = [];
+const source = new EventSource(url);
+source.onopen = () => { status.textContent = ""; };
+// EventSource keeps retrying; say why nothing arrives meanwhile
+source.onerror = () => {
+  status.textContent = `Live feed unreachable at ${url}, retrying. The app serves it on __FEED_HOST__; `
+                       + "set FEED_HOST=0.0.0.0 to reach it from other machines.";
+};
+source.addEventListener("stock", (e) => {
+  const c = JSON.parse(e.data);
+  const qty = c.qty > 0 ? `+${c.qty}` : `${c.qty}`;
+  rows.unshift(`${new Date(c.ts).toLocaleTimeString()}  ${qty}  ${c.name || c.product_id}  → ${c.stock}`
+               + (c.low_stock ? "  ⚠️ low" : ""));
+  rows.length = Math.min(rows.length, 20);
+  document.getElementById("feed").textContent = rows.join("\\n");
+});
+</script>
+"""
+RECOMMEND_TOP_K = 5
+
+# Create tables and indexes once per server process
+@st.cache_resource(show_spinner=False)
+def setup_db():
+    init_db()
+
+setup_db()
+
+# Models load on first use and are shared by every session
+@st.cache_resource(show_spinner="Loading model…")
+def load_model(name):
+    return get_model(name)
+
+# Every session's scan pipeline submits to one batching scheduler over the shared detector
+@st.cache_resource(show_spinner="Loading model…")
+def load_scheduler():
+    return get_scheduler()
+
+# Stock change feed (SSE, change_feed.py) for push-updated views; None if
+# the port is already served, e.g. by `python change_feed.py serve`
+@st.cache_resource(show_spinner=False)
+def load_feed_server():
+    try:
+        return serve_feed_in_thread()
+    except OSError:
+        return None
 
 # Page setup
 st.set_page_config(page_title="🧠 Smart Inventory System", layout="wide")
 st.title("📦 Smart Inventory + Emotion Recommender")
 
+# Model load and warm-up timings (models stay unloaded until first use)
+with st.sidebar.expander("🧠 Models"):
+    st.json(get_registry().stats())
+
+with st.sidebar.expander("⚡ Recommendation Cache"):
+    st.json(get_recommendation_cache().metrics())
+
+with st.sidebar.expander("🎛️ Inference Scheduler"):
+    if get_registry().loaded("yolo"):
+        st.json(load_scheduler().stats())
+    else:
+        st.caption("Starts with the first scan.")
+
+# Per-stage latency in this server process (metrics.py); scanner services
+# expose theirs with --metrics-port
+with st.sidebar.expander("⏱️ Performance"):
+    snapshot = get_metrics().snapshot()
+    if snapshot["stages"]:
+        stages = pd.DataFrame.from_dict(snapshot["stages"], orient="index")
+        st.dataframe(stages[["count", "p50_ms", "p95_ms", "p99_ms", "mean_ms"]], use_container_width=True)
+    else:
+        st.caption("No timings recorded yet.")
+    if snapshot["counters"]:
+        st.json(snapshot["counters"])
+    if st.button("Reset", key="reset_metrics"):
+        get_metrics().reset()
+
 # Emotion Detection
 if st.button("🎭 Detect Emotion & Suggest Products"):
     cam = cv2.VideoCapture(0)
-    ret, frame = cam.read()
-    if ret:
-        faces = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml') \
-            .detectMultiScale(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), 1.1, 4)
-        for (x, y, w, h) in faces:
-            face = frame[y:y + h, x:x + w]
-            try:
-                result = DeepFace.analyze(face, actions=['emotion'], enforce_detection=False)
-                emotion = result[0]['dominant_emotion']
-                st.success(f"🧠 Detected Emotion: **{emotion.capitalize()}**")
-
-                st.markdown("### 🛍️ Recommended Products Based on Your Mood")
-                catalog = load_catalog()
-                recommendations = [item for item in catalog if item["emotion"].lower() == emotion.lower()]
-                if recommendations:
-                    for item in recommendations:
-                        with st.container():
-                            col1, col2 = st.columns([1, 3])
-                            with col1:
-                                st.image(item["image"], width=100)
-                            with col2:
-                                st.markdown(f"**[{item['name']}]({item['link']})**")
-                                st.caption(f"Category: _{item['category']}_")
-                else:
-                    st.warning("No recommendations found for this emotion.")
-                break
-            except Exception as e:
-                st.error(f"Error: {e}")
+    try:
+        # A short burst of frames, each face smoothed over it (face_tracker.read_mood);
+        # downscaled search with the configured backend (FACE_DETECTOR / FACE_SCALE)
+        # and one batched emotion pass per frame
+        with timer("app.mood"):
+            mood, results = read_mood(cam, FaceDetector(), load_model("emotion"))
+    except IOError as e:
+        st.error(str(e))
+        mood = None
+    except Exception as e:
+        st.error(f"Error: {e}")
+        mood = None
     else:
-        st.error("Failed to capture from camera.")
-    cam.release()
+        if mood is None:
+            st.warning("No face detected.")
+    finally:
+        cam.release()
+
+    if mood:
+        st.success(f"🧠 Detected Emotion: **{mood['dominant_emotion'].capitalize()}**")
+        if len(results) > 1:
+            st.caption("Faces: " + ", ".join(r['dominant_emotion'] for r in results))
+
+        st.markdown("### 🛍️ Recommended Products Based on Your Mood")
+        # Scored on the smoothed emotion distribution of every visible face with
+        # out-of-stock items left out; cached per emotion bucket until stock or
+        # the catalog changes
+        with timer("app.recommend"):
+            recommendations = get_recommendation_cache().recommend(mood["emotion"], k=RECOMMEND_TOP_K)
+        if recommendations:
+            for item in recommendations:
+                with st.container():
+                    col1, col2 = st.columns([1, 3])
+                    with col1:
+                        st.image(item["image"], width=100)
+                    with col2:
+                        st.markdown(f"**[{item['name']}]({item['link']})**")
+                        st.caption(f"Category: _{item['category']}_")
+        else:
+            st.warning("No recommendations found for this emotion.")
 
 st.markdown("---")
 
 # --- Persistent State for Scanning ---
 if "scanning" not in st.session_state:
     st.session_state.scanning = False
-if "detected" not in st.session_state:
-    st.session_state.detected = []
-if "cap" not in st.session_state:
-    st.session_state.cap = None
+if "pipeline" not in st.session_state:
+    st.session_state.pipeline = None
 
 # Start scanning
 if st.button("📦 Start Product Scanning", key="start_scan") and not st.session_state.scanning:
-    st.session_state.cap = cv2.VideoCapture(0)
+    scheduler = load_scheduler()
+    st.session_state.pipeline = ScanPipeline(
+        scheduler.detector, scheduler=scheduler, name=f"session-{uuid.uuid4().hex[:8]}"
+    ).start()
     st.session_state.scanning = True
-    st.session_state.detected = []
 
 if st.session_state.scanning:
-    cap = st.session_state.cap
-    detected = st.session_state.detected
-
-    ret, frame = cap.read()
-    if ret:
-        results = model.predict(frame, verbose=False)
-        names = model.names
-        classes = results[0].boxes.cls.cpu().numpy().astype(int)
-
-        for cls in classes:
-            name = names[cls]
-            if name not in detected:
-                detected.append(name)
-                with sqlite3.connect("inventory.db") as conn:
-                    row = conn.execute("SELECT * FROM products WHERE LOWER(name) = ?", (name.lower(),)).fetchone()
-                    if row:
-                        update_inventory(row[0], "in")
-                        st.success(f"✅ {name} stock increased.")
-                    else:
-                        st.warning(f"⚠️ {name} not found. Add manually.")
-
-        st.image(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB), channels="RGB")
-    else:
-        st.error("📷 Failed to read from camera.")
+    scan_panel()
 
     if st.button("🛑 Stop Scanning", key="stop_scan"):
-        cap.release()
-        cv2.destroyAllWindows()
+        st.session_state.pipeline.stop()
+        load_scheduler().forget(st.session_state.pipeline.name)
         st.session_state.scanning = False
-        st.session_state.cap = None
+        st.session_state.pipeline = None
+
+scanner_services()
 
 st.markdown("---")
 
-# Inventory Overview
-st.subheader("📊 Inventory Overview")
-if st.button("🔁 Refresh"):
-    st.rerun()
-
-products = get_all_products()
-low_stock = []
-
-for pid, name, stock, cat, threshold in products:
-    st.markdown(f"**{name}** ({cat}) — Stock: `{stock}`")
-    if stock <= threshold:
-        low_stock.append(name)
-
-if low_stock:
-    st.error(f"🚨 Low stock: {', '.join(low_stock)}")
-
-# Manual Update
-st.subheader("🛠️ Manual Stock Update")
-product_names = [p[1] for p in products]
-selected = st.selectbox("Select Product", product_names)
-pid = next((p[0] for p in products if p[1] == selected), None)
-
-col1, col2 = st.columns(2)
-with col1:
-    if st.button("➕ Add 1"):
-        update_inventory(pid, "in")
-        st.success(f"{selected} stock increased")
-with col2:
-    if st.button("➖ Remove 1"):
-        update_inventory(pid, "out")
-        st.success(f"{selected} stock decreased")
-
-# Logs
-st.subheader("📜 Recent Logs")
-logs = get_logs()
-log_df = pd.DataFrame(logs, columns=["Log ID", "Product ID", "In Time", "Out Time"])
-st.dataframe(log_df)
-
-if st.button("⬇ Export Logs to CSV"):
-    log_df.to_csv("logs_export.csv", index=False)
-    st.success("Exported as logs_export.csv")
+inventory_overview()
+
+stock_movement()
+
+# Bulk upsert into products, chunk by chunk; bad rows go to a rejects file
+with st.expander("📥 Import Products"):
+    upload = st.file_uploader("CSV or Parquet with product_id, name and optionally category, stock, threshold",
+                              type=["csv", "parquet"])
+    if upload is not None and st.button("📥 Import"):
+        try:
+            result = import_products(upload, rejects="products_import.rejects.csv")
+        except ValueError as e:
+            st.error(str(e))
+        else:
+            st.success(f"Imported {result['upserted']} rows ({result['changed']} changed) "
+                       f"in {result['seconds']}s, {result['rows_per_sec']} rows/s")
+            if result["rejected"]:
+                st.warning(f"{result['rejected']} rows rejected, see {result['rejects_path']}")
+
+manual_stock_update()
+
+recent_logs()
+
+# Pushed by the change feed as stock events are written, from any process;
+# no page rerun or table query involved
+with st.expander("📡 Live Stock Feed"):
+    load_feed_server()
+    html = LIVE_FEED_HTML.replace("__FEED_PORT__", str(FEED_PORT)).replace("__FEED_HOST__", FEED_HOST)
+    components.html(html, height=260, scrolling=True)
+
+export_logs_panel()
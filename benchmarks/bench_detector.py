@@ -0,0 +1,89 @@
+# benchmarks/bench_detector.py
+# CPU throughput of the object detector per backend. Each weights file is
+# loaded with its backend (by extension, see detector.py) and run over the
+# same frames: load time, latency percentiles and frames per second.
+#
+#   python detector.py export --format onnx
+#   python detector.py export --format openvino
+#   python -m benchmarks.bench_detector --weights yolov8n.pt yolov8n.onnx yolov8n_openvino_model
+#   python -m benchmarks.bench_detector --weights yolov8n.onnx --source recordings/shelf.mp4 --threads 4
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from detector import DETECTOR_IMGSZ, backend_for, load_detector
+
+
+def load_frames(source, max_frames, rng):
+    if source is None:
+        return [rng.integers(0, 256, (480, 640, 3), dtype=np.uint8) for _ in range(max_frames)]
+    from frame_source import iter_frames
+
+    frames = []
+    for frame in iter_frames(source):
+        if len(frames) >= max_frames:
+            break
+        frames.append(frame)
+    return frames
+
+
+def bench(weights, frames, args):
+    options = {"imgsz": args.imgsz}
+    if backend_for(weights) != "torch":
+        options["threads"] = args.threads
+    started = time.perf_counter()
+    detector = load_detector(weights, **options)
+    load_ms = (time.perf_counter() - started) * 1000
+
+    for frame in frames[:args.warmup]:
+        detector.detect(frame)
+
+    timings, boxes = [], 0
+    for frame in frames:
+        started = time.perf_counter()
+        detections = detector.detect(frame)
+        timings.append((time.perf_counter() - started) * 1000)
+        boxes += len(detections.conf)
+
+    timings.sort()
+    return {
+        "weights": weights,
+        "backend": detector.backend,
+        "load_ms": round(load_ms, 1),
+        "p50_ms": round(timings[len(timings) // 2], 2),
+        "p95_ms": round(timings[int(0.95 * (len(timings) - 1))], 2),
+        "fps": round(1000 * len(timings) / sum(timings), 1),
+        "detections_per_frame": round(boxes / len(frames), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Object detector CPU throughput per backend")
+    parser.add_argument("--weights", nargs="+", required=True, help=".pt, .onnx, .xml or *_openvino_model")
+    parser.add_argument("--source", help="video file or image directory (default: random frames)")
+    parser.add_argument("--max-frames", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--imgsz", type=int, default=DETECTOR_IMGSZ)
+    parser.add_argument("--threads", type=int, default=0, help="intra-op threads for ONNX Runtime / OpenVINO")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    frames = load_frames(args.source, args.max_frames, np.random.default_rng(args.seed))
+    if not frames:
+        raise SystemExit(f"No frames read from {args.source}")
+
+    report = {
+        "source": args.source or "random",
+        "frames": len(frames),
+        "imgsz": args.imgsz,
+        "threads": args.threads or os.cpu_count(),
+        "results": [bench(weights, frames, args) for weights in args.weights],
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# benchmarks/bench_emotion.py
+# Faces/second for emotion inference on CPU: one DeepFace.analyze call per
+# face versus one EmotionBatcher forward pass per frame.
+#
+#   python -m benchmarks.bench_emotion --faces 1 4 16 --frames 20
+import argparse
+import json
+import time
+
+import numpy as np
+from deepface import DeepFace
+
+from emotion_batch import EmotionBatcher
+
+
+def synthetic_frame(faces, rng, size=96):
+    cols = int(np.ceil(np.sqrt(faces)))
+    frame = rng.integers(0, 255, (cols * size, cols * size, 3), dtype=np.uint8)
+    boxes = [((i % cols) * size, (i // cols) * size, size, size) for i in range(faces)]
+    return frame, boxes
+
+
+def per_face(frame, boxes):
+    for x, y, w, h in boxes:
+        DeepFace.analyze(frame[y:y + h, x:x + w], actions=['emotion'], enforce_detection=False, silent=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Emotion inference faces/second")
+    parser.add_argument("--faces", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--frames", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    batcher = EmotionBatcher()
+    report = []
+
+    for faces in args.faces:
+        frame, boxes = synthetic_frame(faces, rng)
+        # Warm up both paths so graph building is not timed
+        per_face(frame, boxes[:1])
+        batcher.analyze_frame(frame, boxes)
+
+        start = time.perf_counter()
+        for _ in range(args.frames):
+            per_face(frame, boxes)
+        sequential = faces * args.frames / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for _ in range(args.frames):
+            batcher.analyze_frame(frame, boxes)
+        batched = faces * args.frames / (time.perf_counter() - start)
+
+        report.append({
+            "faces_per_frame": faces,
+            "per_face_faces_per_sec": round(sequential, 1),
+            "batched_faces_per_sec": round(batched, 1),
+            "speedup": round(batched / sequential, 2),
+        })
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
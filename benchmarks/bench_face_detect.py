@@ -0,0 +1,109 @@
+# benchmarks/bench_face_detect.py
+# Face detection latency vs recall on recorded footage. The reference is the
+# old path: the chosen backend over every full-resolution frame. Each
+# FaceDetector configuration (downscale, ROI search, frame skipping) is
+# scored against it on the same frames.
+#
+#   python -m benchmarks.bench_face_detect --source recordings/kiosk.mp4
+#   python -m benchmarks.bench_face_detect --source frames/ --backend dnn --scales 1 0.5 0.35
+import argparse
+import itertools
+import json
+import time
+
+import cv2
+
+from face_detector import FaceDetector, make_backend
+from object_tracker import corners, iou_matrix
+
+
+def load_frames(source, max_frames):
+    from frame_source import iter_frames
+
+    frames = []
+    for frame in iter_frames(source):
+        if len(frames) >= max_frames:
+            break
+        frames.append((frame, cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)))
+    return frames
+
+
+def run(detector, frames):
+    boxes, timings = [], []
+    for frame, gray in frames:
+        started = time.perf_counter()
+        boxes.append(detector.detect(frame, gray))
+        timings.append((time.perf_counter() - started) * 1000)
+    return boxes, timings
+
+
+# Share of reference faces matched (IoU >= threshold) and of detections that match one
+def score(reference, found, threshold):
+    matched_ref = matched_found = total_ref = total_found = 0
+    for ref, got in zip(reference, found):
+        total_ref += len(ref)
+        total_found += len(got)
+        matches = iou_matrix(corners(ref), corners(got)) >= threshold
+        matched_ref += int(matches.any(axis=1).sum())
+        matched_found += int(matches.any(axis=0).sum())
+    return (
+        round(matched_ref / total_ref, 3) if total_ref else 1.0,
+        round(matched_found / total_found, 3) if total_found else 1.0,
+    )
+
+
+def latency(timings):
+    ordered = sorted(timings)
+    return {
+        "mean_ms": round(sum(ordered) / len(ordered), 3),
+        "p95_ms": round(ordered[int(0.95 * (len(ordered) - 1))], 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Face detection latency vs recall")
+    parser.add_argument("--source", required=True, help="video file or image directory")
+    parser.add_argument("--backend", default="haar", choices=["haar", "dnn"])
+    parser.add_argument("--max-frames", type=int, default=300)
+    parser.add_argument("--scales", type=float, nargs="+", default=[1.0, 0.75, 0.5])
+    parser.add_argument("--detect-every", type=int, nargs="+", default=[1, 2, 3])
+    parser.add_argument("--iou", type=float, default=0.4, help="IoU for a detection to match the reference")
+    args = parser.parse_args()
+
+    frames = load_frames(args.source, args.max_frames)
+    if not frames:
+        raise SystemExit(f"No frames read from {args.source}")
+    backend = make_backend(args.backend)
+
+    reference, ref_timings = run(
+        FaceDetector(backend, scale=1.0, detect_every=1, roi_margin=-1), frames
+    )
+    report = {
+        "source": args.source,
+        "backend": args.backend,
+        "frames": len(frames),
+        "reference_faces": sum(len(r) for r in reference),
+        "reference": latency(ref_timings),
+        "configs": [],
+    }
+
+    for scale, every, roi in itertools.product(args.scales, args.detect_every, (False, True)):
+        detector = FaceDetector(backend, scale=scale, detect_every=every, roi_margin=0.5 if roi else -1)
+        found, timings = run(detector, frames)
+        recall, precision = score(reference, found, args.iou)
+        report["configs"].append({
+            "scale": scale,
+            "detect_every": every,
+            "roi": roi,
+            **latency(timings),
+            "speedup": round(sum(ref_timings) / sum(timings), 2) if sum(timings) else None,
+            "recall": recall,
+            "precision": precision,
+            "searched_fraction": detector.stats()["searched_fraction"],
+        })
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
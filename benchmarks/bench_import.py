@@ -0,0 +1,73 @@
+# benchmarks/bench_import.py
+# Product import throughput: bulk_import.import_products over a synthetic
+# CSV and Parquet catalog, first load and re-import, versus saving rows one
+# at a time with db_utils.save_product (timed on a sample and extrapolated).
+#
+#   python -m benchmarks.bench_import --rows 1000000
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+
+def write_catalog(directory, rows, seed):
+    import pandas as pd
+
+    rng = random.Random(seed)
+    frame = pd.DataFrame({
+        "Product ID": [f"P{i:08d}" for i in range(rows)],
+        "Product Name": [f"Item {i}" for i in range(rows)],
+        "Category": [rng.choice(["Dairy", "Bakery", "Snacks", "Beverage"]) for _ in range(rows)],
+        "Stock": [rng.randint(0, 100) for _ in range(rows)],
+        "Reorder Level": [rng.randint(0, 10) for _ in range(rows)],
+    })
+    csv_path = os.path.join(directory, "catalog.csv")
+    frame.to_csv(csv_path, index=False)
+    # The Parquet copy gets its own IDs so it is a first load too
+    parquet_path = os.path.join(directory, "catalog.parquet")
+    try:
+        frame.assign(**{"Product ID": "Q" + frame["Product ID"].str[1:]}).to_parquet(parquet_path, index=False)
+    except ImportError:
+        parquet_path = None
+    return frame, csv_path, parquet_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk product import throughput")
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--sample", type=int, default=5000, help="rows saved one at a time for the baseline")
+    parser.add_argument("--chunk-rows", type=int, default=50000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="bench_import_")
+    # Point the store at a scratch database before it is first imported
+    os.environ["INVENTORY_DB"] = os.path.join(directory, "inventory.db")
+    from bulk_import import import_products
+    from db_utils import init_db, save_product
+
+    init_db()
+    frame, csv_path, parquet_path = write_catalog(directory, args.rows, args.seed)
+    report = {"rows": args.rows, "chunk_rows": args.chunk_rows}
+
+    started = time.perf_counter()
+    for row in frame.head(args.sample).itertuples(index=False):
+        save_product(f"S{row[0]}", row[1], row[2], int(row[3]), int(row[4]))
+    per_row = (time.perf_counter() - started) / args.sample
+    report["row_by_row"] = {
+        "rows_per_sec": round(1 / per_row),
+        "estimated_seconds": round(per_row * args.rows, 1),
+    }
+
+    report["csv_first_load"] = import_products(csv_path, chunk_rows=args.chunk_rows)
+    report["csv_reimport"] = import_products(csv_path, chunk_rows=args.chunk_rows)
+    if parquet_path:
+        report["parquet_first_load"] = import_products(parquet_path, chunk_rows=args.chunk_rows)
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
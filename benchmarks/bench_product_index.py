@@ -0,0 +1,90 @@
+# benchmarks/bench_product_index.py
+# Detection-label -> product_id resolution at catalog scale: the old
+# LOWER(name) table scan, the NOCASE index, and the in-memory ProductIndex.
+#
+#   python -m benchmarks.bench_product_index --products 100000
+import argparse
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from inventory_store import ConnectionPool
+from product_index import ProductIndex
+
+
+def make_db(path, products):
+    with sqlite3.connect(path) as conn:
+        conn.execute('''CREATE TABLE products (
+            product_id TEXT PRIMARY KEY,
+            name TEXT,
+            stock INTEGER,
+            category TEXT,
+            threshold INTEGER DEFAULT 2
+        )''')
+        conn.execute("CREATE TABLE product_names_version (id INTEGER PRIMARY KEY, version INTEGER NOT NULL)")
+        conn.execute("INSERT INTO product_names_version VALUES (1, 0)")
+        conn.executemany(
+            "INSERT INTO products VALUES (?, ?, 0, 'Bench', 2)",
+            ((f"P{i:07d}", f"Item {i}") for i in range(products)),
+        )
+
+
+def per_lookup_us(fn, labels):
+    start = time.perf_counter()
+    for label in labels:
+        fn(label)
+    return (time.perf_counter() - start) / len(labels) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Product name resolution latency")
+    parser.add_argument("--products", type=int, default=100000)
+    parser.add_argument("--lookups", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    # Mix of hits in detector casing and misses (e.g. "person")
+    labels = [f"item {rng.randrange(args.products)}" if rng.random() < 0.8 else "person"
+              for _ in range(args.lookups)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        make_db(path, args.products)
+        pool = ConnectionPool(path, size=1)
+
+        def scan(label):
+            with pool.connection() as conn:
+                return conn.execute("SELECT * FROM products WHERE LOWER(name) = ?", (label.lower(),)).fetchone()
+
+        def nocase(label):
+            with pool.connection() as conn:
+                return conn.execute("SELECT product_id FROM products WHERE name = ? COLLATE NOCASE", (label,)).fetchone()
+
+        # The scan is slow enough that a few hundred lookups are representative
+        scan_us = per_lookup_us(scan, labels[:200])
+
+        with pool.connection() as conn:
+            conn.execute("CREATE INDEX idx_products_name_nocase ON products (name COLLATE NOCASE)")
+        nocase_us = per_lookup_us(nocase, labels)
+
+        index = ProductIndex(pool=pool)
+        start = time.perf_counter()
+        index.resolve("warm up")
+        load_ms = (time.perf_counter() - start) * 1000
+        index_us = per_lookup_us(index.resolve, labels)
+        pool.close()
+
+    print(json.dumps({
+        "products": args.products,
+        "lower_scan_us": round(scan_us, 2),
+        "nocase_index_us": round(nocase_us, 2),
+        "product_index_load_ms": round(load_ms, 1),
+        "product_index_us": round(index_us, 3),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
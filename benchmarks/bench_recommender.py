@@ -0,0 +1,75 @@
+# benchmarks/bench_recommender.py
+# Recommendation latency at catalog scale: the old list comprehension over
+# the catalog for the dominant label versus the Recommender's matrix scoring
+# of the full emotion distribution with the out-of-stock filter.
+#
+#   python -m benchmarks.bench_recommender --items 100000
+import argparse
+import json
+import random
+import time
+
+from recommender import EMOTIONS, Recommender
+
+
+def make_catalog(items, rng):
+    return [
+        {"name": f"Item {i}", "category": "Bench", "emotion": rng.choice(EMOTIONS)}
+        for i in range(items)
+    ]
+
+
+def random_emotion(rng):
+    weights = [rng.random() ** 3 for _ in EMOTIONS]
+    total = sum(weights)
+    return {label: 100 * w / total for label, w in zip(EMOTIONS, weights)}
+
+
+def per_call_us(fn, emotions):
+    timings = []
+    for emotion in emotions:
+        start = time.perf_counter()
+        fn(emotion)
+        timings.append((time.perf_counter() - start) * 1e6)
+    timings.sort()
+    return {
+        "p50_us": round(timings[len(timings) // 2], 1),
+        "p99_us": round(timings[int(len(timings) * 0.99)], 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recommendation latency")
+    parser.add_argument("--items", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    catalog = make_catalog(args.items, rng)
+    emotions = [random_emotion(rng) for _ in range(args.queries)]
+
+    start = time.perf_counter()
+    recommender = Recommender(catalog)
+    recommender.apply_stock((f"P{i:07d}", f"Item {i}", rng.randint(0, 3)) for i in range(args.items))
+    build_ms = (time.perf_counter() - start) * 1000
+
+    # The app's previous recommender: dominant label only, no stock filter
+    def legacy(emotion):
+        dominant = max(emotion, key=emotion.get)
+        return [item for item in catalog if item["emotion"].lower() == dominant.lower()]
+
+    print(json.dumps({
+        "items": args.items,
+        "k": args.k,
+        "build_ms": round(build_ms, 1),
+        "legacy": per_call_us(legacy, emotions),
+        "recommender": per_call_us(lambda e: recommender.recommend(e, args.k), emotions),
+        "recommender_label": per_call_us(
+            lambda e: recommender.recommend(max(e, key=e.get), args.k), emotions
+        ),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
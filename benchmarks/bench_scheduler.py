@@ -0,0 +1,95 @@
+# benchmarks/bench_scheduler.py
+# Multi-camera throughput with one shared detector: every camera calling
+# detect() on its own frames in turn (the old one-frame-at-a-time path)
+# versus all cameras submitting to the batching InferenceScheduler. One
+# camera can be made "busy" (submitting without waiting for results) to
+# check that the others keep their share.
+#
+#   python -m benchmarks.bench_scheduler --weights yolov8n.onnx --cameras 8
+#   python -m benchmarks.bench_scheduler --weights yolov8n.pt --cameras 4 --max-batch 4 --busy
+import argparse
+import json
+import threading
+import time
+
+import numpy as np
+
+from detector import DETECTOR_IMGSZ, load_detector
+from inference_scheduler import InferenceScheduler
+
+
+def sequential(detector, frames, cameras, seconds):
+    lock = threading.Lock()
+    counts = [0] * cameras
+
+    def camera(i):
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            with lock:
+                detector.detect(frames[i % len(frames)])
+            counts[i] += 1
+
+    threads = [threading.Thread(target=camera, args=(i,)) for i in range(cameras)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return {"fps": round(sum(counts) / seconds, 1), "per_camera": counts}
+
+
+def scheduled(detector, frames, cameras, seconds, args):
+    scheduler = InferenceScheduler(detector, args.max_batch, args.max_wait_ms).start()
+    deadline = time.monotonic() + seconds
+
+    def camera(i):
+        while time.monotonic() < deadline:
+            scheduler.detect(f"cam{i}", frames[i % len(frames)])
+
+    def busy():
+        while time.monotonic() < deadline:
+            scheduler.submit("busy", frames[0])
+            time.sleep(0.001)
+
+    threads = [threading.Thread(target=camera, args=(i,)) for i in range(cameras)]
+    if args.busy:
+        threads.append(threading.Thread(target=busy))
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    scheduler.stop()
+
+    stats = scheduler.stats()
+    served = sum(source["processed"] for name, source in stats["sources"].items() if name != "busy")
+    return {"fps": round(served / seconds, 1), **stats}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared-detector throughput across cameras")
+    parser.add_argument("--weights", required=True)
+    parser.add_argument("--cameras", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--max-batch", type=int, default=8)
+    parser.add_argument("--max-wait-ms", type=float, default=15.0)
+    parser.add_argument("--imgsz", type=int, default=DETECTOR_IMGSZ)
+    parser.add_argument("--busy", action="store_true", help="add a camera that floods the scheduler")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    frames = [rng.integers(0, 256, (480, 640, 3), dtype=np.uint8) for _ in range(args.cameras)]
+    detector = load_detector(args.weights, imgsz=args.imgsz)
+    detector.detect(frames[0])
+
+    report = {
+        "weights": args.weights,
+        "backend": detector.backend,
+        "detector_max_batch": detector.max_batch,
+        "cameras": args.cameras,
+        "sequential": sequential(detector, frames, args.cameras, args.seconds),
+        "scheduled": scheduled(detector, frames, args.cameras, args.seconds, args),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+# benchmarks/bench_schema.py
+# Event-log schema before and after the compact migration (migrations.py v2):
+# bytes per row, insert rate and query time on synthetic events, plus the
+# time to migrate the legacy database in place.
+#
+#   python -m benchmarks.bench_schema --events 10000000
+import argparse
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from migrations import MIGRATIONS, migrate
+
+BATCH = 10000
+# Events spread evenly over --days, starting 2024-01-01 local time
+START_MS = int(time.mktime((2024, 1, 1, 0, 0, 0, 0, 0, -1)) * 1000)
+
+
+def connect(path):
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def make_products(conn, products):
+    conn.executemany(
+        "INSERT INTO products VALUES (?, ?, 0, 'Bench', 2)",
+        [(f"P{i:05d}", f"item {i}") for i in range(products)],
+    )
+
+
+def synthetic(events, products, days, seed=0):
+    rng = random.Random(seed)
+    step = max(1, days * 86400000 // events)
+    ts = START_MS
+    for _ in range(events):
+        ts += rng.randint(0, 2 * step)
+        yield rng.randrange(products), ts, 1 if rng.random() < 0.55 else -1
+
+
+def batches(rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == BATCH:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def insert(conn, rows, to_params, sql):
+    started = time.perf_counter()
+    count = 0
+    for batch in batches(rows):
+        conn.execute("BEGIN")
+        conn.executemany(sql, [to_params(row) for row in batch])
+        conn.execute("COMMIT")
+        count += len(batch)
+    return count / (time.perf_counter() - started)
+
+
+# The write path as it was: TEXT product_id, strftime per event, one of two columns
+def legacy_params(row):
+    product, ts, qty = row
+    stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts / 1000))
+    return (f"P{product:05d}", stamp if qty > 0 else None, stamp if qty < 0 else None)
+
+
+def compact_params(row):
+    product, ts, qty = row
+    return (product + 1, ts, qty)
+
+
+def size_report(conn, table, rows):
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    file_bytes = conn.execute("PRAGMA page_count").fetchone()[0] * page_size
+    report = {"file_mb": round(file_bytes / 1e6, 1), "file_bytes_per_row": round(file_bytes / rows, 1)}
+    try:
+        (table_bytes,) = conn.execute("SELECT SUM(pgsize) FROM dbstat WHERE name = ?", (table,)).fetchone()
+        report["table_bytes_per_row"] = round(table_bytes / rows, 1)
+    except sqlite3.OperationalError:
+        pass  # SQLite built without dbstat
+    return report
+
+
+def time_query(conn, sql, params, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        conn.execute(sql, params).fetchall()
+        timings.append((time.perf_counter() - started) * 1000)
+    return round(min(timings), 2)
+
+
+def day(offset):
+    return START_MS + offset * 86400000
+
+
+def stamp(ms):
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ms / 1000))
+
+
+def legacy_queries(conn):
+    week = (stamp(day(1)), stamp(day(8)))
+    return {
+        "product_week_ms": time_query(
+            conn,
+            "SELECT COUNT(in_time), COUNT(out_time) FROM logs WHERE product_id = ? "
+            "AND ((in_time >= ? AND in_time < ?) OR (out_time >= ? AND out_time < ?))",
+            ("P00007", *week, *week),
+        ),
+        "one_day_ms": time_query(
+            conn,
+            "SELECT product_id, COUNT(in_time), COUNT(out_time) FROM logs "
+            "WHERE (in_time >= ? AND in_time < ?) OR (out_time >= ? AND out_time < ?) GROUP BY product_id",
+            (stamp(day(2)), stamp(day(3)), stamp(day(2)), stamp(day(3))),
+        ),
+        "totals_ms": time_query(
+            conn, "SELECT product_id, COUNT(in_time), COUNT(out_time) FROM logs GROUP BY product_id", (), repeat=1
+        ),
+    }
+
+
+def compact_queries(conn):
+    return {
+        "product_week_ms": time_query(
+            conn,
+            "SELECT SUM(MAX(qty, 0)), SUM(MAX(-qty, 0)) FROM events WHERE product_key = ? AND ts >= ? AND ts < ?",
+            (8, day(1), day(8)),
+        ),
+        "one_day_ms": time_query(
+            conn,
+            "SELECT product_key, SUM(MAX(qty, 0)), SUM(MAX(-qty, 0)) FROM events "
+            "WHERE ts >= ? AND ts < ? GROUP BY product_key",
+            (day(2), day(3)),
+        ),
+        "totals_ms": time_query(
+            conn, "SELECT product_key, SUM(MAX(qty, 0)), SUM(MAX(-qty, 0)) FROM events GROUP BY product_key", (),
+            repeat=1,
+        ),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Event-log schema size, insert rate and query time")
+    parser.add_argument("--events", type=int, default=10_000_000)
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=90, help="time span of the synthetic events")
+    parser.add_argument("--no-migrate", action="store_true", help="skip timing the in-place migration")
+    args = parser.parse_args()
+
+    report = {"events": args.events, "products": args.products, "days": args.days}
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy = connect(os.path.join(tmp, "legacy.db"))
+        MIGRATIONS[0][2](legacy)  # baseline schema only
+        make_products(legacy, args.products)
+        rate = insert(
+            legacy, synthetic(args.events, args.products, args.days), legacy_params,
+            "INSERT INTO logs (product_id, in_time, out_time) VALUES (?, ?, ?)",
+        )
+        legacy.execute("ANALYZE")
+        report["legacy"] = {
+            "inserts_per_sec": round(rate, 1),
+            **size_report(legacy, "logs", args.events),
+            **legacy_queries(legacy),
+        }
+
+        compact = connect(os.path.join(tmp, "compact.db"))
+        compact.execute("BEGIN")
+        migrate(compact)
+        make_products(compact, args.products)
+        compact.execute("INSERT INTO product_keys (product_id) SELECT product_id FROM products ORDER BY product_id")
+        compact.execute("COMMIT")
+        rate = insert(
+            compact, synthetic(args.events, args.products, args.days), compact_params,
+            "INSERT INTO events (product_key, ts, qty) VALUES (?, ?, ?)",
+        )
+        compact.execute("ANALYZE")
+        report["compact"] = {
+            "inserts_per_sec": round(rate, 1),
+            **size_report(compact, "events", args.events),
+            **compact_queries(compact),
+        }
+        compact.close()
+
+        if not args.no_migrate:
+            started = time.perf_counter()
+            legacy.execute("BEGIN")
+            migrate(legacy)
+            legacy.execute("COMMIT")
+            report["migrate_seconds"] = round(time.perf_counter() - started, 2)
+        legacy.close()
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# benchmarks/bench_store.py
+# Sustained stock updates per second through the shipping code path:
+# db_utils.update_stock on the pooled WAL store, against a scratch database
+# migrated to the current schema. The baseline runs the same statements
+# (db_utils._move_stock) on a per-call sqlite3.connect to a copy of that
+# database in rollback-journal mode, as the app did before the shared store.
+#
+#   python -m benchmarks.bench_store --updates 5000 --threads 4
+import argparse
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+PRODUCTS = 100
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Stock update throughput, per-call connections vs the pooled store")
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--synchronous", default="NORMAL")
+    return parser.parse_args(argv)
+
+
+def make_products(pool):
+    with pool.transaction() as conn:
+        conn.executemany(
+            "INSERT INTO products VALUES (?, ?, 0, 'Bench', 2)",
+            [(f"P{i:05d}", f"item {i}") for i in range(PRODUCTS)],
+        )
+
+
+# Copy of the migrated database in rollback-journal mode
+def make_baseline(pool, path):
+    with pool.connection() as src:
+        dst = sqlite3.connect(path)
+        src.backup(dst)
+        dst.execute("PRAGMA journal_mode = DELETE")
+        dst.close()
+
+
+# The update path as it was before the shared store, on the current schema
+def per_call_update(path, product_id):
+    from db_utils import _move_stock
+
+    conn = sqlite3.connect(path)
+    try:
+        with conn:
+            _move_stock(conn, product_id, "in")
+    finally:
+        conn.close()
+
+
+def run(update, updates, threads):
+    per_thread = updates // threads
+
+    def worker(offset):
+        for i in range(per_thread):
+            update(f"P{(offset + i) % PRODUCTS:05d}")
+
+    workers = [threading.Thread(target=worker, args=(t * 7,)) for t in range(threads)]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - start
+    return per_thread * threads / elapsed
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # The store reads its settings at import time
+        os.environ["INVENTORY_DB"] = os.path.join(tmp, "inventory.db")
+        os.environ["INVENTORY_DB_POOL_SIZE"] = str(max(args.threads, 1))
+        os.environ["INVENTORY_DB_SYNCHRONOUS"] = args.synchronous
+
+        from db_utils import init_db, update_stock
+        from inventory_store import close_pools, get_pool
+
+        init_db()
+        make_products(get_pool())
+        baseline_path = os.path.join(tmp, "baseline.db")
+        make_baseline(get_pool(), baseline_path)
+
+        try:
+            before = run(lambda pid: per_call_update(baseline_path, pid), args.updates, args.threads)
+            after = run(lambda pid: update_stock(pid, "in"), args.updates, args.threads)
+        finally:
+            close_pools()
+
+    print(json.dumps({
+        "updates": args.updates,
+        "threads": args.threads,
+        "synchronous": args.synchronous,
+        "before_updates_per_sec": round(before, 1),
+        "after_updates_per_sec": round(after, 1),
+        "speedup": round(after / before, 2),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+# benchmarks/replay.py
+# Replays a recorded video file or frame directory through the same code the
+# app uses and reports per-stage latency percentiles, FPS, peak RSS and DB
+# writes/sec as JSON. Detection runs through scan_pipeline.ScanPipeline, as
+# the app and scanner_service.py do; stage timings come from metrics.py. Runs
+# CPU-only without a camera, against a scratch copy of the database unless
+# --db is given.
+#
+#   python -m benchmarks.replay --source recordings/aisle3.mp4
+#   python -m benchmarks.replay --source frames/ --pipelines emotion --max-frames 300
+import argparse
+import json
+import os
+import resource
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline replay benchmark")
+    parser.add_argument("--source", required=True, help="video file or image directory")
+    parser.add_argument("--pipelines", nargs="+", choices=["detection", "emotion"],
+                        default=["detection", "emotion"])
+    parser.add_argument("--max-frames", type=int, default=0, help="0 = whole recording")
+    parser.add_argument("--count-mode", choices=["line", "all"], default="line",
+                        help="'line' counts tracked line crossings like the app; "
+                             "'all' writes one stock event per visible track per frame to stress the DB path")
+    parser.add_argument("--no-face-tracking", action="store_true",
+                        help="score every face every frame instead of using FaceTracker")
+    parser.add_argument("--db", default=None, help="database to write to (default: scratch copy)")
+    parser.add_argument("--out", default=None, help="write the JSON report here as well")
+    return parser.parse_args(argv)
+
+
+# Consistent copy of a live database, including changes still in its WAL
+def snapshot_db(source, target):
+    src = sqlite3.connect(source)
+    dst = sqlite3.connect(target)
+    try:
+        src.backup(dst)
+    finally:
+        dst.close()
+        src.close()
+
+
+def frames_from(source, max_frames):
+    from frame_source import iter_frames
+
+    for i, frame in enumerate(iter_frames(source)):
+        if max_frames and i >= max_frames:
+            return
+        yield frame
+
+
+# Counter for --count-mode all: every confirmed track on every frame is a
+# stock-in, so the writer sees far more events than line crossings produce
+class EveryTrackCounter:
+    def __init__(self):
+        self.counts = {"in": 0, "out": 0}
+
+    def update(self, tracks, shape):
+        self.counts["in"] += len(tracks)
+        return [(track, "in") for track in tracks]
+
+
+def replay_detection(args):
+    from metrics import timer
+    from model_registry import get_model
+    from object_tracker import make_counter
+    from scan_pipeline import ScanPipeline
+    from stock_events import get_event_writer
+
+    model = get_model("yolo")
+    writer = get_event_writer()
+    pipeline = ScanPipeline(
+        model,
+        frames_from(args.source, args.max_frames),
+        counter=EveryTrackCounter() if args.count_mode == "all" else make_counter(),
+        lossless=True,
+        name=args.source,
+    )
+
+    started = time.perf_counter()
+    pipeline.start().wait()
+    with timer("replay.db_flush"):
+        flushed = writer.flush()
+    elapsed = time.perf_counter() - started
+
+    db = writer.metrics()
+    return {
+        "detector": model.backend,
+        "error": pipeline.error,
+        "frames": pipeline.frames_processed,
+        "seconds": round(elapsed, 3),
+        "fps": round(pipeline.frames_processed / elapsed, 2) if elapsed else 0.0,
+        "stock_events": db["written"],
+        "db_batches": db["batches"],
+        "db_writes_per_sec": round(db["written"] / db["flush_seconds"], 1) if db["flush_seconds"] else 0.0,
+        "db_flushed": flushed,
+        "counted": dict(pipeline.counter.counts),
+    }
+
+
+# Same steps and stage names as emotion.py's real-time loop
+def replay_emotion(args):
+    import cv2
+
+    from face_detector import FaceDetector
+    from face_tracker import FaceTracker
+    from metrics import timer
+    from model_registry import get_model
+
+    detector = FaceDetector()
+    batcher = get_model("emotion")
+    tracker = None if args.no_face_tracking else FaceTracker()
+
+    frames = faces = 0
+    started = time.perf_counter()
+    source = iter(frames_from(args.source, args.max_frames))
+    while True:
+        with timer("emotion.capture"):
+            frame = next(source, None)
+        if frame is None:
+            break
+        frames += 1
+
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        with timer("emotion.face_detect"):
+            boxes = detector.detect(frame, gray)
+        faces += len(boxes)
+
+        with timer("emotion.analyze"):
+            if tracker is not None:
+                tracker.step(gray, boxes, batcher)
+            else:
+                batcher.analyze_frame(gray, boxes)
+
+    elapsed = time.perf_counter() - started
+    report = {
+        "frames": frames,
+        "faces": faces,
+        "seconds": round(elapsed, 3),
+        "fps": round(frames / elapsed, 2) if elapsed else 0.0,
+        "emotion_forward_passes": batcher.forward_passes,
+        "face_detection": detector.stats(),
+    }
+    if tracker is not None:
+        report["face_tracking"] = tracker.stats()
+    return report
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    scratch = None
+    if args.db is None:
+        scratch = tempfile.mkdtemp(prefix="replay-")
+        args.db = os.path.join(scratch, "inventory.db")
+        live = os.environ.get("INVENTORY_DB", "inventory.db")
+        if os.path.exists(live):
+            snapshot_db(live, args.db)
+    # The store reads its path at import time
+    os.environ["INVENTORY_DB"] = args.db
+
+    from db_utils import init_db
+    from metrics import get_metrics
+    from model_registry import get_registry
+
+    init_db()
+    report = {"source": args.source, "db": args.db, "pipelines": {}}
+    try:
+        for name in args.pipelines:
+            get_metrics().reset()
+            runner = replay_detection if name == "detection" else replay_emotion
+            result = runner(args)
+            snapshot = get_metrics().snapshot()
+            result["stages"] = snapshot["stages"]
+            result["counters"] = snapshot["counters"]
+            report["pipelines"][name] = result
+    finally:
+        if scratch:
+            from inventory_store import close_pools
+            close_pools()
+            shutil.rmtree(scratch, ignore_errors=True)
+
+    report["models"] = get_registry().stats()
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    report["peak_rss_mb"] = round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+# bulk_import.py
+# Bulk product import: streams a CSV or Parquet file in chunks, validates
+# each chunk column-wise and upserts the valid rows into `products`, one
+# transaction per chunk. Rows that fail validation are written, with the
+# reason, to a rejects CSV next to the input.
+#
+#   python bulk_import.py catalog.csv
+#   python bulk_import.py skus.parquet --chunk-rows 200000 --rejects bad_rows.csv
+import argparse
+import json
+import logging
+import os
+import time
+
+import pandas as pd
+
+from inventory_store import get_pool
+from inventory_summary import LOW
+from product_index import get_product_index
+
+log = logging.getLogger(__name__)
+
+IMPORT_CHUNK_ROWS = int(os.environ.get("IMPORT_CHUNK_ROWS", "50000"))
+
+COLUMNS = ["product_id", "name", "category", "stock", "threshold"]
+# products column -> accepted headers (compared case-insensitively, with
+# spaces and underscores treated alike); the dashboard's CSV headers included
+COLUMN_ALIASES = {
+    "product_id": ("product id", "id", "sku"),
+    "name": ("name", "product name", "product"),
+    "category": ("category",),
+    "stock": ("stock", "quantity", "qty"),
+    "threshold": ("threshold", "reorder level"),
+}
+REQUIRED = ("product_id", "name")
+INTEGER_COLUMNS = ("stock", "threshold")
+# Values for new products when the file has no such column or the cell is
+# empty; existing products keep their stored values instead
+DEFAULTS = {"category": None, "stock": 0, "threshold": 2}
+
+STAGE_SCHEMA = '''CREATE TEMP TABLE IF NOT EXISTS import_rows (
+    product_id TEXT,
+    name TEXT,
+    category TEXT,
+    stock INTEGER,
+    threshold INTEGER
+)'''
+STAGE_ROW = "INSERT INTO import_rows VALUES (?, ?, ?, ?, ?)"
+ENSURE_KEYS = "INSERT OR IGNORE INTO product_keys (product_id) SELECT product_id FROM import_rows"
+BUMP_VERSIONS = [
+    "UPDATE inventory_version SET version = version + 1 WHERE id = 1",
+    "UPDATE products_version SET version = version + 1 WHERE id = 1",
+    "UPDATE product_names_version SET version = version + 1 WHERE id = 1",
+]
+# The products triggers whose effects the fast path redoes by hand: the
+# category_stock summary (inventory_summary.py) and the inventory_version,
+# products_version and product_names_version counters (migrations v3-v5)
+HANDLED_TRIGGERS = frozenset({
+    "trg_products_summary_insert", "trg_products_summary_update", "trg_products_summary_delete",
+    "trg_products_version_insert", "trg_products_version_update", "trg_products_version_delete",
+    "trg_products_version_stock",
+    "trg_products_changed_insert", "trg_products_changed_update", "trg_products_changed_delete",
+    "trg_product_names_insert", "trg_product_names_update", "trg_product_names_delete",
+})
+
+
+def _normalize(header):
+    return " ".join(str(header).replace("_", " ").lower().split())
+
+
+# File headers -> {products column: header}; raises ValueError when a
+# required column is missing
+def map_columns(headers):
+    normalized = {_normalize(h): h for h in headers}
+    mapping = {}
+    for column, aliases in COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias in normalized:
+                mapping[column] = normalized[alias]
+                break
+    missing = [column for column in REQUIRED if column not in mapping]
+    if missing:
+        raise ValueError(f"Missing required column(s): {', '.join(missing)} (found: {', '.join(map(str, headers))})")
+    return mapping
+
+
+# One chunk -> (valid rows as a DataFrame of COLUMNS, rejection reason per
+# row with "" for valid rows). Empty cells and absent columns are None.
+def validate(frame, mapping):
+    reasons = pd.Series("", index=frame.index, dtype=object)
+    valid = pd.DataFrame(index=frame.index)
+
+    def reject(mask, reason):
+        nonlocal reasons
+        mask = mask & (reasons == "")
+        if mask.any():
+            reasons = reasons.mask(mask, reason(mask) if callable(reason) else reason)
+
+    for column in COLUMNS:
+        if column not in mapping:
+            valid[column] = None
+            continue
+        text = frame[mapping[column]].astype("string").str.strip().fillna("").astype(object)
+        empty = text == ""
+        if column in REQUIRED:
+            reject(empty, f"empty {column}")
+            valid[column] = text
+        elif column in INTEGER_COLUMNS:
+            numbers = pd.to_numeric(text.where(~empty), errors="coerce")
+            bad = ~empty & (numbers.isna() | (numbers % 1 != 0) | (numbers.abs() >= 2**63))
+            reject(bad, lambda mask: f"{column} is not an integer: " + text[mask])
+            reject(~bad & (numbers < 0), lambda mask: f"negative {column}: " + text[mask])
+            valid[column] = numbers.where(~bad & ~empty)
+        else:
+            valid[column] = text.where(~empty, None)
+
+    # A product repeated in the chunk keeps its last row
+    valid = valid[reasons == ""].drop_duplicates("product_id", keep="last")
+    for column in INTEGER_COLUMNS:
+        values = valid[column].astype("Int64").astype(object)
+        valid[column] = values.where(values.notna(), None)
+    return valid, reasons
+
+
+# DataFrame chunks of a CSV path or stream, every cell read as text
+def read_csv_chunks(source, chunk_rows=IMPORT_CHUNK_ROWS):
+    try:
+        yield from pd.read_csv(
+            source, chunksize=chunk_rows, dtype=str, keep_default_na=False, encoding="utf-8-sig"
+        )
+    except pd.errors.EmptyDataError:
+        raise ValueError("Empty file: no header row") from None
+
+
+# DataFrame chunks of a Parquet path or stream, one per record batch
+def read_parquet_chunks(source, chunk_rows=IMPORT_CHUNK_ROWS):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Parquet import requires pyarrow: pip install pyarrow") from None
+
+    start = 0
+    for batch in pq.ParquetFile(source).iter_batches(batch_size=chunk_rows):
+        frame = batch.to_pandas()
+        frame.index += start
+        start += len(frame)
+        yield frame
+
+
+READERS = {"csv": read_csv_chunks, "parquet": read_parquet_chunks}
+
+
+def format_for(source):
+    name = source if isinstance(source, str) else getattr(source, "name", "")
+    return "parquet" if str(name).lower().endswith((".parquet", ".pq")) else "csv"
+
+
+def default_rejects_path(source):
+    if isinstance(source, str):
+        return os.path.splitext(source)[0] + ".rejects.csv"
+    return "import.rejects.csv"
+
+
+def _literal(value):
+    return "NULL" if value is None else repr(value)
+
+
+# (summary, upsert) statements for one chunk staged in import_rows. A NULL
+# (empty cell, or a column the file does not have) keeps the stored value on
+# existing products and takes DEFAULTS on new ones; rows identical to what
+# is stored are not touched.
+def import_sql():
+    updated = COLUMNS[1:]
+
+    # Value after the upsert, given s (import_rows) LEFT JOIN p (products)
+    def after(column):
+        if column in REQUIRED:
+            return f"s.{column}"
+        return (f"CASE WHEN p.product_id IS NULL THEN COALESCE(s.{column}, {_literal(DEFAULTS[column])}) "
+                f"ELSE COALESCE(s.{column}, p.{column}) END")
+
+    differs = " OR ".join(f"p.{column} IS NOT {after(column)}" for column in updated)
+    staged = "FROM import_rows s LEFT JOIN products p ON p.product_id = s.product_id"
+
+    new_rows = f'''SELECT {after("category")} AS category, {after("stock")} AS stock,
+            {after("threshold")} AS threshold
+        {staged}
+        WHERE p.product_id IS NULL OR {differs}'''
+    old_rows = f'''SELECT p.category, p.stock, p.threshold
+        FROM import_rows s JOIN products p ON p.product_id = s.product_id
+        WHERE {differs}'''
+    # The category_stock triggers' bookkeeping, once per chunk
+    summary = f'''INSERT INTO category_stock (category, products, stock, low_stock)
+        SELECT category, SUM(products), SUM(stock), SUM(low_stock) FROM (
+            SELECT IFNULL(n.category, '') AS category, 1 AS products, IFNULL(n.stock, 0) AS stock,
+                {LOW.format(p="n")} AS low_stock
+            FROM ({new_rows}) n
+            UNION ALL
+            SELECT IFNULL(o.category, ''), -1, -IFNULL(o.stock, 0), -{LOW.format(p="o")}
+            FROM ({old_rows}) o
+        ) WHERE true GROUP BY category
+        ON CONFLICT (category) DO UPDATE SET
+            products = products + excluded.products,
+            stock = stock + excluded.stock,
+            low_stock = low_stock + excluded.low_stock'''
+    # excluded.* already holds the values after the upsert
+    upsert = f'''INSERT INTO products ({", ".join(COLUMNS)})
+        SELECT s.product_id, {", ".join(after(c) for c in updated)} {staged} WHERE true
+        ON CONFLICT (product_id) DO UPDATE SET {", ".join(f"{c} = excluded.{c}" for c in updated)}
+        WHERE {" OR ".join(f"products.{c} IS NOT excluded.{c}" for c in updated)}'''
+    return summary, upsert
+
+
+# Upsert one validated chunk on an open transaction; returns rows changed.
+# The per-row product triggers are dropped for the duration and recreated
+# from their stored SQL before the transaction commits, with their summary
+# and version bookkeeping done set-wise instead. If products has triggers
+# other than HANDLED_TRIGGERS (or lacks some), they are all left in place
+# and fire row by row.
+def _upsert_chunk(conn, rows, summary, upsert):
+    conn.execute(STAGE_SCHEMA)
+    conn.execute("DELETE FROM import_rows")
+    conn.executemany(STAGE_ROW, rows)
+
+    triggers = conn.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'products'"
+    ).fetchall()
+    names = {name for name, _ in triggers}
+    if names != HANDLED_TRIGGERS:
+        log.warning(
+            "products triggers differ from the ones bulk import handles (unknown: %s; missing: %s); "
+            "upserting with triggers in place",
+            ", ".join(sorted(names - HANDLED_TRIGGERS)) or "none",
+            ", ".join(sorted(HANDLED_TRIGGERS - names)) or "none",
+        )
+        changed = conn.execute(upsert).rowcount
+        conn.execute(ENSURE_KEYS)
+        conn.execute("DELETE FROM import_rows")
+        return changed
+
+    for name, _ in triggers:
+        conn.execute(f"DROP TRIGGER {name}")
+
+    conn.execute(summary)
+    conn.execute("DELETE FROM category_stock WHERE products = 0")
+    changed = conn.execute(upsert).rowcount
+    if changed:
+        for statement in BUMP_VERSIONS:
+            conn.execute(statement)
+    conn.execute(ENSURE_KEYS)
+
+    for _, sql in triggers:
+        conn.execute(sql)
+    conn.execute("DELETE FROM import_rows")
+    return changed
+
+
+# Import a CSV/Parquet file (path or open stream, e.g. an upload) into
+# products. Returns counts and throughput; rejected rows go to `rejects` (a
+# path) with the file's own columns, the data row number and the reason.
+# "changed" counts products actually inserted or modified.
+def import_products(source, fmt=None, chunk_rows=IMPORT_CHUNK_ROWS, rejects=None):
+    fmt = fmt or format_for(source)
+    rejects = rejects or default_rejects_path(source)
+
+    started = time.perf_counter()
+    read = upserted = changed = rejected = 0
+    statements = None
+    for frame in READERS[fmt](source, chunk_rows):
+        if statements is None:
+            mapping = map_columns(list(frame.columns))
+            statements = import_sql()
+        valid, reasons = validate(frame, mapping)
+        read += len(frame)
+
+        bad = reasons != ""
+        if bad.any():
+            rows = frame[bad].assign(row=frame.index[bad] + 1, error=reasons[bad])
+            rows.to_csv(rejects, mode="a" if rejected else "w", header=not rejected, index=False)
+            rejected += int(bad.sum())
+
+        if len(valid):
+            rows = zip(*(valid[column].tolist() for column in COLUMNS))
+            with get_pool().transaction() as conn:
+                changed += _upsert_chunk(conn, rows, *statements)
+            upserted += len(valid)
+
+    if changed:
+        get_product_index().invalidate()
+    elapsed = time.perf_counter() - started
+    return {
+        "rows": read,
+        "upserted": upserted,
+        "changed": changed,
+        "rejected": rejected,
+        "rejects_path": rejects if rejected else None,
+        "seconds": round(elapsed, 3),
+        "rows_per_sec": round(read / elapsed) if elapsed else 0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import products from CSV or Parquet")
+    parser.add_argument("path", help="CSV or Parquet file")
+    parser.add_argument("--format", choices=["csv", "parquet"], default=None, help="default: from the extension")
+    parser.add_argument("--chunk-rows", type=int, default=IMPORT_CHUNK_ROWS, help="rows per transaction")
+    parser.add_argument("--rejects", default=None, help="rejected rows CSV (default: <path>.rejects.csv)")
+    args = parser.parse_args()
+
+    from db_utils import init_db
+
+    init_db()
+    print(json.dumps(import_products(args.path, args.format, args.chunk_rows, args.rejects), indent=2))
+
+
+if __name__ == "__main__":
+    main()
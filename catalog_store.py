@@ -0,0 +1,298 @@
+# catalog_store.py
+# Product catalog readers with per-column lazy loading, and a watcher that
+# reloads the catalog when its file changes.
+#
+#   CATALOG_PATH=catalog.json      # list of objects (parsed whole)
+#   CATALOG_PATH=catalog.parquet   # Parquet, read column by column (pyarrow)
+#   CATALOG_PATH=catalog.arrow     # Arrow IPC / Feather, memory-mapped (pyarrow)
+#   CATALOG_PATH=catalog.db        # SQLite file with a `catalog` table
+#
+#   python catalog_store.py catalog.json catalog.parquet   # convert formats
+import argparse
+import bisect
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+CATALOG_PATH = os.environ.get("CATALOG_PATH", "catalog.json")
+CATALOG_CHECK_SECONDS = float(os.environ.get("CATALOG_CHECK_SECONDS", "2"))
+CATALOG_TABLE = "catalog"
+
+ARROW_EXTENSIONS = (".arrow", ".feather", ".ipc")
+SQLITE_EXTENSIONS = (".db", ".sqlite", ".sqlite3")
+
+log = logging.getLogger(__name__)
+
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Parquet/Arrow catalogs require pyarrow: pip install pyarrow") from None
+    return pa, pq
+
+
+# Catalog held as parsed JSON records
+class JsonCatalog:
+    def __init__(self, path=None, records=None):
+        if records is None:
+            with open(path, "r") as f:
+                records = json.load(f)
+        self._records = records
+        self._columns = {}
+        self.names = sorted({key for record in records for key in record})
+
+    def __len__(self):
+        return len(self._records)
+
+    def column(self, name):
+        if name not in self._columns:
+            self._columns[name] = [record.get(name) for record in self._records]
+        return self._columns[name]
+
+    def row(self, i):
+        return dict(self._records[i])
+
+
+# Parquet or Arrow IPC catalog. Columns are read on first use, so memory
+# follows the columns actually used; Arrow IPC files are memory-mapped.
+# Full Parquet rows are decoded one row group at a time, keeping the last.
+class ArrowCatalog:
+    def __init__(self, path):
+        pa, pq = _pyarrow()
+        if path.endswith(ARROW_EXTENSIONS):
+            self._table = pa.ipc.open_file(pa.memory_map(path)).read_all()
+            self._file = None
+            self.names = self._table.column_names
+            self._rows = self._table.num_rows
+        else:
+            self._table = None
+            self._file = pq.ParquetFile(path, memory_map=True)
+            self.names = self._file.schema_arrow.names
+            self._rows = self._file.metadata.num_rows
+            metadata = self._file.metadata
+            # First row of each row group
+            self._group_starts = []
+            start = 0
+            for g in range(metadata.num_row_groups):
+                self._group_starts.append(start)
+                start += metadata.row_group(g).num_rows
+            self._group = (None, None)
+            self._lock = threading.Lock()
+        self._columns = {}
+
+    def __len__(self):
+        return self._rows
+
+    def _arrow_column(self, name):
+        if self._file is not None:
+            return self._file.read(columns=[name]).column(0)
+        return self._table.column(name)
+
+    def column(self, name):
+        if name not in self.names:
+            return [None] * self._rows
+        if name not in self._columns:
+            self._columns[name] = self._arrow_column(name).to_pylist()
+        return self._columns[name]
+
+    def row(self, i):
+        if self._table is not None:
+            return self._table.slice(i, 1).to_pylist()[0]
+        g = bisect.bisect_right(self._group_starts, i) - 1
+        with self._lock:
+            index, group = self._group
+            if index != g:
+                group = self._file.read_row_group(g, use_threads=False)
+                self._group = (g, group)
+        return group.slice(i - self._group_starts[g], 1).to_pylist()[0]
+
+
+# Catalog stored as a `catalog` table in a SQLite file, read-only
+class SqliteCatalog:
+    def __init__(self, path, table=CATALOG_TABLE):
+        self.table = table
+        self._conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.names = [row[1] for row in self._conn.execute(f"PRAGMA table_info({table})")]
+        self._rowids = [row[0] for row in self._conn.execute(f"SELECT rowid FROM {table} ORDER BY rowid")]
+        self._columns = {}
+
+    def __len__(self):
+        return len(self._rowids)
+
+    def column(self, name):
+        if name not in self.names:
+            return [None] * len(self._rowids)
+        if name not in self._columns:
+            with self._lock:
+                rows = self._conn.execute(f'SELECT "{name}" FROM {self.table} ORDER BY rowid').fetchall()
+            self._columns[name] = [row[0] for row in rows]
+        return self._columns[name]
+
+    def row(self, i):
+        with self._lock:
+            cursor = self._conn.execute(f"SELECT * FROM {self.table} WHERE rowid = ?", (self._rowids[i],))
+            values = cursor.fetchone()
+        return {desc[0]: value for desc, value in zip(cursor.description, values) if value is not None}
+
+
+def open_catalog(path=CATALOG_PATH):
+    if path.endswith(".json"):
+        return JsonCatalog(path)
+    if path.endswith(SQLITE_EXTENSIONS):
+        return SqliteCatalog(path)
+    return ArrowCatalog(path)
+
+
+# (mtime, size) of the file and, for SQLite, its WAL
+def _stat(path):
+    stamps = []
+    for p in (path, path + "-wal"):
+        try:
+            st = os.stat(p)
+        except FileNotFoundError:
+            continue
+        stamps.append((st.st_mtime_ns, st.st_size))
+    return tuple(stamps)
+
+
+def _digest(path):
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+# Current catalog for a path, reloaded when the file changes. The file is
+# stat'ed at most every `check_seconds`; a changed mtime/size is confirmed by
+# a content hash (except for SQLite, whose WAL makes file hashes meaningless)
+# so touching or re-copying an identical file does not trigger a reload.
+class CatalogWatcher:
+    def __init__(self, path=CATALOG_PATH, check_seconds=CATALOG_CHECK_SECONDS):
+        self.path = path
+        self.check_seconds = check_seconds
+        self.version = 0
+        self.reloads = 0
+        self._lock = threading.Lock()
+        self._catalog = None
+        self._stat = None
+        self._digest = None
+        self._checked = 0.0
+
+    # A missing file (deleted, or being replaced) counts as unchanged: the
+    # current catalog stays until a readable file is back
+    def _changed(self):
+        stat = _stat(self.path)
+        if stat == self._stat or not stat:
+            return False
+        if self.path.endswith(SQLITE_EXTENSIONS):
+            self._stat = stat
+            return True
+        try:
+            digest = _digest(self.path)
+        except FileNotFoundError:
+            return False
+        self._stat = stat
+        if digest == self._digest:
+            return False
+        self._digest = digest
+        return True
+
+    # (catalog, version); version increases on every reload
+    def current(self):
+        now = time.monotonic()
+        if self._catalog is not None and now - self._checked < self.check_seconds:
+            return self._catalog, self.version
+
+        with self._lock:
+            if self._catalog is None or now - self._checked >= self.check_seconds:
+                self._checked = now
+                # The old catalog is left to the garbage collector, since
+                # recommenders built on it may still be serving requests
+                if self._catalog is None:
+                    self._changed()
+                    self._catalog = open_catalog(self.path)
+                    self.version += 1
+                    self.reloads += 1
+                elif self._changed():
+                    try:
+                        catalog = open_catalog(self.path)
+                    except (OSError, ValueError, sqlite3.Error) as e:
+                        # e.g. a half-copied file: keep serving the current
+                        # catalog and try again on the next check
+                        log.warning("Catalog reload from %s failed, keeping the current one: %s", self.path, e)
+                        self._stat = self._digest = None
+                    else:
+                        self._catalog = catalog
+                        self.version += 1
+                        self.reloads += 1
+            return self._catalog, self.version
+
+
+_watcher = None
+_watcher_lock = threading.Lock()
+
+
+# Shared process-wide watcher for CATALOG_PATH
+def get_catalog_watcher():
+    global _watcher
+    with _watcher_lock:
+        if _watcher is None:
+            _watcher = CatalogWatcher()
+        return _watcher
+
+
+# Write a catalog (any supported format) out in another format, by extension
+def convert(src, dst):
+    catalog = open_catalog(src)
+    columns = {name: catalog.column(name) for name in catalog.names}
+    # Nested values (e.g. an "emotions" map) are stored as JSON text
+    for name, values in columns.items():
+        if any(isinstance(v, (dict, list)) for v in values):
+            columns[name] = [json.dumps(v) if v is not None else None for v in values]
+
+    if dst.endswith(".json"):
+        records = [
+            {name: values[i] for name, values in columns.items() if values[i] is not None}
+            for i in range(len(catalog))
+        ]
+        with open(dst, "w") as f:
+            json.dump(records, f, indent=2)
+    elif dst.endswith(SQLITE_EXTENSIONS):
+        with sqlite3.connect(dst) as conn:
+            conn.execute(f"DROP TABLE IF EXISTS {CATALOG_TABLE}")
+            names = ", ".join(f'"{name}"' for name in columns)
+            conn.execute(f"CREATE TABLE {CATALOG_TABLE} ({names})")
+            conn.executemany(
+                f"INSERT INTO {CATALOG_TABLE} VALUES ({', '.join('?' * len(columns))})",
+                zip(*columns.values()),
+            )
+        conn.close()
+    else:
+        pa, pq = _pyarrow()
+        table = pa.table(columns)
+        if dst.endswith(ARROW_EXTENSIONS):
+            with pa.OSFile(dst, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        else:
+            pq.write_table(table, dst)
+    return len(catalog)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert the product catalog between formats")
+    parser.add_argument("src", help="catalog file (.json, .parquet, .arrow, .db)")
+    parser.add_argument("dst", help="output file; format from the extension")
+    args = parser.parse_args()
+    print(f"Wrote {convert(args.src, args.dst)} items to {args.dst}")
+
+
+if __name__ == "__main__":
+    main()
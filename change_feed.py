@@ -0,0 +1,389 @@
+# change_feed.py
+# Push feed of stock changes. One asyncio task per process reads new rows
+# from `events` by event_id and fans them out to subscribers, which iterate
+# StockChange records in event order:
+#
+#   async for change in feed.subscribe(after_id):
+#       ...
+#
+# Writes made in this process (update_stock, update_inventory, the stock
+# event writer) wake the feed at once; writes from other processes (e.g.
+# scanner_service.py) are picked up every FEED_POLL_MS while anyone is
+# subscribed; with no subscribers the database is not read. A subscriber can
+# resume from any event_id, and one that falls FEED_QUEUE batches behind
+# catches up from the database, so no event is skipped.
+#
+# serve (SSE): GET /events streams `event: stock` messages with `id:` set to
+# the event_id, so a reconnecting EventSource resumes via Last-Event-ID
+# (or ?after=<event_id>); GET /stats reports the feed's counters.
+#
+#   python change_feed.py serve --port 8765
+#   python change_feed.py tail --after 0
+#   python change_feed.py low-stock
+#   python change_feed.py export changes.jsonl --follow
+import argparse
+import asyncio
+import json
+import logging
+import os
+import threading
+from collections import namedtuple
+from contextlib import suppress
+from urllib.parse import parse_qs, urlsplit
+
+from db_utils import get_last_event_id, get_stock_changes, on_stock_change, remove_stock_listener
+
+log = logging.getLogger(__name__)
+
+FEED_HOST = os.environ.get("FEED_HOST", "127.0.0.1")
+FEED_PORT = int(os.environ.get("FEED_PORT", "8765"))
+FEED_POLL_MS = int(os.environ.get("FEED_POLL_MS", "500"))
+FEED_BATCH = int(os.environ.get("FEED_BATCH", "500"))
+FEED_QUEUE = int(os.environ.get("FEED_QUEUE", "64"))
+HEARTBEAT_SECONDS = 15
+
+
+# One stock event. stock is the product's stock right after the event for
+# changes read live, and its stock at read time when replaying a backlog
+# longer than FEED_BATCH; stock and threshold are None for a deleted product.
+class StockChange(namedtuple("StockChange", ["event_id", "product_id", "name", "ts", "qty", "stock", "threshold"])):
+    __slots__ = ()
+
+    @property
+    def low_stock(self):
+        return self.stock is not None and self.threshold is not None and self.stock <= self.threshold
+
+    def to_dict(self):
+        return {**self._asdict(), "low_stock": self.low_stock}
+
+
+class _Subscriber:
+    def __init__(self, size):
+        self.queue = asyncio.Queue(size)
+        self.lagged = False
+
+
+class ChangeFeed:
+    def __init__(self, poll_ms=FEED_POLL_MS, batch=FEED_BATCH, queue_size=FEED_QUEUE):
+        self.poll = poll_ms / 1000
+        self.batch = batch
+        self.queue_size = queue_size
+        self.cursor = 0
+        self._subscribers = set()
+        self._loop = None
+        self._wake = None
+        self._task = None
+
+        self.published = 0
+        self.lagged = 0
+        self.errors = 0
+
+    async def start(self):
+        if self._task is None:
+            self._loop = asyncio.get_running_loop()
+            self._wake = asyncio.Event()
+            self.cursor = await asyncio.to_thread(get_last_event_id)
+            on_stock_change(self._notify)
+            self._task = asyncio.create_task(self._run())
+        return self
+
+    async def stop(self):
+        if self._task is not None:
+            remove_stock_listener(self._notify)
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    # Runs on whichever thread committed the write
+    def _notify(self):
+        with suppress(RuntimeError):
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    async def _fetch(self, after_id):
+        rows = await asyncio.to_thread(get_stock_changes, after_id, self.batch)
+        changes = [StockChange(*row) for row in rows]
+        # Read up to date in one snapshot: walk back from each product's
+        # current stock so every change carries the stock right after it
+        if len(changes) < self.batch:
+            later = {}
+            for i in range(len(changes) - 1, -1, -1):
+                change = changes[i]
+                if change.stock is not None:
+                    delta = later.get(change.product_id, 0)
+                    changes[i] = change._replace(stock=change.stock - delta)
+                    later[change.product_id] = delta + change.qty
+        return changes
+
+    async def _run(self):
+        while True:
+            with suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._wake.wait(), self.poll)
+            self._wake.clear()
+            if not self._subscribers:
+                continue
+            try:
+                changes = await self._fetch(self.cursor)
+            except Exception as e:
+                self.errors += 1
+                log.warning("Change feed read failed: %s", e)
+                continue
+            if not changes:
+                continue
+            self.cursor = changes[-1].event_id
+            self.published += len(changes)
+            for subscriber in self._subscribers:
+                if subscriber.lagged:
+                    continue
+                try:
+                    subscriber.queue.put_nowait(changes)
+                except asyncio.QueueFull:
+                    subscriber.lagged = True
+                    self.lagged += 1
+            if len(changes) == self.batch:
+                self._wake.set()
+
+    # StockChanges after `after_id` (None: from now on), oldest first, waiting
+    # for new ones indefinitely. With follow=False, changes after `after_id`
+    # (None: from the start) are read once, up to date.
+    async def subscribe(self, after_id=None, follow=True):
+        if not follow:
+            cursor = after_id or 0
+            while changes := await self._fetch(cursor):
+                for change in changes:
+                    cursor = change.event_id
+                    yield change
+            return
+
+        await self.start()
+        # The idle feed has not been reading; start "now" from the database
+        if not self._subscribers:
+            self.cursor = max(self.cursor, await asyncio.to_thread(get_last_event_id))
+        cursor = self.cursor if after_id is None else after_id
+        subscriber = _Subscriber(self.queue_size)
+        self._subscribers.add(subscriber)
+        try:
+            while True:
+                if subscriber.lagged:
+                    subscriber.lagged = False
+                    while not subscriber.queue.empty():
+                        subscriber.queue.get_nowait()
+                # Behind the feed (a resumed cursor, or dropped batches): read
+                # from the database until caught up
+                if cursor < self.cursor:
+                    changes = await self._fetch(cursor)
+                    if changes:
+                        for change in changes:
+                            cursor = change.event_id
+                            yield change
+                        continue
+                for change in await subscriber.queue.get():
+                    if change.event_id > cursor:
+                        cursor = change.event_id
+                        yield change
+        finally:
+            self._subscribers.discard(subscriber)
+
+    def stats(self):
+        return {
+            "cursor": self.cursor,
+            "subscribers": len(self._subscribers),
+            "published": self.published,
+            "lagged": self.lagged,
+            "errors": self.errors,
+        }
+
+
+def _sse(change):
+    return f"id: {change.event_id}\nevent: stock\ndata: {json.dumps(change.to_dict())}\n\n".encode()
+
+
+def _response(status, content_type, body=b""):
+    return (
+        f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\nContent-Length: {len(body)}\r\n"
+        "Access-Control-Allow-Origin: *\r\nConnection: close\r\n\r\n"
+    ).encode() + body
+
+
+# Minimal HTTP server for the feed: SSE on /events, JSON on /stats
+class FeedServer:
+    def __init__(self, feed=None, host=FEED_HOST, port=FEED_PORT):
+        self.feed = feed or ChangeFeed()
+        self.host = host
+        self.port = port
+        self.connections = 0
+        self._server = None
+
+    async def start(self):
+        await self.feed.start()
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        return self
+
+    async def serve_forever(self):
+        await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def _handle(self, reader, writer):
+        try:
+            request = await reader.readuntil(b"\r\n\r\n")
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            writer.close()
+            return
+        lines = request.decode("latin-1").split("\r\n")
+        method, target = (lines[0].split(" ") + ["", ""])[:2]
+        headers = dict(
+            (key.strip().lower(), value.strip()) for key, _, value in
+            (line.partition(":") for line in lines[1:] if ":" in line)
+        )
+        url = urlsplit(target)
+
+        try:
+            if method == "GET" and url.path == "/events":
+                after = headers.get("last-event-id") or parse_qs(url.query).get("after", [""])[0]
+                await self._stream(reader, writer, int(after) if after.isdigit() else None)
+            elif method == "GET" and url.path == "/stats":
+                writer.write(_response("200 OK", "application/json", json.dumps(self.stats()).encode()))
+                await writer.drain()
+            else:
+                writer.write(_response("404 Not Found", "text/plain", b"Not found\n"))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _stream(self, reader, writer, after_id):
+        writer.write(
+            b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nCache-Control: no-cache\r\n"
+            b"Access-Control-Allow-Origin: *\r\nConnection: keep-alive\r\n\r\nretry: 2000\n\n"
+        )
+        await writer.drain()
+
+        async def send_changes():
+            async for change in self.feed.subscribe(after_id):
+                writer.write(_sse(change))
+                await writer.drain()
+
+        async def heartbeat():
+            while True:
+                await asyncio.sleep(HEARTBEAT_SECONDS)
+                writer.write(b": ping\n\n")
+                await writer.drain()
+
+        # Whichever ends first (client gone, write failed) ends the stream
+        self.connections += 1
+        tasks = [asyncio.create_task(send_changes()), asyncio.create_task(heartbeat()),
+                 asyncio.create_task(reader.read())]
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            self.connections -= 1
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self):
+        return {**self.feed.stats(), "connections": self.connections}
+
+
+# Feed and SSE server on a background event loop, for hosts without one
+# (e.g. Streamlit). Raises OSError if the port is taken.
+def serve_feed_in_thread(host=FEED_HOST, port=FEED_PORT):
+    loop = asyncio.new_event_loop()
+    server = FeedServer(host=host, port=port)
+    loop.run_until_complete(server.start())
+    threading.Thread(target=loop.run_forever, name="change-feed", daemon=True).start()
+    return server
+
+
+# Report each product once when a stock-out movement leaves it at or below
+# its reorder level (again only after it has been restocked above it)
+async def notify_low_stock(feed, notify=print, after_id=None):
+    low = set()
+    async for change in feed.subscribe(after_id):
+        if not change.low_stock:
+            low.discard(change.product_id)
+        elif change.qty < 0 and change.product_id not in low:
+            low.add(change.product_id)
+            notify(f"⚠️ Low stock: {change.name or change.product_id} has {change.stock} left "
+                   f"(reorder level {change.threshold})")
+
+
+def _read_cursor(path):
+    try:
+        with open(path) as f:
+            return int(f.read().strip() or 0)
+    except FileNotFoundError:
+        return 0
+
+
+def _write_cursor(path, event_id):
+    with open(path + ".tmp", "w") as f:
+        f.write(str(event_id))
+    os.replace(path + ".tmp", path)
+
+
+# Append changes to a JSON-lines file, resuming after the event_id saved in
+# `cursor_path` by the previous run; returns the number of changes written
+async def export_changes(feed, path, cursor_path=None, follow=False):
+    cursor_path = cursor_path or path + ".cursor"
+    cursor = _read_cursor(cursor_path)
+    written = 0
+    with open(path, "a") as out:
+        try:
+            async for change in feed.subscribe(cursor, follow=follow):
+                out.write(json.dumps(change.to_dict()) + "\n")
+                cursor = change.event_id
+                written += 1
+                # Following, each change is saved as it arrives
+                if follow or written % FEED_BATCH == 0:
+                    out.flush()
+                    _write_cursor(cursor_path, cursor)
+        finally:
+            out.flush()
+            _write_cursor(cursor_path, cursor)
+    return written
+
+
+async def _tail(feed, after_id):
+    async for change in feed.subscribe(after_id):
+        print(json.dumps(change.to_dict()), flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stock change feed")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve = commands.add_parser("serve", help="SSE server: GET /events, /stats")
+    serve.add_argument("--host", default=FEED_HOST)
+    serve.add_argument("--port", type=int, default=FEED_PORT)
+    tail = commands.add_parser("tail", help="print changes as JSON lines")
+    tail.add_argument("--after", type=int, default=None, help="event_id to resume after (default: now)")
+    commands.add_parser("low-stock", help="print products as they drop to their reorder level")
+    export = commands.add_parser("export", help="append changes to a JSON-lines file")
+    export.add_argument("path")
+    export.add_argument("--cursor-file", default=None, help="default: <path>.cursor")
+    export.add_argument("--follow", action="store_true", help="keep appending new changes")
+    args = parser.parse_args()
+
+    from db_utils import init_db
+
+    init_db()
+    feed = ChangeFeed()
+    if args.command == "serve":
+        print(f"Stock changes on http://{args.host}:{args.port}/events")
+        job = FeedServer(feed, args.host, args.port).serve_forever()
+    elif args.command == "tail":
+        job = _tail(feed, args.after)
+    elif args.command == "low-stock":
+        job = notify_low_stock(feed)
+    else:
+        job = export_changes(feed, args.path, args.cursor_file, args.follow)
+    with suppress(KeyboardInterrupt):
+        result = asyncio.run(job)
+        if args.command == "export":
+            print(f"Exported {result} changes to {args.path}")
+
+
+if __name__ == "__main__":
+    main()
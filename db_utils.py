@@ -1,82 +1,318 @@
 # db_utils.py
-import sqlite3
+import json
+import os
+import time
 from datetime import datetime
 
-# Initialize the inventory and logs tables
+from inventory_store import get_pool
+from inventory_summary import ensure_summary
+from metrics import timed
+from migrations import LOG_ROW, migrate
+from stock_rollups import ensure_rollups
+from product_index import get_product_index
+
+SELECT_STOCK = "SELECT stock FROM products WHERE product_id = ?"
+SELECT_PRODUCT = "SELECT * FROM products WHERE product_id = ?"
+ADD_STOCK = "UPDATE products SET stock = stock + 1 WHERE product_id = ?"
+REMOVE_STOCK = "UPDATE products SET stock = stock - 1 WHERE product_id = ?"
+ENSURE_KEY = "INSERT OR IGNORE INTO product_keys (product_id) VALUES (?)"
+LOG_EVENT = "INSERT INTO events (product_key, ts, qty) SELECT product_key, ?, ? FROM product_keys WHERE product_id = ?"
+APPLY_DELTA = "UPDATE products SET stock = stock + ? WHERE product_id = ?"
+# (event_id, product_id, name, epoch-ms ts, signed qty, current stock, threshold)
+STOCK_CHANGE_ROW = """SELECT e.event_id, k.product_id, p.name, e.ts, e.qty, p.stock, p.threshold
+    FROM events e JOIN product_keys k ON k.product_key = e.product_key
+    LEFT JOIN products p ON p.product_id = k.product_id"""
+
+# Callbacks run after every committed stock write in this process
+_stock_listeners = []
+
+
+# Epoch milliseconds, the events table's timestamp unit
+def now_ms():
+    return int(time.time() * 1000)
+
+
+# Local 'YYYY-MM-DD[ HH:MM:SS]' text -> epoch milliseconds
+def to_epoch_ms(text):
+    return int(datetime.fromisoformat(text).timestamp() * 1000)
+
+
+# Create or migrate the schema (see migrations.py), then the derived tables;
+# returns the migration versions applied
 def init_db():
-    conn = sqlite3.connect("inventory.db")
-    c = conn.cursor()
+    with get_pool().transaction() as conn:
+        applied = migrate(conn)
+
+        # Category totals, low-stock index and per-product running totals
+        ensure_summary(conn)
 
-    # Product table
-    c.execute('''CREATE TABLE IF NOT EXISTS products (
-        product_id TEXT PRIMARY KEY,
-        name TEXT,
-        stock INTEGER,
-        category TEXT
-    )''')
+        # Time-series rollups of stock movement
+        ensure_rollups(conn)
+    return applied
 
-    # Logs table
-    c.execute('''CREATE TABLE IF NOT EXISTS logs (
-        log_id INTEGER PRIMARY KEY AUTOINCREMENT,
-        product_id TEXT,
-        in_time TEXT,
-        out_time TEXT
-    )''')
 
-    conn.commit()
-    conn.close()
+# Resolve a detector label, product name or alias to its product_id
+@timed("db.resolve_product")
+def resolve_product(name):
+    return get_product_index().resolve(name)
 
 
 # Get current stock for a product
 def get_stock(product_name):
-    conn = sqlite3.connect("inventory.db")
-    c = conn.cursor()
-    c.execute("SELECT stock FROM products WHERE name = ?", (product_name,))
-    row = c.fetchone()
-    conn.close()
+    product_id = resolve_product(product_name)
+    if product_id is None:
+        return 0
+    with get_pool().connection() as conn:
+        row = conn.execute(SELECT_STOCK, (product_id,)).fetchone()
     return row[0] if row else 0
 
 
+# Look up a product row by name, ignoring case
+@timed("db.find_product")
+def find_product(name):
+    product_id = resolve_product(name)
+    if product_id is None:
+        return None
+    with get_pool().connection() as conn:
+        return conn.execute(SELECT_PRODUCT, (product_id,)).fetchone()
+
+
+# Product row by product_id, or None
+def get_product(product_id):
+    with get_pool().connection() as conn:
+        return conn.execute(SELECT_PRODUCT, (product_id,)).fetchone()
+
+
+# Insert or update a product's details
+@timed("db.save_product")
+def save_product(product_id, name, category, stock, threshold=2):
+    with get_pool().transaction() as conn:
+        conn.execute(ENSURE_KEY, (product_id,))
+        conn.execute(
+            """INSERT INTO products (product_id, name, stock, category, threshold)
+               VALUES (?, ?, ?, ?, ?)
+               ON CONFLICT (product_id) DO UPDATE SET
+                   name = excluded.name,
+                   stock = excluded.stock,
+                   category = excluded.category,
+                   threshold = excluded.threshold""",
+            (product_id, name, stock, category, threshold),
+        )
+    get_product_index().invalidate()
+
+
+# Apply one unit of movement and its event row on an open transaction
+def _move_stock(conn, product_id, direction):
+    if direction == "in":
+        conn.execute(ADD_STOCK, (product_id,))
+        qty = 1
+    else:
+        conn.execute(REMOVE_STOCK, (product_id,))
+        qty = -1
+    conn.execute(ENSURE_KEY, (product_id,))
+    conn.execute(LOG_EVENT, (now_ms(), qty, product_id))
+
+
+# Call `callback()` (from the writing thread) after each committed stock
+# write in this process; change_feed.py wakes on it
+def on_stock_change(callback):
+    _stock_listeners.append(callback)
+
+
+def remove_stock_listener(callback):
+    if callback in _stock_listeners:
+        _stock_listeners.remove(callback)
+
+
+def _stock_changed():
+    for callback in list(_stock_listeners):
+        callback()
+
+
+# Add or remove item from inventory by product_id, and log the time
+@timed("db.update_stock")
+def update_stock(product_id, direction):
+    with get_pool().transaction() as conn:
+        _move_stock(conn, product_id, direction)
+    _stock_changed()
+
+
 # Add or remove item from inventory, and log the time
+@timed("db.update_inventory")
 def update_inventory(product_name, direction):
-    conn = sqlite3.connect("inventory.db")
-    c = conn.cursor()
+    product_id = resolve_product(product_name)
+    if product_id is not None:
+        update_stock(product_id, direction)
 
-    # Get product_id using product name
-    c.execute("SELECT product_id FROM products WHERE name = ?", (product_name,))
-    row = c.fetchone()
 
-    if row:
-        product_id = row[0]
-        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+# Apply a batch of stock movements as one transaction: one aggregated
+# `stock = stock + n` per product plus one event row per (product_id,
+# epoch-ms timestamp, signed qty) via executemany
+@timed("db.apply_stock_events")
+def apply_stock_events(deltas, events):
+    with get_pool().transaction() as conn:
+        conn.executemany(APPLY_DELTA, [(n, pid) for pid, n in deltas.items() if n])
+        conn.executemany(ENSURE_KEY, [(pid,) for pid in deltas])
+        conn.executemany(LOG_EVENT, [(ts, qty, pid) for pid, ts, qty in events])
+    _stock_changed()
 
-        if direction == "in":
-            c.execute("UPDATE products SET stock = stock + 1 WHERE product_id = ?", (product_id,))
-            c.execute("INSERT INTO logs (product_id, in_time) VALUES (?, ?)", (product_id, now))
-        else:
-            c.execute("UPDATE products SET stock = stock - 1 WHERE product_id = ?", (product_id,))
-            c.execute("INSERT INTO logs (product_id, out_time) VALUES (?, ?)", (product_id, now))
 
-        conn.commit()
+# Counter bumped whenever a product goes in or out of stock, or products are
+# added, removed or renamed (migrations v3)
+def get_inventory_version():
+    with get_pool().connection() as conn:
+        return conn.execute("SELECT version FROM inventory_version").fetchone()[0]
 
-    conn.close()
+
+# Counter bumped by every insert, update or delete on products (migrations v4)
+def get_products_version():
+    with get_pool().connection() as conn:
+        return conn.execute("SELECT version FROM products_version").fetchone()[0]
 
 
 # Get all products and stock
 def get_all_products():
-    conn = sqlite3.connect("inventory.db")
-    c = conn.cursor()
-    c.execute("SELECT * FROM products")
-    products = c.fetchall()
-    conn.close()
-    return products
+    with get_pool().connection() as conn:
+        return conn.execute("SELECT * FROM products").fetchall()
+
+
+# Up to `limit` (product_id, name) rows whose name starts with `prefix`
+# (ignoring case), in name order; a range scan of idx_products_name_nocase
+def search_products(prefix="", limit=50):
+    pattern = prefix.strip().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+    with get_pool().connection() as conn:
+        return conn.execute(
+            """SELECT product_id, name FROM products WHERE name LIKE ? ESCAPE '\\'
+               ORDER BY name COLLATE NOCASE LIMIT ?""",
+            (pattern, limit),
+        ).fetchall()
+
+
+# (product_id, name, category, stock, threshold) rows in product_id order,
+# optionally one category (via idx_products_category) and one page
+def get_products(category=None, limit=-1, offset=0):
+    where = "WHERE category = ?" if category is not None else ""
+    params = (category,) if category is not None else ()
+    with get_pool().connection() as conn:
+        return conn.execute(
+            f"""SELECT product_id, name, category, stock, threshold FROM products {where}
+                ORDER BY product_id LIMIT ? OFFSET ?""",
+            (*params, limit, offset),
+        ).fetchall()
+
 
+# The `limit` best-stocked products as (product_id, name, category, stock)
+def get_top_stock(limit=50, category=None):
+    where = "WHERE category = ?" if category is not None else ""
+    params = (category,) if category is not None else ()
+    with get_pool().connection() as conn:
+        return conn.execute(
+            f"SELECT product_id, name, category, stock FROM products {where} ORDER BY stock DESC LIMIT ?",
+            (*params, limit),
+        ).fetchall()
 
-# Get product logs
+
+# All products in product_id order, `chunk_size` rows at a time (keyset pagination)
+def iter_products(chunk_size=10000):
+    last = ""
+    while True:
+        with get_pool().connection() as conn:
+            rows = conn.execute(
+                """SELECT product_id, name, category, stock, threshold FROM products
+                   WHERE product_id > ? ORDER BY product_id LIMIT ?""",
+                (last, chunk_size),
+            ).fetchall()
+        if not rows:
+            return
+        yield rows
+        last = rows[-1][0]
+
+
+# Get product logs as (log_id, product_id, in_time, out_time, qty) rows
 def get_logs():
-    conn = sqlite3.connect("inventory.db")
-    c = conn.cursor()
-    c.execute("SELECT * FROM logs ORDER BY log_id DESC")
-    logs = c.fetchall()
-    conn.close()
-    return logs
+    with get_pool().connection() as conn:
+        return conn.execute(f"{LOG_ROW} ORDER BY e.event_id DESC").fetchall()
+
+
+# One page of logs, newest first, strictly older than `before_id`
+def get_logs_page(before_id=None, limit=50):
+    with get_pool().connection() as conn:
+        if before_id is None:
+            return conn.execute(f"{LOG_ROW} ORDER BY e.event_id DESC LIMIT ?", (limit,)).fetchall()
+        return conn.execute(
+            f"{LOG_ROW} WHERE e.event_id < ? ORDER BY e.event_id DESC LIMIT ?", (before_id, limit)
+        ).fetchall()
+
+
+# Logs written after `after_id`, oldest first (incremental tail)
+def get_logs_since(after_id, limit=1000):
+    with get_pool().connection() as conn:
+        return conn.execute(
+            f"{LOG_ROW} WHERE e.event_id > ? ORDER BY e.event_id LIMIT ?", (after_id or 0, limit)
+        ).fetchall()
+
+
+# Stock events after `after_id` with their product's current stock, oldest
+# first (see STOCK_CHANGE_ROW)
+def get_stock_changes(after_id, limit=500):
+    with get_pool().connection() as conn:
+        return conn.execute(
+            f"{STOCK_CHANGE_ROW} WHERE e.event_id > ? ORDER BY e.event_id LIMIT ?", (after_id or 0, limit)
+        ).fetchall()
+
+
+# Newest event_id, 0 for an empty log
+def get_last_event_id():
+    with get_pool().connection() as conn:
+        return conn.execute("SELECT IFNULL(MAX(event_id), 0) FROM events").fetchone()[0]
+
+
+# Stream logs oldest first in chunks of at most `chunk_size` rows, optionally
+# limited to one product, to movements in [start, end) ('YYYY-MM-DD[ HH:MM:SS]'
+# local-time strings) and to log_id <= max_log_id. Each chunk is a keyset query
+# on event_id, so memory stays bounded however large the table is.
+def iter_logs(start=None, end=None, product_id=None, chunk_size=10000, max_log_id=None):
+    filters = []
+    params = []
+    if max_log_id is not None:
+        filters.append("e.event_id <= ?")
+        params.append(max_log_id)
+    if product_id is not None:
+        filters.append("e.product_key = (SELECT product_key FROM product_keys WHERE product_id = ?)")
+        params.append(product_id)
+    if start:
+        filters.append("e.ts >= ?")
+        params.append(to_epoch_ms(start))
+    if end:
+        filters.append("e.ts < ?")
+        params.append(to_epoch_ms(end))
+    where = "".join(f" AND {f}" for f in filters)
+    sql = f"{LOG_ROW} WHERE e.event_id > ?{where} ORDER BY e.event_id LIMIT ?"
+
+    last_id = 0
+    while True:
+        with get_pool().connection() as conn:
+            rows = conn.execute(sql, (last_id, *params, chunk_size)).fetchall()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1][0]
+
+
+# Record a scanner process heartbeat and its pipeline stats
+def report_scanner_status(camera_id, source, stats):
+    with get_pool().transaction() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO scanner_status VALUES (?, ?, ?, ?, ?)",
+            (camera_id, str(source), os.getpid(), time.time(), json.dumps(stats)),
+        )
+
+
+# Latest heartbeat of every scanner process
+def get_scanner_status():
+    with get_pool().connection() as conn:
+        rows = conn.execute("SELECT * FROM scanner_status ORDER BY camera_id").fetchall()
+    return [
+        {"camera_id": cid, "source": source, "pid": pid, "updated_at": updated, **json.loads(stats)}
+        for cid, source, pid, updated, stats in rows
+    ]
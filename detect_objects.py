@@ -1,15 +1,9 @@
 # detect_objects.py
-import torch
-model = torch.hub.load('ultralytics/yolov5', 'yolov5s', pretrained=True)
+from model_registry import get_model
 
-def detect_objects(frame):
-    results = model(frame)
-    labels = results.names
-    detections = results.pred[0]
-    detected = []
-
-    for *box, conf, cls in detections:
-        label = labels[int(cls)]
-        detected.append(label)
 
-    return list(set(detected))  # remove duplicates
+# Unique labels detected in a BGR frame, using the shared detector
+def detect_objects(frame):
+    detector = get_model("yolo")
+    detections = detector.detect(frame)
+    return list({detector.names[int(cls)] for cls in detections.cls})
@@ -0,0 +1,316 @@
+# detector.py
+# One object-detector interface over several CPU inference backends:
+#
+#   torch     ultralytics YOLO on PyTorch (.pt)
+#   onnx      exported model on ONNX Runtime (.onnx)
+#   openvino  exported model on OpenVINO (.xml, or an *_openvino_model directory)
+#
+# The backend follows the weights' extension unless DETECTOR_BACKEND is set.
+# Export a .pt checkpoint for the other backends with:
+#
+#   python detector.py export --format onnx
+#   python detector.py export --format openvino
+import abc
+import argparse
+import ast
+import os
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+YOLO_WEIGHTS = os.environ.get("YOLO_WEIGHTS", "yolov8n.pt")
+DETECTOR_BACKEND = os.environ.get("DETECTOR_BACKEND", "")
+DETECTOR_IMGSZ = int(os.environ.get("DETECTOR_IMGSZ", "640"))
+DETECTOR_CONF = float(os.environ.get("DETECTOR_CONF", "0.25"))
+DETECTOR_IOU = float(os.environ.get("DETECTOR_IOU", "0.45"))
+# Comma-separated class labels to keep, or "inventory" for the labels that
+# resolve to a product at load time; empty keeps every class
+DETECTOR_CLASSES = os.environ.get("DETECTOR_CLASSES", "")
+DETECTOR_THREADS = int(os.environ.get("DETECTOR_THREADS", "0"))
+
+# xyxy: (N, 4) float32 pixels, conf: (N,) float32, cls: (N,) int
+Detections = namedtuple("Detections", ["xyxy", "conf", "cls"])
+
+EMPTY = Detections(np.zeros((0, 4), np.float32), np.zeros(0, np.float32), np.zeros(0, int))
+
+
+def _class_ids(names, classes):
+    if not classes:
+        return None
+    if classes == "inventory":
+        from db_utils import resolve_product
+
+        return sorted(i for i, label in names.items() if resolve_product(label))
+    wanted = {label.strip().lower() for label in classes.split(",") if label.strip()}
+    return sorted(i for i, label in names.items() if label.lower() in wanted)
+
+
+# Draw boxes and labels onto `image` in place; `scale` maps frame pixels to
+# image pixels (e.g. for a downsized preview)
+def draw_detections(image, detections, names, scale=1.0):
+    boxes = (detections.xyxy * scale).astype(int)
+    for (x1, y1, x2, y2), score, cls in zip(boxes, detections.conf, detections.cls):
+        cv2.rectangle(image, (x1, y1), (x2, y2), (0, 255, 0), 2)
+        cv2.putText(image, f"{names.get(int(cls), cls)} {score:.2f}", (x1, max(y1 - 5, 10)),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+    return image
+
+
+# Shared interface: detect() returns Detections in frame pixels,
+# detect_batch() one Detections per frame from a single forward pass where
+# the backend allows, draw() renders them, names maps class id -> label.
+# max_batch is the largest batch one forward pass takes (None: unlimited).
+# A class filter that matches no label (class_ids == []) detects nothing.
+class Detector(abc.ABC):
+    backend = None
+    max_batch = None
+
+    def __init__(self, names, imgsz=DETECTOR_IMGSZ, conf=DETECTOR_CONF, iou=DETECTOR_IOU,
+                 classes=DETECTOR_CLASSES):
+        self.names = names
+        self.imgsz = imgsz
+        self.conf = conf
+        self.iou = iou
+        self.class_ids = _class_ids(names, classes)
+
+    def detect(self, frame, conf=None):
+        return self.detect_batch([frame], conf)[0]
+
+    @abc.abstractmethod
+    def detect_batch(self, frames, conf=None):
+        ...
+
+    def draw(self, frame, detections):
+        return draw_detections(frame.copy(), detections, self.names)
+
+
+class TorchDetector(Detector):
+    backend = "torch"
+
+    def __init__(self, weights=YOLO_WEIGHTS, **options):
+        from ultralytics import YOLO
+
+        self.model = YOLO(weights)
+        super().__init__(dict(self.model.names), **options)
+
+    def detect_batch(self, frames, conf=None):
+        if self.class_ids == []:
+            return [EMPTY] * len(frames)
+        results = self.model.predict(
+            list(frames), imgsz=self.imgsz, conf=self.conf if conf is None else conf, iou=self.iou,
+            classes=self.class_ids, device="cpu", verbose=False,
+        )
+        return [
+            Detections(
+                result.boxes.xyxy.cpu().numpy(),
+                result.boxes.conf.cpu().numpy(),
+                result.boxes.cls.cpu().numpy().astype(int),
+            )
+            for result in results
+        ]
+
+
+# Pre/post-processing for exported YOLO graphs: letterboxed Bx3xSxS float
+# input; output (B, 4 + classes, anchors) for YOLOv8+ or (B, anchors,
+# 5 + classes) with objectness for YOLOv5, decoded and NMS'd here. Graphs
+# exported with a static batch size run in chunks of it, padded.
+class ExportedDetector(Detector):
+    def _letterbox(self, frame):
+        h, w = frame.shape[:2]
+        ratio = min(self.imgsz / h, self.imgsz / w)
+        nh, nw = round(h * ratio), round(w * ratio)
+        top, left = (self.imgsz - nh) // 2, (self.imgsz - nw) // 2
+        canvas = np.full((self.imgsz, self.imgsz, 3), 114, np.uint8)
+        canvas[top:top + nh, left:left + nw] = cv2.resize(frame, (nw, nh), interpolation=cv2.INTER_LINEAR)
+        blob = cv2.dnn.blobFromImage(canvas, 1 / 255.0, swapRB=True)
+        return blob, ratio, left, top
+
+    def _decode(self, output, ratio, left, top, conf):
+        output = output[0]
+        if output.shape[0] < output.shape[1]:
+            output = output.T  # YOLOv8: (4 + classes, anchors)
+            boxes, scores = output[:, :4], output[:, 4:]
+        else:
+            boxes, scores = output[:, :4], output[:, 5:] * output[:, 4:5]
+
+        if self.class_ids is not None:
+            ids = np.asarray(self.class_ids, int)
+            sub = scores[:, ids]
+            best = sub.argmax(1)
+            cls, score = ids[best], sub[np.arange(len(sub)), best]
+        else:
+            cls = scores.argmax(1)
+            score = scores[np.arange(len(scores)), cls]
+        keep = score >= conf
+        if not keep.any():
+            return EMPTY
+        boxes, score, cls = boxes[keep], score[keep], cls[keep]
+
+        # centre-size -> corners, undo the letterbox
+        xyxy = np.empty_like(boxes)
+        xyxy[:, :2] = boxes[:, :2] - boxes[:, 2:] / 2
+        xyxy[:, 2:] = boxes[:, :2] + boxes[:, 2:] / 2
+        xyxy -= np.array([left, top, left, top], np.float32)
+        xyxy /= ratio
+
+        # Class-aware NMS: offset each class into its own coordinate range
+        offset = (cls * 4096.0)[:, None]
+        shifted = xyxy + offset
+        rects = np.concatenate([shifted[:, :2], shifted[:, 2:] - shifted[:, :2]], axis=1)
+        kept = cv2.dnn.NMSBoxes(rects.tolist(), score.tolist(), conf, self.iou)
+        kept = np.asarray(kept, int).reshape(-1)
+        return Detections(xyxy[kept].astype(np.float32), score[kept].astype(np.float32), cls[kept].astype(int))
+
+    @abc.abstractmethod
+    def _infer(self, blob):
+        ...
+
+    def detect_batch(self, frames, conf=None):
+        if self.class_ids == []:
+            return [EMPTY] * len(frames)
+        conf = self.conf if conf is None else conf
+        prepared = [self._letterbox(frame) for frame in frames]
+        blobs = np.concatenate([blob for blob, _, _, _ in prepared])
+        step = self.max_batch or len(blobs)
+        outputs = []
+        for start in range(0, len(blobs), step):
+            chunk = blobs[start:start + step]
+            count = len(chunk)
+            if count < step:
+                chunk = np.concatenate([chunk, np.zeros((step - count, *chunk.shape[1:]), chunk.dtype)])
+            outputs.append(self._infer(chunk)[:count])
+        outputs = np.concatenate(outputs)
+        return [
+            self._decode(outputs[i:i + 1], ratio, left, top, conf)
+            for i, (_, ratio, left, top) in enumerate(prepared)
+        ]
+
+
+# Numbered labels when an export carries no class names, from its output dims
+def _fallback_names(dims):
+    rows, cols = dims[-2:]
+    count = rows - 4 if rows < cols else cols - 5
+    return {i: str(i) for i in range(count)}
+
+
+def _parse_names(value):
+    if isinstance(value, dict):
+        return {int(k): str(v) for k, v in value.items()}
+    if isinstance(value, str):
+        try:
+            return _parse_names(ast.literal_eval(value))
+        except (ValueError, SyntaxError):
+            return None
+    if isinstance(value, (list, tuple)):
+        return dict(enumerate(value))
+    return None
+
+
+class OnnxDetector(ExportedDetector):
+    backend = "onnx"
+
+    def __init__(self, weights, threads=DETECTOR_THREADS, **options):
+        import onnxruntime as ort
+
+        session_options = ort.SessionOptions()
+        session_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            session_options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(weights, session_options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+        # ultralytics exports store class names and input size in the model metadata
+        meta = self.session.get_modelmeta().custom_metadata_map
+        names = _parse_names(meta.get("names")) or {}
+        shape = self.session.get_inputs()[0].shape
+        if isinstance(shape[0], int):
+            self.max_batch = shape[0]
+        if isinstance(shape[-1], int):
+            options["imgsz"] = shape[-1]  # static export: its input size wins
+        super().__init__(names, **options)
+        if not names:
+            self.names = _fallback_names(self.session.get_outputs()[0].shape)
+
+    def _infer(self, blob):
+        return self.session.run(None, {self.input_name: blob})[0]
+
+
+class OpenVinoDetector(ExportedDetector):
+    backend = "openvino"
+
+    def __init__(self, weights, threads=DETECTOR_THREADS, **options):
+        import openvino as ov
+
+        directory = weights if os.path.isdir(weights) else os.path.dirname(weights)
+        if os.path.isdir(weights):
+            weights = next(os.path.join(weights, f) for f in sorted(os.listdir(weights)) if f.endswith(".xml"))
+        config = {"INFERENCE_NUM_THREADS": threads} if threads else {}
+        core = ov.Core()
+        model = core.read_model(weights)
+        self.compiled = core.compile_model(model, "CPU", config)
+        batch = model.input(0).get_partial_shape()[0]
+        if batch.is_static:
+            self.max_batch = batch.get_length()
+        self.request = self.compiled.create_infer_request()
+
+        names = None
+        metadata = os.path.join(directory, "metadata.yaml")
+        if os.path.exists(metadata):
+            import yaml
+
+            with open(metadata) as f:
+                meta = yaml.safe_load(f)
+            names = _parse_names(meta.get("names"))
+            options["imgsz"] = (meta.get("imgsz") or [DETECTOR_IMGSZ])[0]
+        super().__init__(names or {}, **options)
+        if not names:
+            self.names = _fallback_names([d.get_length() for d in self.compiled.output(0).get_partial_shape()])
+
+    def _infer(self, blob):
+        return self.request.infer({0: blob})[self.compiled.output(0)]
+
+
+BACKENDS = {"torch": TorchDetector, "onnx": OnnxDetector, "openvino": OpenVinoDetector}
+
+
+def backend_for(weights):
+    if weights.endswith(".onnx"):
+        return "onnx"
+    if weights.endswith(".xml") or weights.rstrip("/").endswith("_openvino_model"):
+        return "openvino"
+    return "torch"
+
+
+def load_detector(weights=YOLO_WEIGHTS, backend=DETECTOR_BACKEND, **options):
+    backend = backend or backend_for(weights)
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown detector backend: {backend} (expected one of {', '.join(BACKENDS)})")
+    if backend != "torch" and not os.path.exists(weights):
+        raise FileNotFoundError(f"Detector weights not found: {weights} (export them with `python detector.py export`)")
+    return BACKENDS[backend](weights, **options)
+
+
+# Export a .pt checkpoint with ultralytics; returns the exported path.
+# `batch` fixes the batch size; dynamic=True leaves it (and the image size) open.
+def export(weights=YOLO_WEIGHTS, fmt="onnx", imgsz=DETECTOR_IMGSZ, batch=1, dynamic=False):
+    from ultralytics import YOLO
+
+    return YOLO(weights).export(format=fmt, imgsz=imgsz, batch=batch, dynamic=dynamic)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the detector for ONNX Runtime / OpenVINO")
+    sub = parser.add_subparsers(dest="command", required=True)
+    exporter = sub.add_parser("export")
+    exporter.add_argument("--weights", default=YOLO_WEIGHTS)
+    exporter.add_argument("--format", choices=["onnx", "openvino"], default="onnx")
+    exporter.add_argument("--imgsz", type=int, default=DETECTOR_IMGSZ)
+    exporter.add_argument("--batch", type=int, default=1, help="static batch size (see inference_scheduler.py)")
+    exporter.add_argument("--dynamic", action="store_true", help="dynamic batch and image size")
+    args = parser.parse_args()
+    print(f"Exported {export(args.weights, args.format, args.imgsz, args.batch, args.dynamic)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,17 @@
 import cv2
-from deepface import DeepFace
 
-# Load Haar cascade for face detection
-face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+from face_detector import FaceDetector
+from face_tracker import FaceTracker
+from metrics import get_metrics, timer
+from model_registry import get_model
+
+# Load (and warm up) the face detector and emotion model. Detection runs on a
+# downscaled frame, mostly around the previous faces (see face_detector.py)
+detector = FaceDetector()
+batcher = get_model("emotion")
+
+# Stable face IDs; emotion is re-scored only when a face is new, changed or due
+tracker = FaceTracker()
 
 # Initialize webcam
 cap = cv2.VideoCapture(0)
@@ -15,35 +24,44 @@ print("🔍 Press 'q' to quit the real-time emotion detection window.")
 
 while True:
     # Read frame
-    ret, frame = cap.read()
+    with timer("emotion.capture"):
+        ret, frame = cap.read()
     if not ret:
         print("❌ Failed to grab frame")
         break
 
-    # Convert to grayscale and RGB
+    # Convert to grayscale
     gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    rgb = cv2.cvtColor(gray, cv2.COLOR_GRAY2RGB)
 
     # Detect faces
-    faces = face_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(30, 30))
+    with timer("emotion.face_detect"):
+        faces = detector.detect(frame, gray)
 
-    for (x, y, w, h) in faces:
-        face_roi = rgb[y:y + h, x:x + w]
+    try:
+        # Analyze only new/changed faces, in one batched forward pass
+        with timer("emotion.analyze"):
+            results = tracker.step(gray, faces, batcher)
+    except Exception as e:
+        print(f"Emotion detection failed: {e}")
+        results = []
+        for (x, y, w, h) in faces:
+            cv2.putText(frame, "Detection Error", (x, y - 10),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
 
-        try:
-            # Analyze the face
-            result = DeepFace.analyze(face_roi, actions=['emotion'], enforce_detection=False)
-            emotion = result[0]['dominant_emotion']
+    for result in results:
+        emotion = result['dominant_emotion']
+        x, y, w, h = (result['region'][k] for k in ('x', 'y', 'w', 'h'))
 
-            # Draw bounding box and label
-            cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
-            cv2.putText(frame, emotion, (x, y - 10),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.9, (36, 255, 12), 2)
+        # Draw bounding box and label
+        cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
+        cv2.putText(frame, f"#{result['track_id']} {emotion}", (x, y - 10),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.9, (36, 255, 12), 2)
 
-        except Exception as e:
-            print(f"Emotion detection failed: {e}")
-            cv2.putText(frame, "Detection Error", (x, y - 10),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+    # Smoothed mood of every face in view, as used for recommendations
+    mood = tracker.mood()
+    if mood:
+        cv2.putText(frame, f"Mood: {mood['dominant_emotion']}", (10, 30),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.9, (255, 200, 0), 2)
 
     # Display frame
     cv2.imshow("🧠 Real-time Emotion Detection", frame)
@@ -54,5 +72,9 @@ while True:
         break
 
 # Cleanup
+print(f"Face detection: {detector.stats()}")
+print(f"Emotion model calls: {tracker.stats()}")
+for stage, stats in get_metrics().snapshot()["stages"].items():
+    print(f"{stage}: p50 {stats['p50_ms']} ms, p95 {stats['p95_ms']} ms, p99 {stats['p99_ms']} ms")
 cap.release()
 cv2.destroyAllWindows()
@@ -0,0 +1,100 @@
+# emotion_batch.py
+import threading
+import time
+
+import cv2
+import numpy as np
+from deepface import DeepFace
+
+# Output order of DeepFace's facial-expression model
+EMOTION_LABELS = ["angry", "disgust", "fear", "happy", "sad", "surprise", "neutral"]
+FACE_SIZE = 48
+
+
+# Underlying Keras model of DeepFace's emotion client
+def load_emotion_model():
+    try:
+        client = DeepFace.build_model("Emotion", task="facial_attribute")
+    except TypeError:
+        # deepface < 0.0.90 has no `task` argument
+        client = DeepFace.build_model("Emotion")
+    return getattr(client, "model", client)
+
+
+# One face crop -> 48x48 grayscale in [0, 1], written into `out`
+def _preprocess(frame, box, out):
+    x, y, w, h = (int(v) for v in box)
+    crop = frame[max(y, 0):y + h, max(x, 0):x + w]
+    if crop.ndim == 3:
+        crop = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+    cv2.resize(crop, (FACE_SIZE, FACE_SIZE), dst=out, interpolation=cv2.INTER_AREA)
+
+
+# Run the emotion model once over every face in one or more frames.
+# Faces are cropped, resized and stacked into a reused input buffer; each
+# result has the same shape as a DeepFace.analyze entry
+# ({"emotion": {label: percent}, "dominant_emotion": label, "region": {...}}).
+class EmotionBatcher:
+    def __init__(self, model=None, max_batch=64):
+        self.model = model if model is not None else load_emotion_model()
+        self.max_batch = max_batch
+        self._gray = np.empty((max_batch, FACE_SIZE, FACE_SIZE), dtype=np.uint8)
+        self._batch = np.empty((max_batch, FACE_SIZE, FACE_SIZE, 1), dtype=np.float32)
+        self._lock = threading.Lock()
+        self.faces = 0
+        self.forward_passes = 0
+        self.seconds = 0.0
+
+    # Per-face probability matrix (N x 7) for a list of (frame, box) pairs
+    def predict(self, crops):
+        with self._lock:
+            return self._predict(crops)
+
+    def _predict(self, crops):
+        probs = np.empty((len(crops), len(EMOTION_LABELS)), dtype=np.float32)
+        for start in range(0, len(crops), self.max_batch):
+            chunk = crops[start:start + self.max_batch]
+            n = len(chunk)
+            for i, (frame, box) in enumerate(chunk):
+                _preprocess(frame, box, self._gray[i])
+            np.multiply(self._gray[:n, :, :, None], 1 / 255, out=self._batch[:n], casting="unsafe")
+
+            started = time.perf_counter()
+            probs[start:start + n] = np.asarray(self.model.predict_on_batch(self._batch[:n]))
+            self.seconds += time.perf_counter() - started
+            self.forward_passes += 1
+        self.faces += len(crops)
+        return probs
+
+    # DeepFace-style results for every face box in one frame
+    def analyze_frame(self, frame, boxes):
+        return self.analyze_frames([(frame, boxes)])[0]
+
+    # DeepFace-style results for faces across a window of frames, one
+    # forward pass per `max_batch` faces; returns one list per frame
+    def analyze_frames(self, frames):
+        crops = [(frame, box) for frame, boxes in frames for box in boxes]
+        if not crops:
+            return [[] for _ in frames]
+        probs = self.predict(crops)
+
+        results = []
+        i = 0
+        for frame, boxes in frames:
+            per_frame = []
+            for box in boxes:
+                per_frame.append(to_result(probs[i], box))
+                i += 1
+            results.append(per_frame)
+        return results
+
+
+# Convert one probability row to a DeepFace.analyze-shaped dict
+def to_result(probs, box=None):
+    total = float(probs.sum()) or 1.0
+    emotion = {label: float(p) * 100 / total for label, p in zip(EMOTION_LABELS, probs)}
+    result = {"emotion": emotion, "dominant_emotion": EMOTION_LABELS[int(np.argmax(probs))]}
+    if box is not None:
+        x, y, w, h = (int(v) for v in box)
+        result["region"] = {"x": x, "y": y, "w": w, "h": h}
+    return result
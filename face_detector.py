@@ -0,0 +1,192 @@
+# face_detector.py
+import os
+import time
+
+import cv2
+import numpy as np
+
+from model_registry import get_model
+from object_tracker import corners, iou_matrix
+
+# "haar" (OpenCV cascade) or "dnn" (OpenCV ResNet-10 SSD, see model_registry)
+FACE_DETECTOR = os.environ.get("FACE_DETECTOR", "haar")
+# Frames (and ROIs) are resized by this factor before detection
+FACE_SCALE = float(os.environ.get("FACE_SCALE", "0.5"))
+# Run detection every N frames; frames in between reuse the last boxes
+FACE_DETECT_EVERY = int(os.environ.get("FACE_DETECT_EVERY", "1"))
+# Between full-frame searches, only search around the previous faces, with
+# this margin (fraction of face size) on each side; a negative value disables ROIs
+FACE_ROI_MARGIN = float(os.environ.get("FACE_ROI_MARGIN", "0.5"))
+# Every N detection runs search the whole frame to pick up new faces
+FACE_FULL_EVERY = int(os.environ.get("FACE_FULL_EVERY", "10"))
+FACE_MIN_SIZE = int(os.environ.get("FACE_MIN_SIZE", "30"))
+FACE_DNN_CONFIDENCE = float(os.environ.get("FACE_DNN_CONFIDENCE", "0.5"))
+
+
+class HaarBackend:
+    needs_gray = True
+
+    def __init__(self, cascade=None, scale_factor=1.1, min_neighbors=5):
+        self.cascade = cascade if cascade is not None else get_model("face_cascade")
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+
+    def detect(self, image, min_size):
+        boxes = self.cascade.detectMultiScale(
+            image, scaleFactor=self.scale_factor, minNeighbors=self.min_neighbors, minSize=(min_size, min_size)
+        )
+        return [tuple(int(v) for v in box) for box in boxes]
+
+
+class DnnBackend:
+    needs_gray = False
+
+    def __init__(self, net=None, confidence=FACE_DNN_CONFIDENCE, input_size=300):
+        self.net = net if net is not None else get_model("face_dnn")
+        self.confidence = confidence
+        self.input_size = input_size
+
+    def detect(self, image, min_size):
+        h, w = image.shape[:2]
+        if image.ndim == 2:
+            image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+        size = (self.input_size, self.input_size)
+        self.net.setInput(cv2.dnn.blobFromImage(image, 1.0, size, (104.0, 177.0, 123.0)))
+        # (1, 1, N, 7): image_id, class, confidence, x1, y1, x2, y2 (normalized)
+        detections = self.net.forward()[0, 0]
+        detections = detections[detections[:, 2] >= self.confidence]
+
+        corners = np.clip(detections[:, 3:7], 0.0, 1.0) * np.array([w, h, w, h], np.float32)
+        boxes = []
+        for x1, y1, x2, y2 in corners.astype(int):
+            if x2 - x1 >= min_size and y2 - y1 >= min_size:
+                boxes.append((x1, y1, x2 - x1, y2 - y1))
+        return boxes
+
+
+BACKENDS = {"haar": HaarBackend, "dnn": DnnBackend}
+
+
+def make_backend(name=FACE_DETECTOR):
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown face detector: {name} (expected one of {', '.join(BACKENDS)})")
+    return BACKENDS[name]()
+
+
+# Drop boxes overlapping an earlier one (ROIs can overlap)
+def _dedupe(boxes, threshold=0.5):
+    scores = iou_matrix(corners(boxes), corners(boxes))
+    kept = []
+    for i in range(len(boxes)):
+        if all(scores[i, k] < threshold for k in kept):
+            kept.append(i)
+    return [boxes[i] for i in kept]
+
+
+# Search windows around the previous faces, as (x1, y1, x2, y2) clipped to
+# the frame, with overlapping windows merged
+def _rois(boxes, margin, width, height):
+    rois = []
+    for x, y, w, h in boxes:
+        pad = int(margin * max(w, h))
+        rois.append([max(0, x - pad), max(0, y - pad), min(width, x + w + pad), min(height, y + h + pad)])
+
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(rois)):
+            for j in range(i + 1, len(rois)):
+                a, b = rois[i], rois[j]
+                if a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]:
+                    rois[i] = [min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])]
+                    del rois[j]
+                    merged = True
+                    break
+            if merged:
+                break
+    return rois
+
+
+# Face detection front-end shared by the app, emotion.py and the replay
+# benchmark. Each frame is either skipped (reusing the last boxes), searched
+# in full, or searched only in windows around the previous faces; searches
+# run on a downscaled image and boxes come back in full-frame coordinates.
+class FaceDetector:
+    def __init__(self, backend=None, scale=FACE_SCALE, detect_every=FACE_DETECT_EVERY,
+                 roi_margin=FACE_ROI_MARGIN, full_every=FACE_FULL_EVERY, min_size=FACE_MIN_SIZE):
+        self.backend = backend if backend is not None else make_backend()
+        self.scale = scale
+        self.detect_every = max(1, detect_every)
+        self.roi_margin = roi_margin
+        self.full_every = max(1, full_every)
+        self.min_size = min_size
+
+        self.boxes = []
+        self.frames = 0
+        self.runs = 0
+        self.skipped = 0
+        self.full_searches = 0
+        self.roi_searches = 0
+        self._searched_pixels = 0
+        self._frame_pixels = 0
+        self._seconds = 0.0
+
+    def reset(self):
+        self.boxes = []
+        self.runs = 0
+
+    def _search(self, image, roi):
+        x1, y1, x2, y2 = roi
+        crop = image[y1:y2, x1:x2]
+        self._searched_pixels += crop.shape[0] * crop.shape[1]
+        if self.scale != 1.0:
+            crop = cv2.resize(crop, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        min_size = max(1, round(self.min_size * self.scale))
+        return [
+            (int(x / self.scale) + x1, int(y / self.scale) + y1, int(w / self.scale), int(h / self.scale))
+            for x, y, w, h in self.backend.detect(crop, min_size)
+        ]
+
+    # Face boxes (x, y, w, h) for a BGR frame; pass `gray` if already computed
+    def detect(self, frame, gray=None):
+        self.frames += 1
+        height, width = frame.shape[:2]
+        self._frame_pixels += height * width
+
+        if self.boxes and (self.frames - 1) % self.detect_every:
+            self.skipped += 1
+            return self.boxes
+
+        if self.backend.needs_gray:
+            image = gray if gray is not None else (
+                cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+            )
+        else:
+            image = frame
+
+        started = time.perf_counter()
+        if not self.boxes or self.roi_margin < 0 or self.runs % self.full_every == 0:
+            boxes = self._search(image, (0, 0, width, height))
+            self.full_searches += 1
+        else:
+            boxes = []
+            for roi in _rois(self.boxes, self.roi_margin, width, height):
+                boxes.extend(self._search(image, roi))
+            boxes = _dedupe(boxes)
+            self.roi_searches += 1
+        self._seconds += time.perf_counter() - started
+
+        self.runs += 1
+        self.boxes = boxes
+        return boxes
+
+    def stats(self):
+        runs = self.full_searches + self.roi_searches
+        return {
+            "frames": self.frames,
+            "skipped": self.skipped,
+            "full_searches": self.full_searches,
+            "roi_searches": self.roi_searches,
+            "searched_fraction": round(self._searched_pixels / self._frame_pixels, 3) if self._frame_pixels else 0.0,
+            "mean_search_ms": round(self._seconds * 1000 / runs, 3) if runs else 0.0,
+        }
@@ -0,0 +1,190 @@
+# face_tracker.py
+import itertools
+import os
+
+import cv2
+import numpy as np
+
+from emotion_batch import to_result
+from metrics import timer
+from object_tracker import corners, iou_matrix
+
+# Re-run emotion inference for a track at least every REFRESH_FRAMES frames
+REFRESH_FRAMES = int(os.environ.get("FACE_REFRESH_FRAMES", "15"))
+# ... or sooner when its 16x16 thumbnail changes by this mean absolute difference
+CHANGE_THRESHOLD = float(os.environ.get("FACE_CHANGE_THRESHOLD", "12"))
+# Weight of the newest reading in the per-track moving average
+EMA_ALPHA = float(os.environ.get("FACE_EMA_ALPHA", "0.3"))
+# Frames read for one mood reading (see read_mood)
+MOOD_FRAMES = int(os.environ.get("MOOD_FRAMES", "8"))
+
+THUMB_SIZE = 16
+
+
+def _centroid_close(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    dx = (ax + aw / 2) - (bx + bw / 2)
+    dy = (ay + ah / 2) - (by + bh / 2)
+    return (dx * dx + dy * dy) ** 0.5 < 0.5 * max(aw, ah, bw, bh)
+
+
+def _thumbnail(gray, box):
+    x, y, w, h = box
+    crop = gray[max(y, 0):y + h, max(x, 0):x + w]
+    return cv2.resize(crop, (THUMB_SIZE, THUMB_SIZE), interpolation=cv2.INTER_AREA).astype(np.int16)
+
+
+class FaceTrack:
+    def __init__(self, track_id, box):
+        self.track_id = track_id
+        self.box = box
+        self.missed = 0
+        self.emotion = None
+        self.last_inferred = None
+        self.thumbnail = None
+
+    # DeepFace.analyze-shaped result from the smoothed distribution
+    def result(self):
+        if self.emotion is None:
+            return None
+        result = to_result(self.emotion, self.box)
+        result["track_id"] = self.track_id
+        return result
+
+
+# Associates Haar face boxes across frames into stable tracks and decides
+# which tracks actually need the emotion model this frame. Steady faces are
+# re-scored every `refresh_every` frames; everything in between reuses the
+# track's exponentially smoothed distribution.
+class FaceTracker:
+    def __init__(self, iou_threshold=0.3, max_missed=10, refresh_every=REFRESH_FRAMES,
+                 change_threshold=CHANGE_THRESHOLD, alpha=EMA_ALPHA):
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.refresh_every = refresh_every
+        self.change_threshold = change_threshold
+        self.alpha = alpha
+
+        self.tracks = []
+        self.frame_index = 0
+        self._ids = itertools.count(1)
+        self.face_frames = 0
+        self.inferences = 0
+
+    def _associate(self, boxes):
+        scores = iou_matrix(corners([t.box for t in self.tracks]), corners(boxes))
+        pairs = sorted(
+            ((scores[ti, bi], ti, bi) for ti in range(len(self.tracks)) for bi in range(len(boxes))),
+            reverse=True,
+        )
+        matched = {}
+        used_tracks = set()
+        for score, ti, bi in pairs:
+            if ti in used_tracks or bi in matched:
+                continue
+            if score < self.iou_threshold and not _centroid_close(self.tracks[ti].box, boxes[bi]):
+                continue
+            matched[bi] = ti
+            used_tracks.add(ti)
+        return matched
+
+    # Update tracks with this frame's boxes; returns (active tracks, tracks needing inference)
+    def update(self, gray, boxes):
+        self.frame_index += 1
+        boxes = [tuple(int(v) for v in b) for b in boxes]
+        matched = self._associate(boxes)
+
+        seen = []
+        for bi, box in enumerate(boxes):
+            if bi in matched:
+                track = self.tracks[matched[bi]]
+                track.box = box
+                track.missed = 0
+            else:
+                track = FaceTrack(next(self._ids), box)
+            seen.append(track)
+
+        for ti, track in enumerate(self.tracks):
+            if ti not in matched.values():
+                track.missed += 1
+                if track.missed <= self.max_missed:
+                    seen.append(track)
+        self.tracks = seen
+
+        stale = []
+        for track in self.tracks:
+            if track.missed:
+                continue
+            thumb = _thumbnail(gray, track.box)
+            if (track.last_inferred is None
+                    or self.frame_index - track.last_inferred >= self.refresh_every
+                    or np.abs(thumb - track.thumbnail).mean() > self.change_threshold):
+                track.thumbnail = thumb
+                stale.append(track)
+
+        self.face_frames += len(boxes)
+        return [t for t in self.tracks if not t.missed], stale
+
+    # Blend fresh probabilities into a track's moving average
+    def observe(self, track, probs):
+        probs = np.asarray(probs, dtype=np.float32)
+        probs = probs / (probs.sum() or 1.0)
+        if track.emotion is None:
+            track.emotion = probs
+        else:
+            track.emotion = self.alpha * probs + (1 - self.alpha) * track.emotion
+        track.last_inferred = self.frame_index
+        self.inferences += 1
+
+    # Track, run the batcher only on stale tracks, and return smoothed results
+    def step(self, frame, boxes, batcher):
+        gray = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        active, stale = self.update(gray, boxes)
+        if stale:
+            probs = batcher.predict([(gray, t.box) for t in stale])
+            for track, p in zip(stale, probs):
+                self.observe(track, p)
+        return [t.result() for t in active if t.emotion is not None]
+
+    # Smoothed mood across all visible faces, for recommendations, as a
+    # DeepFace.analyze-shaped dict ("emotion" distribution and
+    # "dominant_emotion"); None while no visible face has been scored
+    def mood(self):
+        readings = [t.emotion for t in self.tracks if t.emotion is not None and not t.missed]
+        if not readings:
+            return None
+        return to_result(np.mean(readings, axis=0))
+
+    def stats(self):
+        return {
+            "tracks": len([t for t in self.tracks if not t.missed]),
+            "face_frames": self.face_frames,
+            "inferences": self.inferences,
+            "skip_ratio": round(1 - self.inferences / self.face_frames, 3) if self.face_frames else 0.0,
+        }
+
+
+# Mood from a short burst of `frames` frames off an open capture rather than
+# a single frame: every frame is scored and folded into each face track's
+# moving average, so a blink or a passing expression does not pick the
+# recommendations. Returns (mood() result or None, last frame's per-face
+# results); raises IOError if no frame could be read.
+def read_mood(cap, detector, batcher, frames=MOOD_FRAMES):
+    tracker = FaceTracker(refresh_every=1)
+    results = []
+    read = 0
+    for _ in range(max(1, frames)):
+        with timer("mood.capture"):
+            ok, frame = cap.read()
+        if not ok:
+            break
+        read += 1
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        with timer("mood.face_detect"):
+            faces = detector.detect(frame, gray)
+        with timer("mood.emotion"):
+            results = tracker.step(gray, faces, batcher)
+    if not read:
+        raise IOError("Failed to capture from camera.")
+    return tracker.mood(), results
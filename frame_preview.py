@@ -0,0 +1,99 @@
+# frame_preview.py
+# Live preview for the scan views. Inference keeps working on full frames;
+# only frames a browser is actually shown are downsized to PREVIEW_MAX_WIDTH,
+# annotated and JPEG-encoded, at most PREVIEW_MAX_FPS times a second. Between
+# encodes the previous JPEG is handed out again. st.image() serves JPEG
+# bytes as they are, rather than turning every full-resolution frame into a
+# PNG, and cv2.imencode takes BGR directly, so no RGB copy is made.
+import os
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+from detector import draw_detections
+from metrics import get_metrics
+
+PREVIEW_MAX_WIDTH = int(os.environ.get("PREVIEW_MAX_WIDTH", "640"))
+PREVIEW_JPEG_QUALITY = int(os.environ.get("PREVIEW_JPEG_QUALITY", "70"))
+PREVIEW_MAX_FPS = float(os.environ.get("PREVIEW_MAX_FPS", "10"))
+RATE_WINDOW = 2.0
+
+
+class PreviewEncoder:
+    def __init__(self, max_width=PREVIEW_MAX_WIDTH, quality=PREVIEW_JPEG_QUALITY, max_fps=PREVIEW_MAX_FPS):
+        self.max_width = max_width
+        self.quality = quality
+        self.interval = 1 / max_fps if max_fps > 0 else 0.0
+        self._params = [cv2.IMWRITE_JPEG_QUALITY, int(quality)]
+        self._buffer = None
+        self._lock = threading.Lock()
+        self._jpeg = None
+        self._frame = None
+        self._encoded_at = 0.0
+        self._recent = deque()
+
+        self.encoded = 0
+        self.reused = 0
+        self.bytes = 0
+        self.encode_seconds = 0.0
+
+    # Downsize `frame` into the preallocated buffer (reallocated only when
+    # the frame size changes); returns the buffer and the scale applied
+    def _resize(self, frame):
+        h, w = frame.shape[:2]
+        scale = min(1.0, self.max_width / w) if self.max_width > 0 else 1.0
+        shape = (max(1, round(h * scale)), max(1, round(w * scale))) + frame.shape[2:]
+        if self._buffer is None or self._buffer.shape != shape or self._buffer.dtype != frame.dtype:
+            self._buffer = np.empty(shape, frame.dtype)
+        if shape == frame.shape:
+            np.copyto(self._buffer, frame)
+        else:
+            cv2.resize(frame, (shape[1], shape[0]), dst=self._buffer, interpolation=cv2.INTER_AREA)
+        return self._buffer, shape[1] / w
+
+    # JPEG bytes of a BGR frame with `detections` (labelled from `names`) and
+    # overlay(image, scale) drawn on the preview only. The same frame, or any
+    # frame within 1 / max_fps of the last encode, gets the previous JPEG.
+    def encode(self, frame, detections=None, names=None, overlay=None):
+        with self._lock:
+            now = time.monotonic()
+            if self._jpeg is not None and (frame is self._frame or now - self._encoded_at < self.interval):
+                self.reused += 1
+                return self._jpeg
+
+            started = time.perf_counter()
+            image, scale = self._resize(frame)
+            if detections is not None:
+                draw_detections(image, detections, names or {}, scale)
+            if overlay is not None:
+                overlay(image, scale)
+            ok, encoded = cv2.imencode(".jpg", image, self._params)
+            if not ok:
+                return self._jpeg
+            elapsed = time.perf_counter() - started
+            self.encode_seconds += elapsed
+            get_metrics().observe("preview.encode", elapsed)
+
+            self._jpeg = encoded.tobytes()
+            self._frame = frame
+            self._encoded_at = now
+            self.encoded += 1
+            self.bytes += len(self._jpeg)
+            self._recent.append((now, len(self._jpeg)))
+            return self._jpeg
+
+    def stats(self):
+        with self._lock:
+            now = time.monotonic()
+            while self._recent and now - self._recent[0][0] > RATE_WINDOW:
+                self._recent.popleft()
+            return {
+                "preview_fps": round(len(self._recent) / RATE_WINDOW, 1),
+                "preview_kb_per_sec": round(sum(size for _, size in self._recent) / RATE_WINDOW / 1024, 1),
+                "preview_kb_per_frame": round(self.bytes / self.encoded / 1024, 1) if self.encoded else 0.0,
+                "preview_encode_ms": round(self.encode_seconds * 1000 / self.encoded, 2) if self.encoded else 0.0,
+                "preview_reused": self.reused,
+            }
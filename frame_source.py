@@ -0,0 +1,58 @@
+# frame_source.py
+import os
+
+import cv2
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+
+
+# Command-line / config value -> VideoCapture index, file path or directory
+def parse_source(spec):
+    if isinstance(spec, str) and spec.isdigit():
+        return int(spec)
+    return spec
+
+
+# Cameras and network streams produce frames in real time and may drop them;
+# files, image directories and frame iterables are replayed frame by frame
+def is_live(source):
+    if isinstance(source, int):
+        return True
+    if not isinstance(source, str):
+        return False
+    return source.startswith(("rtsp://", "rtmp://", "http://", "https://"))
+
+
+def _image_paths(directory):
+    return sorted(
+        os.path.join(directory, name)
+        for name in os.listdir(directory)
+        if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS
+    )
+
+
+# Yield BGR frames from a camera index, video file / stream URL or image
+# directory; an iterable of frames (e.g. a capped replay) is passed through
+def iter_frames(source):
+    if not isinstance(source, (int, str)):
+        yield from source
+        return
+
+    if isinstance(source, str) and os.path.isdir(source):
+        for path in _image_paths(source):
+            frame = cv2.imread(path)
+            if frame is not None:
+                yield frame
+        return
+
+    cap = cv2.VideoCapture(source)
+    try:
+        if not cap.isOpened():
+            raise IOError(f"Could not open video source {source!r}")
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                return
+            yield frame
+    finally:
+        cap.release()
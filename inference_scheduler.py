@@ -0,0 +1,230 @@
+# inference_scheduler.py
+# One detector shared by many cameras. Each source submits frames; a single
+# worker thread gathers them into batches for detect_batch() and hands every
+# source its own Detections back through a Future.
+#
+# A batch is run as soon as it is full (SCHEDULER_MAX_BATCH frames) or the
+# oldest waiting frame has waited SCHEDULER_MAX_WAIT_MS. Batches are filled
+# round-robin, one frame per source per turn starting after the source
+# served last, so a camera submitting faster than the others cannot crowd
+# them out; each source keeps at most SCHEDULER_SOURCE_QUEUE frames waiting
+# and drops its oldest beyond that.
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+
+import numpy as np
+
+from detector import Detections
+from metrics import count, get_metrics
+
+MAX_BATCH = int(os.environ.get("SCHEDULER_MAX_BATCH", "8"))
+MAX_WAIT_MS = float(os.environ.get("SCHEDULER_MAX_WAIT_MS", "15"))
+SOURCE_QUEUE = int(os.environ.get("SCHEDULER_SOURCE_QUEUE", "2"))
+LATENCY_WINDOW = 256
+
+
+def _percentile(values, q):
+    ordered = sorted(values)
+    return round(ordered[int(q * (len(ordered) - 1))], 2) if ordered else 0.0
+
+
+# Frames waiting for one source, and what that source has been served
+class _Source:
+    def __init__(self, capacity):
+        self.pending = deque()
+        self.capacity = capacity
+        self.submitted = 0
+        self.processed = 0
+        self.dropped = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def stats(self):
+        return {
+            "submitted": self.submitted,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "waiting": len(self.pending),
+            "p50_ms": _percentile(self.latencies, 0.5),
+            "p95_ms": _percentile(self.latencies, 0.95),
+        }
+
+
+class InferenceScheduler:
+    def __init__(self, detector, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS, source_queue=SOURCE_QUEUE):
+        self.detector = detector
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait_ms / 1000
+        self.source_queue = max(1, source_queue)
+        self._sources = OrderedDict()
+        self._cond = threading.Condition()
+        self._waiting = 0
+        self._thread = None
+        self._stop = False
+
+        self.batches = 0
+        self.frames = 0
+        self.inference_seconds = 0.0
+        self.errors = 0
+        self._sizes = deque(maxlen=LATENCY_WINDOW)
+
+    @property
+    def names(self):
+        return self.detector.names
+
+    def start(self):
+        with self._cond:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop = False
+                self._thread = threading.Thread(target=self._run, name="inference-scheduler", daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self):
+        with self._cond:
+            self._stop = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    # Queue a frame for `source`; resolves to its Detections. With the
+    # source's queue full, its oldest frame is dropped (its Future cancelled).
+    def submit(self, source, frame, conf=None):
+        future = Future()
+        with self._cond:
+            state = self._sources.get(source)
+            if state is None:
+                state = self._sources[source] = _Source(self.source_queue)
+            if len(state.pending) >= state.capacity:
+                _, _, _, dropped = state.pending.popleft()
+                dropped.cancel()
+                state.dropped += 1
+                self._waiting -= 1
+            state.pending.append((time.monotonic(), frame, conf, future))
+            state.submitted += 1
+            self._waiting += 1
+            self._cond.notify_all()
+        if self._thread is None:
+            self.start()
+        return future
+
+    def detect(self, source, frame, conf=None):
+        return self.submit(source, frame, conf).result()
+
+    # Stop reporting a source (e.g. when its camera is closed)
+    def forget(self, source):
+        with self._cond:
+            state = self._sources.pop(source, None)
+            if state is not None:
+                for _, _, _, future in state.pending:
+                    future.cancel()
+                self._waiting -= len(state.pending)
+
+    def _oldest(self):
+        return min(state.pending[0][0] for state in self._sources.values() if state.pending)
+
+    # One frame per source per turn, starting after the source served last
+    def _take_batch(self):
+        batch = []
+        while len(batch) < self.max_batch and self._waiting:
+            for source in list(self._sources):
+                state = self._sources[source]
+                if not state.pending:
+                    continue
+                batch.append((source, *state.pending.popleft()))
+                self._waiting -= 1
+                self._sources.move_to_end(source)
+                if len(batch) == self.max_batch:
+                    break
+        return batch
+
+    def _next_batch(self):
+        with self._cond:
+            while not self._stop:
+                if self._waiting >= self.max_batch:
+                    return self._take_batch()
+                if self._waiting:
+                    remaining = self._oldest() + self.max_wait - time.monotonic()
+                    if remaining <= 0:
+                        return self._take_batch()
+                    self._cond.wait(remaining)
+                else:
+                    self._cond.wait()
+            return None
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            batch = [item for item in batch if item[4].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            confs = [conf if conf is not None else self.detector.conf for _, _, _, conf, _ in batch]
+
+            started = time.perf_counter()
+            try:
+                results = self.detector.detect_batch([frame for _, _, frame, _, _ in batch], min(confs))
+            except Exception as e:
+                self.errors += 1
+                for item in batch:
+                    item[4].set_exception(e)
+                continue
+            elapsed = time.perf_counter() - started
+            get_metrics().observe("scheduler.detect_batch", elapsed)
+            count("scheduler.frames", len(batch))
+
+            done = time.monotonic()
+            with self._cond:
+                self.batches += 1
+                self.frames += len(batch)
+                self.inference_seconds += elapsed
+                self._sizes.append(len(batch))
+                for (source, submitted, _, _, _), _ in zip(batch, results):
+                    state = self._sources.get(source)
+                    if state is not None:
+                        state.processed += 1
+                        state.latencies.append((done - submitted) * 1000)
+
+            # The batch ran at the lowest requested confidence; trim each
+            # result back to its own
+            for (_, _, _, _, future), detections, conf in zip(batch, results, confs):
+                if conf > min(confs):
+                    keep = detections.conf >= conf
+                    detections = Detections(detections.xyxy[keep], detections.conf[keep], detections.cls[keep])
+                future.set_result(detections)
+
+    def stats(self):
+        with self._cond:
+            mean_batch = float(np.mean(self._sizes)) if self._sizes else 0.0
+            return {
+                "batches": self.batches,
+                "frames": self.frames,
+                "max_batch": self.max_batch,
+                "mean_batch": round(mean_batch, 2),
+                "utilization": round(mean_batch / self.max_batch, 3),
+                "mean_batch_ms": round(self.inference_seconds * 1000 / self.batches, 2) if self.batches else 0.0,
+                "errors": self.errors,
+                "waiting": self._waiting,
+                "sources": {
+                    str(source): self._sources[source].stats() for source in sorted(self._sources, key=str)
+                },
+            }
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+# Shared process-wide scheduler over the registry's detector
+def get_scheduler():
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            from model_registry import get_model
+
+            _scheduler = InferenceScheduler(get_model("yolo")).start()
+        return _scheduler
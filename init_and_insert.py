@@ -1,74 +1,73 @@
 import streamlit as st
 import cv2
-import sqlite3
-import json
-import pandas as pd
-from datetime import datetime
-from deepface import DeepFace
-from ultralytics import YOLO
-
-# Load YOLOv8
-model = YOLO("yolov8n.pt")
-
-# Load product catalog
-@st.cache_data
-def load_catalog():
-    with open("catalog.json", "r") as f:
-        return json.load(f)
-
-# DB functions
-def get_all_products():
-    with sqlite3.connect("inventory.db") as conn:
-        return conn.execute("SELECT * FROM products").fetchall()
-
-def get_logs():
-    with sqlite3.connect("inventory.db") as conn:
-        return conn.execute("SELECT * FROM logs ORDER BY log_id DESC").fetchall()
-
-def update_inventory(product_id, direction):
-    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    with sqlite3.connect("inventory.db") as conn:
-        if direction == "in":
-            conn.execute("UPDATE products SET stock = stock + 1 WHERE product_id = ?", (product_id,))
-            conn.execute("INSERT INTO logs (product_id, in_time) VALUES (?, ?)", (product_id, now))
-        else:
-            conn.execute("UPDATE products SET stock = stock - 1 WHERE product_id = ?", (product_id,))
-            conn.execute("INSERT INTO logs (product_id, out_time) VALUES (?, ?)", (product_id, now))
-        conn.commit()
+
+from db_utils import init_db
+from face_detector import FaceDetector
+from face_tracker import read_mood
+from model_registry import get_model, get_registry
+from recommend_cache import get_recommendation_cache
+from scan_pipeline import ScanPipeline
+from ui_panels import (
+    export_logs_panel,
+    inventory_overview,
+    manual_stock_update,
+    recent_logs,
+    scan_panel,
+    scanner_services,
+    stock_movement,
+)
+
+RECOMMEND_TOP_K = 5
+
+# Create tables and indexes once per server process
+@st.cache_resource(show_spinner=False)
+def setup_db():
+    init_db()
+
+setup_db()
+
+# Models load on first use and are shared by every session
+@st.cache_resource(show_spinner="Loading model…")
+def load_model(name):
+    return get_model(name)
 
 # Initialize session state
 if "scanning" not in st.session_state:
     st.session_state.scanning = False
+if "pipeline" not in st.session_state:
+    st.session_state.pipeline = None
 
 # Page setup
 st.set_page_config(page_title="🧠 Smart Inventory System", layout="wide")
 st.title("📦 Smart Inventory + Emotion Recommender")
 
+# Model load and warm-up timings (models stay unloaded until first use)
+with st.sidebar.expander("🧠 Models"):
+    st.json(get_registry().stats())
+
+with st.sidebar.expander("⚡ Recommendation Cache"):
+    st.json(get_recommendation_cache().metrics())
+
 # 🎭 Emotion Detection
 if st.button("🎭 Detect Emotion & Suggest Products"):
     cam = cv2.VideoCapture(0)
-    ret, frame = cam.read()
-    if ret:
-        faces = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml') \
-            .detectMultiScale(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), 1.1, 4)
-        for (x, y, w, h) in faces:
-            face = frame[y:y + h, x:x + w]
-            try:
-                result = DeepFace.analyze(face, actions=['emotion'], enforce_detection=False)
-                emotion = result[0]['dominant_emotion']
-                st.success(f"Detected Emotion: {emotion}")
-                st.markdown("### 🛍️ Recommended Products")
-                catalog = load_catalog()
-                for item in catalog:
-                    if item["emotion"].lower() == emotion.lower():
-                        col1, col2 = st.columns([1, 4])
-                        with col1:
-                            st.image(item["image"], width=100)
-                        with col2:
-                            st.markdown(f"**[{item['name']}]({item['link']})**  \nCategory: _{item['category']}_")
-            except Exception as e:
-                st.error(f"Error: {e}")
-    cam.release()
+    try:
+        # Smoothed over a short burst of frames (face_tracker.read_mood)
+        mood, results = read_mood(cam, FaceDetector(), load_model("emotion"))
+    except Exception as e:
+        st.error(f"Error: {e}")
+        mood = None
+    finally:
+        cam.release()
+    if mood:
+        st.success(f"Detected Emotion: {mood['dominant_emotion']}")
+        st.markdown("### 🛍️ Recommended Products")
+        for item in get_recommendation_cache().recommend(mood["emotion"], k=RECOMMEND_TOP_K):
+            col1, col2 = st.columns([1, 4])
+            with col1:
+                st.image(item["image"], width=100)
+            with col2:
+                st.markdown(f"**[{item['name']}]({item['link']})**  \nCategory: _{item['category']}_")
 
 st.markdown("---")
 
@@ -78,84 +77,33 @@ st.subheader("📸 Scan Product to Update Inventory")
 # Toggle scanner state
 if not st.session_state.scanning:
     if st.button("📦 Start Product Scanning", key="start_button"):
+        st.session_state.pipeline = ScanPipeline(load_model("yolo")).start()
         st.session_state.scanning = True
+        st.rerun()
 else:
     if st.button("🛑 Stop Scanning", key="stop_button"):
+        st.session_state.pipeline.stop()
+        st.session_state.pipeline = None
         st.session_state.scanning = False
+        st.rerun()
 
 # Run scanning logic
 if st.session_state.scanning:
-    cap = cv2.VideoCapture(0)
-    detected = []
-
-    stframe = st.empty()  # Streamlit placeholder
-
-    while st.session_state.scanning:
-        ret, frame = cap.read()
-        if not ret:
-            break
-
-        results = model.predict(frame, verbose=False)
-        names = model.names
-        classes = results[0].boxes.cls.cpu().numpy().astype(int)
+    scan_panel()
 
-        for cls in classes:
-            name = names[cls]
-            if name not in detected:
-                detected.append(name)
-                with sqlite3.connect("inventory.db") as conn:
-                    row = conn.execute("SELECT * FROM products WHERE LOWER(name) = ?", (name.lower(),)).fetchone()
-                    if row:
-                        update_inventory(row[0], "in")
-                        st.success(f"✅ {name} stock increased.")
-                    else:
-                        st.warning(f"⚠️ {name} not found. Add manually.")
-
-        stframe.image(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB), channels="RGB")
-
-    cap.release()
-    cv2.destroyAllWindows()
+scanner_services()
 
 st.markdown("---")
 
 # 📊 Inventory Dashboard
-st.subheader("📊 Inventory Overview")
-if st.button("🔁 Refresh"):
-    st.rerun()
-
-products = get_all_products()
-low_stock = []
+inventory_overview()
 
-for pid, name, stock, cat, threshold in products:
-    st.markdown(f"**{name}** ({cat}) — Stock: `{stock}`")
-    if stock <= threshold:
-        low_stock.append(name)
-
-if low_stock:
-    st.error(f"🚨 Low stock: {', '.join(low_stock)}")
+stock_movement()
 
 # 🛠️ Manual Stock Editor
-st.subheader("🛠️ Manual Stock Update")
-product_names = [p[1] for p in products]
-selected = st.selectbox("Select Product", product_names)
-
-pid = next((p[0] for p in products if p[1] == selected), None)
-col1, col2 = st.columns(2)
-with col1:
-    if st.button("➕ Add 1"):
-        update_inventory(pid, "in")
-        st.success(f"{selected} stock increased")
-with col2:
-    if st.button("➖ Remove 1"):
-        update_inventory(pid, "out")
-        st.success(f"{selected} stock decreased")
+manual_stock_update()
 
 # 📜 Logs & Export
-st.subheader("📜 Recent Logs")
-logs = get_logs()
-log_df = pd.DataFrame(logs, columns=["Log ID", "Product ID", "In Time", "Out Time"])
-st.dataframe(log_df)
-
-if st.button("⬇ Export Logs to CSV"):
-    log_df.to_csv("logs_export.csv", index=False)
-    st.success("Exported as logs_export.csv")
+recent_logs()
+
+export_logs_panel()
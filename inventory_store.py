@@ -0,0 +1,129 @@
+# inventory_store.py
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+# Store settings, overridable from the environment
+DB_PATH = os.environ.get("INVENTORY_DB", "inventory.db")
+POOL_SIZE = int(os.environ.get("INVENTORY_DB_POOL_SIZE", "4"))
+SYNCHRONOUS = os.environ.get("INVENTORY_DB_SYNCHRONOUS", "NORMAL")
+BUSY_TIMEOUT_MS = int(os.environ.get("INVENTORY_DB_BUSY_TIMEOUT_MS", "5000"))
+CACHED_STATEMENTS = int(os.environ.get("INVENTORY_DB_CACHED_STATEMENTS", "256"))
+
+SYNCHRONOUS_MODES = {"OFF", "NORMAL", "FULL", "EXTRA"}
+
+
+# Thread-safe pool of long-lived WAL connections to one SQLite file.
+# Connections are opened lazily up to `size` and handed out one thread at a
+# time; because they stay open, sqlite3's per-connection statement cache keeps
+# every query prepared across calls.
+class ConnectionPool:
+    def __init__(self, path=DB_PATH, size=POOL_SIZE, synchronous=SYNCHRONOUS,
+                 busy_timeout_ms=BUSY_TIMEOUT_MS, cached_statements=CACHED_STATEMENTS):
+        synchronous = synchronous.upper()
+        if synchronous not in SYNCHRONOUS_MODES:
+            raise ValueError(f"Unknown synchronous mode: {synchronous}")
+        if size < 1:
+            raise ValueError("Pool size must be at least 1")
+
+        self.path = path
+        self.size = size
+        self.synchronous = synchronous
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cached_statements = cached_statements
+
+        self._idle = queue.LifoQueue()
+        self._all = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.path,
+            timeout=self.busy_timeout_ms / 1000,
+            check_same_thread=False,
+            isolation_level=None,
+            cached_statements=self.cached_statements,
+        )
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute(f"PRAGMA synchronous = {self.synchronous}")
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        return conn
+
+    def _acquire(self):
+        if self._closed:
+            raise RuntimeError("Connection pool is closed")
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if len(self._all) < self.size:
+                conn = self._connect()
+                self._all.append(conn)
+                return conn
+
+        try:
+            return self._idle.get(timeout=self.busy_timeout_ms / 1000)
+        except queue.Empty:
+            raise TimeoutError("Timed out waiting for a pooled database connection") from None
+
+    def _release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+
+    # Borrow a connection in autocommit mode (reads, single statements)
+    @contextmanager
+    def connection(self):
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            self._release(conn)
+
+    # Borrow a connection inside BEGIN IMMEDIATE ... COMMIT.
+    # Taking the write lock up front avoids deadlocking on lock upgrade under WAL.
+    @contextmanager
+    def transaction(self):
+        with self.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            for conn in self._all:
+                conn.close()
+            self._all.clear()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+# Shared process-wide pool for a database file
+def get_pool(path=None):
+    path = path or DB_PATH
+    with _pools_lock:
+        pool = _pools.get(path)
+        if pool is None:
+            pool = _pools[path] = ConnectionPool(path)
+        return pool
+
+
+# Close and forget every shared pool (tests, benchmarks, shutdown)
+def close_pools():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
@@ -0,0 +1,130 @@
+# inventory_summary.py
+from inventory_store import get_pool
+
+# A product is low on stock when stock - threshold <= 0; NULLs count as not low
+LOW = "IFNULL({p}.stock - {p}.threshold <= 0, 0)"
+
+SUMMARY_SCHEMA = [
+    # Per-category product count, stock and low-stock count
+    '''CREATE TABLE IF NOT EXISTS category_stock (
+        category TEXT PRIMARY KEY,
+        products INTEGER NOT NULL,
+        stock INTEGER NOT NULL,
+        low_stock INTEGER NOT NULL
+    ) WITHOUT ROWID''',
+
+    # Per-product running movement totals
+    '''CREATE TABLE IF NOT EXISTS product_totals (
+        product_id TEXT PRIMARY KEY,
+        total_in INTEGER NOT NULL,
+        total_out INTEGER NOT NULL
+    ) WITHOUT ROWID''',
+
+    # Low-stock set without scanning products; partial, so only low rows are indexed
+    "CREATE INDEX IF NOT EXISTS idx_products_low_stock ON products (stock - threshold) WHERE stock - threshold <= 0",
+
+    f'''CREATE TRIGGER IF NOT EXISTS trg_products_summary_insert AFTER INSERT ON products BEGIN
+        INSERT INTO category_stock (category, products, stock, low_stock)
+        VALUES (IFNULL(NEW.category, ''), 1, IFNULL(NEW.stock, 0), {LOW.format(p="NEW")})
+        ON CONFLICT (category) DO UPDATE SET
+            products = products + 1,
+            stock = stock + excluded.stock,
+            low_stock = low_stock + excluded.low_stock;
+    END''',
+
+    f'''CREATE TRIGGER IF NOT EXISTS trg_products_summary_update
+    AFTER UPDATE OF stock, category, threshold ON products BEGIN
+        UPDATE category_stock SET
+            products = products - 1,
+            stock = stock - IFNULL(OLD.stock, 0),
+            low_stock = low_stock - {LOW.format(p="OLD")}
+        WHERE category = IFNULL(OLD.category, '');
+        INSERT INTO category_stock (category, products, stock, low_stock)
+        VALUES (IFNULL(NEW.category, ''), 1, IFNULL(NEW.stock, 0), {LOW.format(p="NEW")})
+        ON CONFLICT (category) DO UPDATE SET
+            products = products + 1,
+            stock = stock + excluded.stock,
+            low_stock = low_stock + excluded.low_stock;
+        DELETE FROM category_stock WHERE products = 0;
+    END''',
+
+    f'''CREATE TRIGGER IF NOT EXISTS trg_products_summary_delete AFTER DELETE ON products BEGIN
+        UPDATE category_stock SET
+            products = products - 1,
+            stock = stock - IFNULL(OLD.stock, 0),
+            low_stock = low_stock - {LOW.format(p="OLD")}
+        WHERE category = IFNULL(OLD.category, '');
+        DELETE FROM category_stock WHERE products = 0;
+    END''',
+
+    '''CREATE TRIGGER IF NOT EXISTS trg_events_totals AFTER INSERT ON events BEGIN
+        INSERT INTO product_totals (product_id, total_in, total_out)
+        SELECT product_id, MAX(NEW.qty, 0), MAX(-NEW.qty, 0)
+        FROM product_keys WHERE product_key = NEW.product_key
+        ON CONFLICT (product_id) DO UPDATE SET
+            total_in = total_in + excluded.total_in,
+            total_out = total_out + excluded.total_out;
+    END''',
+]
+
+
+# Create the summary tables, triggers and index on an open transaction,
+# backfilling from existing rows the first time
+def ensure_summary(conn):
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'category_stock'"
+    ).fetchone()
+    for statement in SUMMARY_SCHEMA:
+        conn.execute(statement)
+    if exists:
+        return
+
+    conn.execute(f'''INSERT INTO category_stock (category, products, stock, low_stock)
+        SELECT IFNULL(category, ''), COUNT(*), IFNULL(SUM(stock), 0), SUM({LOW.format(p="products")})
+        FROM products GROUP BY IFNULL(category, '')''')
+    conn.execute('''INSERT INTO product_totals (product_id, total_in, total_out)
+        SELECT k.product_id, SUM(MAX(e.qty, 0)), SUM(MAX(-e.qty, 0))
+        FROM events e JOIN product_keys k ON k.product_key = e.product_key
+        GROUP BY k.product_id''')
+
+
+# Rebuild the summary tables from scratch (e.g. after bulk edits with triggers off)
+def rebuild_summary():
+    with get_pool().transaction() as conn:
+        conn.execute("DROP TABLE IF EXISTS category_stock")
+        conn.execute("DROP TABLE IF EXISTS product_totals")
+        ensure_summary(conn)
+
+
+# Headline numbers: product count, total stock, low-stock count
+def get_overview():
+    with get_pool().connection() as conn:
+        products, stock, low = conn.execute(
+            "SELECT IFNULL(SUM(products), 0), IFNULL(SUM(stock), 0), IFNULL(SUM(low_stock), 0) FROM category_stock"
+        ).fetchone()
+    return {"products": products, "stock": stock, "low_stock": low}
+
+
+# (category, products, stock, low_stock) rows
+def get_category_stock():
+    with get_pool().connection() as conn:
+        return conn.execute("SELECT * FROM category_stock ORDER BY category").fetchall()
+
+
+# Products at or below threshold, most depleted first, via idx_products_low_stock
+# (the WHERE clause must match the partial index's for SQLite to use it)
+def get_low_stock(limit=100):
+    with get_pool().connection() as conn:
+        return conn.execute(
+            "SELECT * FROM products WHERE stock - threshold <= 0 ORDER BY stock - threshold LIMIT ?",
+            (limit,),
+        ).fetchall()
+
+
+# Running in/out totals for one product
+def get_product_totals(product_id):
+    with get_pool().connection() as conn:
+        row = conn.execute(
+            "SELECT total_in, total_out FROM product_totals WHERE product_id = ?", (product_id,)
+        ).fetchone()
+    return {"in": row[0], "out": row[1]} if row else {"in": 0, "out": 0}
@@ -0,0 +1,52 @@
+# log_export.py
+import csv
+
+from db_utils import iter_logs
+
+LOG_COLUMNS = ["Log ID", "Product ID", "In Time", "Out Time", "Qty"]
+
+
+# Write matching logs to CSV chunk by chunk; returns the number of rows
+def export_logs_csv(path, start=None, end=None, product_id=None, chunk_size=10000, max_log_id=None):
+    rows = 0
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(LOG_COLUMNS)
+        for chunk in iter_logs(start, end, product_id, chunk_size, max_log_id):
+            writer.writerows(chunk)
+            rows += len(chunk)
+    return rows
+
+
+# Write matching logs to Parquet, one row group per chunk (requires pyarrow)
+def export_logs_parquet(path, start=None, end=None, product_id=None, chunk_size=100000, max_log_id=None):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Parquet export requires pyarrow: pip install pyarrow") from None
+
+    schema = pa.schema([
+        ("Log ID", pa.int64()),
+        ("Product ID", pa.string()),
+        ("In Time", pa.string()),
+        ("Out Time", pa.string()),
+        ("Qty", pa.int64()),
+    ])
+    rows = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        for chunk in iter_logs(start, end, product_id, chunk_size, max_log_id):
+            columns = list(zip(*chunk))
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(col, type=field.type) for col, field in zip(columns, schema)],
+                schema=schema,
+            ))
+            rows += len(chunk)
+    return rows
+
+
+EXPORTERS = {"csv": export_logs_csv, "parquet": export_logs_parquet}
+
+
+def export_logs(path, fmt="csv", **filters):
+    return EXPORTERS[fmt](path, **filters)
@@ -0,0 +1,224 @@
+# metrics.py
+# In-process timers and counters for the hot paths (capture, face detection,
+# emotion inference, object detection, product lookups and stock writes).
+#
+#   with timer("capture"):          # time a block
+#       ok, frame = cap.read()
+#
+#   @timed("db.resolve_product")    # time every call
+#   def resolve_product(name): ...
+#
+#   count("stock_events", n)        # bump a counter
+#
+# Each stage keeps cumulative Prometheus-style buckets plus its last
+# METRICS_WINDOW samples for p50/p95/p99. snapshot() returns JSON-ready
+# stats; prometheus_text() renders the text exposition format, and
+# serve_metrics() exposes both over HTTP (/metrics and /metrics.json).
+# METRICS_ENABLED=0 turns timers and counters into no-ops.
+import bisect
+import json
+import os
+import threading
+import time
+from collections import deque
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") != "0"
+METRICS_WINDOW = int(os.environ.get("METRICS_WINDOW", "1024"))
+# Interface serve_metrics() binds to. The endpoint has no authentication;
+# set METRICS_HOST=0.0.0.0 to expose it to other machines
+METRICS_HOST = os.environ.get("METRICS_HOST", "127.0.0.1")
+METRICS_PREFIX = "smart_inventory"
+# Histogram bucket upper bounds, in seconds
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _percentile(ordered, q):
+    return ordered[int(q * (len(ordered) - 1))] if ordered else 0.0
+
+
+# Durations of one stage: cumulative buckets / sum / count, and a window of
+# recent samples for quantiles
+class Histogram:
+    def __init__(self, window=METRICS_WINDOW):
+        self._lock = threading.Lock()
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, seconds):
+        index = bisect.bisect_left(BUCKETS, seconds)
+        with self._lock:
+            self.buckets[index] += 1
+            self.count += 1
+            self.sum += seconds
+            self.recent.append(seconds)
+
+    def stats(self):
+        with self._lock:
+            ordered = sorted(self.recent)
+            count, total = self.count, self.sum
+        return {
+            "count": count,
+            "mean_ms": round(total * 1000 / count, 3) if count else 0.0,
+            "p50_ms": round(_percentile(ordered, 0.5) * 1000, 3),
+            "p95_ms": round(_percentile(ordered, 0.95) * 1000, 3),
+            "p99_ms": round(_percentile(ordered, 0.99) * 1000, 3),
+            "max_ms": round(ordered[-1] * 1000, 3) if ordered else 0.0,
+        }
+
+
+# Context manager and decorator timing into one Histogram
+class _Timer:
+    __slots__ = ("histogram", "started")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started)
+        return False
+
+
+class _NoTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_TIMER = _NoTimer()
+
+
+class Metrics:
+    def __init__(self, window=METRICS_WINDOW):
+        self.window = window
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+
+    def histogram(self, stage):
+        histogram = self._histograms.get(stage)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(stage, Histogram(self.window))
+        return histogram
+
+    def timer(self, stage):
+        return _Timer(self.histogram(stage)) if METRICS_ENABLED else _NO_TIMER
+
+    def observe(self, stage, seconds):
+        if METRICS_ENABLED:
+            self.histogram(stage).observe(seconds)
+
+    def count(self, name, n=1):
+        if METRICS_ENABLED:
+            with self._lock:
+                self._counters[name] = self._counters.get(name, 0) + n
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+            self.started = time.time()
+
+    def snapshot(self):
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = dict(sorted(self._counters.items()))
+        return {
+            "uptime_seconds": round(time.time() - self.started, 1),
+            "stages": {stage: histogram.stats() for stage, histogram in histograms},
+            "counters": counters,
+        }
+
+    # Prometheus text exposition format (version 0.0.4)
+    def prometheus_text(self):
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+
+        name = f"{METRICS_PREFIX}_stage_seconds"
+        lines = [f"# HELP {name} Time spent per pipeline stage.", f"# TYPE {name} histogram"]
+        for stage, histogram in histograms:
+            with histogram._lock:
+                buckets, count, total = list(histogram.buckets), histogram.count, histogram.sum
+            cumulative = 0
+            for bound, n in zip(BUCKETS + (float("inf"),), buckets):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{name}_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {total!r}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {count}')
+
+        name = f"{METRICS_PREFIX}_events_total"
+        lines += [f"# HELP {name} Events counted per kind.", f"# TYPE {name} counter"]
+        for counter, value in counters:
+            lines.append(f'{name}{{name="{counter}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+_metrics = Metrics()
+
+
+# Shared process-wide metrics
+def get_metrics():
+    return _metrics
+
+
+def timer(stage):
+    return _metrics.timer(stage)
+
+
+def count(name, n=1):
+    _metrics.count(name, n)
+
+
+# Decorator: time every call of the function as `stage`
+def timed(stage):
+    def decorate(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with _metrics.timer(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if path == "/metrics":
+            body = _metrics.prometheus_text().encode()
+            content_type = "text/plain; version=0.0.4; charset=utf-8"
+        elif path == "/metrics.json":
+            body = json.dumps(_metrics.snapshot()).encode()
+            content_type = "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+# Serve /metrics (Prometheus text) and /metrics.json from a daemon thread;
+# returns the server (call shutdown() to stop it)
+def serve_metrics(port, host=METRICS_HOST):
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
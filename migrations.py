@@ -0,0 +1,202 @@
+# migrations.py
+# Versioned schema migrations, tracked in PRAGMA user_version. Each step runs
+# once, in order, inside init_db's transaction; derived tables (summary,
+# rollups) are (re)created by their own modules afterwards.
+import logging
+
+log = logging.getLogger(__name__)
+
+# Stock movement log row as (log_id, product_id, in_time, out_time, qty), with
+# local-time 'YYYY-MM-DD HH:MM:SS' text for the direction that applies
+LOG_ROW = '''SELECT e.event_id, k.product_id,
+        CASE WHEN e.qty > 0 THEN datetime(e.ts / 1000, 'unixepoch', 'localtime') END,
+        CASE WHEN e.qty < 0 THEN datetime(e.ts / 1000, 'unixepoch', 'localtime') END,
+        e.qty
+    FROM events e JOIN product_keys k ON k.product_key = e.product_key'''
+
+# Local-time text timestamp (as written by the old schema) -> epoch ms
+TEXT_TO_EPOCH_MS = "CAST(strftime('%s', {col}, 'utc') AS INTEGER) * 1000"
+
+
+# Copy old-style log rows into an events-shaped table, keeping their ids
+def _copy_logs(conn, source, target):
+    conn.execute(f'''INSERT INTO {target} (event_id, product_key, ts, qty)
+        SELECT l.log_id, k.product_key,
+               {TEXT_TO_EPOCH_MS.format(col="IFNULL(l.in_time, l.out_time)")},
+               CASE WHEN l.in_time IS NOT NULL THEN 1 ELSE -1 END
+        FROM {source} l JOIN product_keys k ON k.product_id = l.product_id
+        WHERE IFNULL(l.in_time, l.out_time) IS NOT NULL''')
+
+
+# v1: the schema as it was before migrations were tracked
+def _baseline(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS products (
+        product_id TEXT PRIMARY KEY,
+        name TEXT,
+        stock INTEGER,
+        category TEXT,
+        threshold INTEGER DEFAULT 2
+    )''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS logs (
+        log_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        product_id TEXT,
+        in_time TEXT,
+        out_time TEXT
+    )''')
+    # Heartbeats from headless scanner processes (scanner_service.py)
+    conn.execute('''CREATE TABLE IF NOT EXISTS scanner_status (
+        camera_id TEXT PRIMARY KEY,
+        source TEXT,
+        pid INTEGER,
+        updated_at REAL,
+        stats TEXT
+    )''')
+    # Case-insensitive name lookups for detection-to-product resolution
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_products_name_nocase ON products (name COLLATE NOCASE)")
+    # Per-product time-range filters on logs
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_logs_product_in ON logs (product_id, in_time)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_logs_product_out ON logs (product_id, out_time)")
+
+
+# v2: compact event log. logs(TEXT product_id, TEXT in_time / out_time) becomes
+# events(integer product_key, epoch-ms ts, signed qty); product codes get
+# integer surrogate keys in product_keys, which outlive deleted products so
+# history keeps its identity. `logs` stays as a read-only view.
+def _compact_events(conn):
+    conn.execute('''CREATE TABLE product_keys (
+        product_key INTEGER PRIMARY KEY,
+        product_id TEXT NOT NULL UNIQUE
+    )''')
+    # AUTOINCREMENT so ids are never reused after compaction (rollups and log
+    # tails resume from the last seen id)
+    conn.execute('''CREATE TABLE events (
+        event_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        product_key INTEGER NOT NULL REFERENCES product_keys (product_key),
+        ts INTEGER NOT NULL,
+        qty INTEGER NOT NULL
+    )''')
+
+    conn.execute('''INSERT OR IGNORE INTO product_keys (product_id)
+        SELECT product_id FROM products
+        UNION SELECT product_id FROM logs WHERE product_id IS NOT NULL''')
+    _copy_logs(conn, "logs", "events")
+    # Carry the id sequence over, including ids of trailing rows already deleted
+    conn.execute("DELETE FROM sqlite_sequence WHERE name = 'events'")
+    conn.execute('''INSERT INTO sqlite_sequence (name, seq)
+        SELECT 'events', MAX(seq) FROM (
+            SELECT seq FROM sqlite_sequence WHERE name = 'logs'
+            UNION ALL SELECT IFNULL(MAX(event_id), 0) FROM events
+        )''')
+
+    # Per-product history and time-range filters
+    conn.execute("CREATE INDEX idx_events_product_ts ON events (product_key, ts)")
+    conn.execute("CREATE INDEX idx_events_ts ON events (ts)")
+
+    archived = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'logs_archive'"
+    ).fetchone()
+    conn.execute('''CREATE TABLE events_archive (
+        event_id INTEGER PRIMARY KEY,
+        product_key INTEGER NOT NULL,
+        ts INTEGER NOT NULL,
+        qty INTEGER NOT NULL
+    )''')
+    if archived:
+        conn.execute('''INSERT OR IGNORE INTO product_keys (product_id)
+            SELECT product_id FROM logs_archive WHERE product_id IS NOT NULL''')
+        _copy_logs(conn, "logs_archive", "events_archive")
+        conn.execute("DROP TABLE logs_archive")
+
+    # Dropping logs also drops its indexes and the product_totals trigger;
+    # inventory_summary recreates the trigger on events
+    conn.execute("DROP TABLE logs")
+    conn.execute(f'''CREATE VIEW logs (log_id, product_id, in_time, out_time, qty) AS {LOG_ROW}''')
+
+    # Replaced by a partial index on low-stock rows only (see inventory_summary)
+    conn.execute("DROP INDEX IF EXISTS idx_products_low_stock")
+
+
+# v3: inventory version, bumped by triggers whenever the set of in-stock
+# products (or their identity) changes, from any process. Caches of
+# stock-filtered results key on it (see recommend_cache.py).
+def _inventory_version(conn):
+    conn.execute('''CREATE TABLE inventory_version (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL
+    )''')
+    conn.execute("INSERT INTO inventory_version VALUES (1, 0)")
+
+    bump = "UPDATE inventory_version SET version = version + 1 WHERE id = 1;"
+    conn.execute(f'''CREATE TRIGGER trg_products_version_stock AFTER UPDATE OF stock ON products
+        WHEN (IFNULL(OLD.stock, 0) > 0) <> (IFNULL(NEW.stock, 0) > 0)
+        BEGIN {bump} END''')
+    conn.execute(f'''CREATE TRIGGER trg_products_version_update AFTER UPDATE OF product_id, name ON products
+        BEGIN {bump} END''')
+    conn.execute(f"CREATE TRIGGER trg_products_version_insert AFTER INSERT ON products BEGIN {bump} END")
+    conn.execute(f"CREATE TRIGGER trg_products_version_delete AFTER DELETE ON products BEGIN {bump} END")
+
+
+# v4: products version, bumped by every write to products, for caches of
+# product listings (see test.py), and an index for listing one category
+def _products_version(conn):
+    conn.execute('''CREATE TABLE products_version (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL
+    )''')
+    conn.execute("INSERT INTO products_version VALUES (1, 0)")
+
+    bump = "UPDATE products_version SET version = version + 1 WHERE id = 1;"
+    for event in ("INSERT", "UPDATE", "DELETE"):
+        conn.execute(f"CREATE TRIGGER trg_products_changed_{event.lower()} AFTER {event} ON products BEGIN {bump} END")
+    conn.execute("CREATE INDEX idx_products_category ON products (category, product_id)")
+
+
+# v5: product names version, bumped only when products are added, removed,
+# renamed or re-keyed; the label -> product_id index (product_index.py) keys
+# on it, so stock updates do not force a reload
+def _product_names_version(conn):
+    conn.execute('''CREATE TABLE product_names_version (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL
+    )''')
+    conn.execute("INSERT INTO product_names_version VALUES (1, 0)")
+
+    bump = "UPDATE product_names_version SET version = version + 1 WHERE id = 1;"
+    conn.execute(f'''CREATE TRIGGER trg_product_names_update AFTER UPDATE OF product_id, name ON products
+        BEGIN {bump} END''')
+    conn.execute(f"CREATE TRIGGER trg_product_names_insert AFTER INSERT ON products BEGIN {bump} END")
+    conn.execute(f"CREATE TRIGGER trg_product_names_delete AFTER DELETE ON products BEGIN {bump} END")
+
+
+MIGRATIONS = [
+    (1, "baseline schema", _baseline),
+    (2, "compact event log", _compact_events),
+    (3, "inventory version", _inventory_version),
+    (4, "products version and category index", _products_version),
+    (5, "product names version", _product_names_version),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+# Apply pending migrations on an open transaction; returns the versions applied
+def migrate(conn):
+    current = schema_version(conn)
+    if current > SCHEMA_VERSION:
+        raise RuntimeError(
+            f"Database schema v{current} is newer than this code (v{SCHEMA_VERSION})"
+        )
+
+    applied = []
+    for version, description, step in MIGRATIONS:
+        if version <= current:
+            continue
+        step(conn)
+        conn.execute(f"PRAGMA user_version = {version}")
+        applied.append(version)
+        log.info("Migrated database to v%d: %s", version, description)
+    return applied
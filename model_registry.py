@@ -0,0 +1,126 @@
+# model_registry.py
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+FACE_CASCADE = os.environ.get(
+    "FACE_CASCADE", cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
+)
+# OpenCV DNN face detector (ResNet-10 SSD, Caffe), used when FACE_DETECTOR=dnn
+FACE_DNN_MODEL = os.environ.get("FACE_DNN_MODEL", "res10_300x300_ssd_iter_140000.caffemodel")
+FACE_DNN_CONFIG = os.environ.get("FACE_DNN_CONFIG", "deploy.prototxt")
+WARMUP_SIZE = 640
+
+
+# Object detector on the backend picked by YOLO_WEIGHTS / DETECTOR_BACKEND
+def _load_yolo():
+    from detector import load_detector
+    return load_detector()
+
+
+def _warm_yolo(detector):
+    detector.detect(np.zeros((WARMUP_SIZE, WARMUP_SIZE, 3), dtype=np.uint8))
+
+
+def _load_emotion():
+    from emotion_batch import EmotionBatcher
+    return EmotionBatcher()
+
+
+def _warm_emotion(batcher):
+    batcher.analyze_frame(np.zeros((96, 96), dtype=np.uint8), [(0, 0, 96, 96)])
+
+
+def _load_face_cascade():
+    cascade = cv2.CascadeClassifier(FACE_CASCADE)
+    if cascade.empty():
+        raise RuntimeError(f"Could not load face cascade from {FACE_CASCADE}")
+    return cascade
+
+
+def _warm_face_cascade(cascade):
+    cascade.detectMultiScale(np.zeros((240, 320), dtype=np.uint8), 1.1, 4)
+
+
+def _load_face_dnn():
+    for path in (FACE_DNN_MODEL, FACE_DNN_CONFIG):
+        if not os.path.exists(path):
+            raise RuntimeError(f"Face DNN file not found: {path} (set FACE_DNN_MODEL / FACE_DNN_CONFIG)")
+    return cv2.dnn.readNet(FACE_DNN_MODEL, FACE_DNN_CONFIG)
+
+
+def _warm_face_dnn(net):
+    net.setInput(cv2.dnn.blobFromImage(np.zeros((300, 300, 3), dtype=np.uint8), 1.0, (300, 300)))
+    net.forward()
+
+
+# name -> (loader, warm-up)
+MODELS = {
+    "yolo": (_load_yolo, _warm_yolo),
+    "emotion": (_load_emotion, _warm_emotion),
+    "face_cascade": (_load_face_cascade, _warm_face_cascade),
+    "face_dnn": (_load_face_dnn, _warm_face_dnn),
+}
+
+
+# Lazily loaded, process-wide models. Nothing is loaded until get() is
+# first called for a name; loading runs a dummy inference twice so the
+# first real frame does not pay graph/kernel setup, and records the
+# load, first (cold) and second (warm) inference times.
+class ModelRegistry:
+    def __init__(self, models=MODELS):
+        self._specs = dict(models)
+        self._models = {}
+        self._locks = {name: threading.Lock() for name in self._specs}
+        self._stats = {}
+
+    def get(self, name):
+        model = self._models.get(name)
+        if model is not None:
+            return model
+        if name not in self._specs:
+            raise KeyError(f"Unknown model: {name}")
+
+        with self._locks[name]:
+            if name not in self._models:
+                self._models[name] = self._load(name)
+            return self._models[name]
+
+    def _load(self, name):
+        loader, warm_up = self._specs[name]
+
+        started = time.perf_counter()
+        model = loader()
+        loaded = time.perf_counter()
+        warm_up(model)
+        cold = time.perf_counter()
+        warm_up(model)
+        warm = time.perf_counter()
+
+        self._stats[name] = {
+            "load_ms": round((loaded - started) * 1000, 1),
+            "cold_inference_ms": round((cold - loaded) * 1000, 1),
+            "warm_inference_ms": round((warm - cold) * 1000, 1),
+        }
+        return model
+
+    def loaded(self, name):
+        return name in self._models
+
+    def stats(self):
+        return {name: self._stats.get(name, "not loaded") for name in self._specs}
+
+
+_registry = ModelRegistry()
+
+
+# Shared model by name ("yolo", "emotion", "face_cascade", "face_dnn")
+def get_model(name):
+    return _registry.get(name)
+
+
+def get_registry():
+    return _registry
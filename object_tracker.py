@@ -0,0 +1,213 @@
+# object_tracker.py
+import itertools
+import os
+
+import numpy as np
+
+# Detections at or above HIGH_CONF start and extend tracks; those between
+# LOW_CONF and HIGH_CONF may only extend existing tracks (ByteTrack-style)
+HIGH_CONF = float(os.environ.get("TRACK_HIGH_CONF", "0.5"))
+LOW_CONF = float(os.environ.get("TRACK_LOW_CONF", "0.1"))
+MAX_MISSED = int(os.environ.get("TRACK_MAX_MISSED", "30"))
+MIN_HITS = int(os.environ.get("TRACK_MIN_HITS", "3"))
+
+# Counting line as normalized "x1,y1,x2,y2". With the default vertical line
+# a centre moving left-to-right counts "in" and right-to-left "out"; swap the
+# endpoints to reverse the direction
+SCAN_LINE = os.environ.get("SCAN_LINE", "0.5,0,0.5,1")
+# Optional counting zone as normalized "x,y;x,y;..." (overrides SCAN_LINE):
+# entering counts "in", leaving counts "out"
+SCAN_ZONE = os.environ.get("SCAN_ZONE", "")
+
+
+# Pairwise IoU of two lists of (x1, y1, x2, y2) boxes, as a len(a) x len(b)
+# array; the one IoU used by the object and face trackers and face detector
+def iou_matrix(a, b):
+    if not len(a) or not len(b):
+        return np.zeros((len(a), len(b)))
+    a = np.asarray(a, dtype=np.float32)[:, None, :]
+    b = np.asarray(b, dtype=np.float32)[None, :, :]
+    ix = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    iy = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    inter = ix * iy
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    return inter / np.maximum(area_a + area_b - inter, 1e-6)
+
+
+# (x, y, w, h) boxes, as the face modules use, to (x1, y1, x2, y2) for iou_matrix
+def corners(boxes):
+    return [(x, y, x + w, y + h) for x, y, w, h in boxes]
+
+
+class ObjectTrack:
+    def __init__(self, track_id, box, cls, conf):
+        self.track_id = track_id
+        self.box = np.asarray(box, dtype=np.float32)
+        self.velocity = np.zeros(4, dtype=np.float32)
+        self.cls = cls
+        self.conf = conf
+        self.hits = 1
+        self.missed = 0
+        self.side = None
+
+    def predicted(self):
+        return self.box + self.velocity
+
+    def update(self, box, conf):
+        box = np.asarray(box, dtype=np.float32)
+        self.velocity = 0.5 * self.velocity + 0.5 * (box - self.box)
+        self.box = box
+        self.conf = conf
+        self.hits += 1
+        self.missed = 0
+
+    @property
+    def centre(self):
+        x1, y1, x2, y2 = self.box
+        return (x1 + x2) / 2, (y1 + y2) / 2
+
+
+# SORT/ByteTrack-style multi-object tracker over YOLO boxes (x1, y1, x2, y2).
+# Tracks are matched per class on IoU against their constant-velocity
+# prediction: confident detections first, then low-confidence ones for the
+# tracks still unmatched, so briefly occluded items keep their ID.
+class ObjectTracker:
+    def __init__(self, iou_threshold=0.3, high_conf=HIGH_CONF, low_conf=LOW_CONF,
+                 max_missed=MAX_MISSED, min_hits=MIN_HITS):
+        self.iou_threshold = iou_threshold
+        self.high_conf = high_conf
+        self.low_conf = low_conf
+        self.max_missed = max_missed
+        self.min_hits = min_hits
+        self.tracks = []
+        self._ids = itertools.count(1)
+
+    def _match(self, tracks, dets):
+        if not tracks or not dets:
+            return [], list(range(len(tracks))), list(range(len(dets)))
+        scores = iou_matrix([t.predicted() for t in tracks], [d[0] for d in dets])
+        for ti, t in enumerate(tracks):
+            for di, d in enumerate(dets):
+                if t.cls != d[1]:
+                    scores[ti, di] = 0
+
+        matches = []
+        used_t, used_d = set(), set()
+        for flat in np.argsort(-scores, axis=None):
+            ti, di = np.unravel_index(flat, scores.shape)
+            if scores[ti, di] < self.iou_threshold:
+                break
+            if ti in used_t or di in used_d:
+                continue
+            matches.append((ti, di))
+            used_t.add(ti)
+            used_d.add(di)
+        return (matches,
+                [i for i in range(len(tracks)) if i not in used_t],
+                [i for i in range(len(dets)) if i not in used_d])
+
+    # Feed one frame of detections; returns confirmed, currently visible tracks
+    def update(self, boxes, confs, classes):
+        dets = [(b, int(c), float(s)) for b, s, c in zip(boxes, confs, classes) if s >= self.low_conf]
+        high = [d for d in dets if d[2] >= self.high_conf]
+        low = [d for d in dets if d[2] < self.high_conf]
+
+        matches, rest, new = self._match(self.tracks, high)
+        for ti, di in matches:
+            self.tracks[ti].update(high[di][0], high[di][2])
+
+        remaining = [self.tracks[i] for i in rest]
+        matches, unmatched, _ = self._match(remaining, low)
+        for ti, di in matches:
+            remaining[ti].update(low[di][0], low[di][2])
+        for ti in unmatched:
+            track = remaining[ti]
+            track.missed += 1
+            track.box = track.predicted()
+
+        for di in new:
+            box, cls, conf = high[di]
+            self.tracks.append(ObjectTrack(next(self._ids), box, cls, conf))
+
+        self.tracks = [t for t in self.tracks if t.missed <= self.max_missed]
+        return [t for t in self.tracks if t.hits >= self.min_hits and not t.missed]
+
+
+def _parse_points(spec):
+    return [tuple(float(v) for v in point.split(",")) for point in spec.split(";") if point.strip()]
+
+
+# Virtual line in normalized coordinates. A track's side is only updated
+# once its centre is more than `margin` pixels from the line, so jitter on
+# the line cannot produce repeated crossings.
+class LineCounter:
+    def __init__(self, start, end, margin=8.0):
+        self.start = start
+        self.end = end
+        self.margin = margin
+        self.counts = {"in": 0, "out": 0}
+
+    def _side(self, point, shape):
+        h, w = shape[:2]
+        x1, y1 = self.start[0] * w, self.start[1] * h
+        x2, y2 = self.end[0] * w, self.end[1] * h
+        length = max(((x2 - x1) ** 2 + (y2 - y1) ** 2) ** 0.5, 1e-6)
+        distance = ((x2 - x1) * (point[1] - y1) - (y2 - y1) * (point[0] - x1)) / length
+        if abs(distance) <= self.margin:
+            return None
+        return 1 if distance < 0 else -1
+
+    # (track, "in"/"out") for every track that crossed since the last frame
+    def update(self, tracks, shape):
+        events = []
+        for track in tracks:
+            side = self._side(track.centre, shape)
+            if side is None:
+                continue
+            if track.side is not None and side != track.side:
+                direction = "in" if side > 0 else "out"
+                self.counts[direction] += 1
+                events.append((track, direction))
+            track.side = side
+        return events
+
+    def pixels(self, shape):
+        h, w = shape[:2]
+        return ((int(self.start[0] * w), int(self.start[1] * h)),
+                (int(self.end[0] * w), int(self.end[1] * h)))
+
+
+# Polygon zone in normalized coordinates: entering is "in", leaving is "out"
+class ZoneCounter:
+    def __init__(self, points):
+        self.points = points
+        self.counts = {"in": 0, "out": 0}
+
+    def _inside(self, point, shape):
+        h, w = shape[:2]
+        x, y = point[0] / w, point[1] / h
+        inside = False
+        for (x1, y1), (x2, y2) in zip(self.points, self.points[1:] + self.points[:1]):
+            if (y1 > y) != (y2 > y) and x < (x2 - x1) * (y - y1) / (y2 - y1) + x1:
+                inside = not inside
+        return 1 if inside else -1
+
+    def update(self, tracks, shape):
+        events = []
+        for track in tracks:
+            side = self._inside(track.centre, shape)
+            if track.side is not None and side != track.side:
+                direction = "in" if side > 0 else "out"
+                self.counts[direction] += 1
+                events.append((track, direction))
+            track.side = side
+        return events
+
+
+# Counter configured from SCAN_ZONE / SCAN_LINE
+def make_counter(line=SCAN_LINE, zone=SCAN_ZONE):
+    if zone:
+        return ZoneCounter(_parse_points(zone))
+    x1, y1, x2, y2 = (float(v) for v in line.split(","))
+    return LineCounter((x1, y1), (x2, y2))
@@ -0,0 +1,134 @@
+# product_index.py
+import json
+import os
+import threading
+import time
+
+from inventory_store import get_pool
+
+# JSON object mapping detector class labels to a product_id or product name,
+# e.g. {"cell phone": "phone", "potato chips": "chips"}
+SYNONYMS_PATH = os.environ.get("PRODUCT_SYNONYMS", "synonyms.json")
+# How often resolve() checks the product names version for writes made by
+# other processes (0: on every call)
+CHECK_MS = int(os.environ.get("PRODUCT_INDEX_CHECK_MS", "500"))
+
+SELECT_NAMES = "SELECT product_id, name FROM products"
+SELECT_ID_NOCASE = "SELECT product_id FROM products WHERE name = ? COLLATE NOCASE"
+SELECT_VERSION = "SELECT version FROM product_names_version WHERE id = 1"
+
+
+# Canonical form used for every key: case-folded, "_"/"-" as spaces, single-spaced
+def normalize(label):
+    return " ".join(label.replace("_", " ").replace("-", " ").split()).casefold()
+
+
+def load_synonyms(path=SYNONYMS_PATH):
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+# Cached label -> product_id map for detection-to-SKU resolution.
+# Built from the products table on first use and dropped by invalidate()
+# whenever products are written in this process, or when the product names
+# version (bumped by triggers when products are added, removed or renamed,
+# from any process; not by stock updates) has moved;
+# labels it has never seen fall back to a NOCASE lookup that is served by
+# idx_products_name_nocase.
+class ProductIndex:
+    def __init__(self, synonyms=None, pool=None, check_ms=CHECK_MS):
+        self.synonyms = {normalize(k): v for k, v in (synonyms or {}).items()}
+        self._pool = pool
+        self._lock = threading.Lock()
+        self._ids = None
+        self._misses = set()
+        self._version = None
+        self._checked_at = 0.0
+        self.check_interval = check_ms / 1000
+        self.loads = 0
+
+    def _get_pool(self):
+        return self._pool or get_pool()
+
+    def _load(self):
+        with self._get_pool().connection() as conn:
+            # Read first: a write landing in between only triggers another reload
+            self._version = conn.execute(SELECT_VERSION).fetchone()[0]
+            self._checked_at = time.monotonic()
+            rows = conn.execute(SELECT_NAMES).fetchall()
+
+        ids = {}
+        for product_id, name in rows:
+            ids[normalize(product_id)] = product_id
+            if name:
+                ids[normalize(name)] = product_id
+        # Synonyms may point at a product_id or at a product name
+        for label, target in self.synonyms.items():
+            product_id = ids.get(normalize(target))
+            if product_id is not None:
+                ids[label] = product_id
+
+        self._misses = set()
+        self.loads += 1
+        return ids
+
+    def _cold_lookup(self, label):
+        with self._get_pool().connection() as conn:
+            row = conn.execute(SELECT_ID_NOCASE, (label,)).fetchone()
+        return row[0] if row else None
+
+    # Drop the cached map and misses if product names changed since they were loaded
+    def _check_version(self):
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        with self._get_pool().connection() as conn:
+            version = conn.execute(SELECT_VERSION).fetchone()[0]
+        if version != self._version:
+            self.invalidate()
+
+    # product_id for a detector label / product name / alias, or None
+    def resolve(self, label):
+        key = normalize(label)
+        if self._ids is not None:
+            self._check_version()
+        ids = self._ids
+        if ids is None:
+            with self._lock:
+                if self._ids is None:
+                    self._ids = self._load()
+                ids = self._ids
+
+        product_id = ids.get(key)
+        if product_id is not None or key in self._misses:
+            return product_id
+
+        product_id = self._cold_lookup(self.synonyms.get(key, label.strip()))
+        with self._lock:
+            if product_id is None:
+                self._misses.add(key)
+            elif self._ids is not None:
+                self._ids[key] = product_id
+        return product_id
+
+    # Drop the cached map; the next resolve() reloads it
+    def invalidate(self):
+        with self._lock:
+            self._ids = None
+            self._misses = set()
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+# Shared process-wide index, configured from SYNONYMS_PATH
+def get_product_index():
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = ProductIndex(load_synonyms())
+        return _index
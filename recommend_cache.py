@@ -0,0 +1,108 @@
+# recommend_cache.py
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from db_utils import get_inventory_version
+from recommender import emotion_vector, get_recommender
+
+CACHE_SIZE = int(os.environ.get("RECOMMEND_CACHE_SIZE", "1024"))
+CACHE_TTL = float(os.environ.get("RECOMMEND_CACHE_TTL", "300"))
+# Emotion probabilities are rounded to multiples of 1 / CACHE_BUCKETS
+CACHE_BUCKETS = int(os.environ.get("RECOMMEND_CACHE_BUCKETS", "20"))
+
+
+# Emotion (anything emotion_vector accepts) -> tuple of bucket counts
+def quantize(emotion, buckets=CACHE_BUCKETS):
+    return tuple(int(q) for q in np.rint(emotion_vector(emotion) * buckets))
+
+
+# LRU + TTL cache of recommendation lists, keyed by the quantized emotion
+# distribution, k, the catalog version and the inventory version. Misses are
+# scored on the bucket's own vector, so every emotion in a bucket gets the
+# same list whichever one filled it. The recommender's stock filter is only
+# re-read from the database when the inventory version has moved.
+class RecommendationCache:
+    def __init__(self, size=CACHE_SIZE, ttl=CACHE_TTL, buckets=CACHE_BUCKETS):
+        self.size = size
+        self.ttl = ttl
+        self.buckets = buckets
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _get(self, key, now):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored, value = entry
+                if now - stored <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self.expirations += 1
+            self.misses += 1
+            return None
+
+    def _put(self, key, value, now):
+        with self._lock:
+            self._entries[key] = (now, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def recommend(self, emotion, k=5):
+        recommender = get_recommender()
+        version = get_inventory_version()
+        bucket = quantize(emotion, self.buckets)
+        key = (bucket, k, recommender.version, version)
+
+        now = time.monotonic()
+        value = self._get(key, now)
+        if value is not None:
+            return value
+
+        if recommender.stock_version != version:
+            recommender.refresh_stock()
+            recommender.stock_version = version
+        value = recommender.recommend(np.array(bucket, np.float32), k)
+        self._put(key, value, now)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def metrics(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "capacity": self.size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+# Shared process-wide cache
+def get_recommendation_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = RecommendationCache()
+        return _cache
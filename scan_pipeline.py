@@ -0,0 +1,277 @@
+# scan_pipeline.py
+import os
+import queue
+import threading
+import time
+from collections import deque
+
+import cv2
+
+from db_utils import resolve_product
+from frame_preview import PreviewEncoder
+from frame_source import is_live, iter_frames
+from metrics import count, timer
+from object_tracker import LineCounter, ObjectTracker, make_counter
+from stock_events import get_event_writer
+
+FRAME_BUFFER = int(os.environ.get("SCAN_FRAME_BUFFER", "4"))
+RESULT_BUFFER = int(os.environ.get("SCAN_RESULT_BUFFER", "64"))
+
+
+# Bounded frame buffer that drops the oldest frame when full, so a slow
+# consumer always works on recent frames and capture never blocks.
+# With block=True (offline replay) put() waits for space instead.
+class FrameRing:
+    def __init__(self, capacity=FRAME_BUFFER):
+        self._frames = deque(maxlen=capacity)
+        self._cond = threading.Condition()
+        self.dropped = 0
+
+    def _full(self):
+        return len(self._frames) == self._frames.maxlen
+
+    def put(self, item, block=False, timeout=None):
+        with self._cond:
+            if block and not self._cond.wait_for(lambda: not self._full(), timeout):
+                return False
+            if self._full():
+                self.dropped += 1
+            self._frames.append(item)
+            self._cond.notify_all()
+            return True
+
+    def get(self, timeout=None):
+        with self._cond:
+            if not self._frames and not self._cond.wait_for(lambda: self._frames, timeout):
+                return None
+            item = self._frames.popleft()
+            self._cond.notify_all()
+            return item
+
+    def __len__(self):
+        return len(self._frames)
+
+
+# Rolling frames-per-second over the last `window` seconds
+class RateMeter:
+    def __init__(self, window=2.0):
+        self.window = window
+        self._ticks = deque()
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def tick(self):
+        now = time.monotonic()
+        with self._lock:
+            self.count += 1
+            self._ticks.append(now)
+            while self._ticks and now - self._ticks[0] > self.window:
+                self._ticks.popleft()
+
+    def rate(self):
+        now = time.monotonic()
+        with self._lock:
+            while self._ticks and now - self._ticks[0] > self.window:
+                self._ticks.popleft()
+            return len(self._ticks) / self.window
+
+
+# Capture -> inference -> DB writer, each on its own thread.
+# The UI never touches the camera or the model: it polls latest_preview(),
+# recent_messages() and stats(). Inference only keeps a reference to its
+# latest frame and results; drawing and JPEG encoding happen on the UI's
+# poll, throttled by the PreviewEncoder (frame_preview.py). Live sources drop old frames under load;
+# files and image directories are processed losslessly and the pipeline
+# winds down by itself at the end of the input (see wait()).
+# With a `scheduler` (inference_scheduler.py), frames go through it under
+# `name` so several pipelines share batched forward passes of one model.
+class ScanPipeline:
+    def __init__(self, model, source=0, frame_buffer=FRAME_BUFFER, counter=None, lossless=None,
+                 scheduler=None, name=None, preview=None):
+        self.model = model
+        self.source = source
+        self.scheduler = scheduler
+        self.name = name if name is not None else str(source)
+        self.lossless = not is_live(source) if lossless is None else lossless
+        self.tracker = ObjectTracker()
+        self.counter = counter or make_counter()
+        self.frames = FrameRing(frame_buffer)
+        self.detections = queue.Queue(maxsize=RESULT_BUFFER)
+        self.messages = deque(maxlen=RESULT_BUFFER)
+        self.preview = preview or PreviewEncoder()
+
+        self._stop = threading.Event()
+        self._capture_done = threading.Event()
+        self._inference_done = threading.Event()
+        self._threads = []
+        self._latest = None
+        self._latest_lock = threading.Lock()
+        self._meters = {"capture": RateMeter(), "inference": RateMeter(), "writer": RateMeter()}
+        self.error = None
+        self.frames_read = 0
+        self.frames_processed = 0
+        self.events = 0
+
+    def start(self):
+        self._stop.clear()
+        self._capture_done.clear()
+        self._inference_done.clear()
+        self._threads = [
+            threading.Thread(target=self._capture_loop, name="scan-capture", daemon=True),
+            threading.Thread(target=self._inference_loop, name="scan-inference", daemon=True),
+            threading.Thread(target=self._writer_loop, name="scan-writer", daemon=True),
+        ]
+        for t in self._threads:
+            t.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        for t in self._threads:
+            t.join(timeout=5)
+        self._threads = []
+
+    # Block until a finite source has been fully processed
+    def wait(self, timeout=None):
+        for t in self._threads:
+            t.join(timeout)
+        return not self.running
+
+    @property
+    def running(self):
+        return any(t.is_alive() for t in self._threads)
+
+    def _capture_loop(self):
+        try:
+            frames = iter_frames(self.source)
+            while True:
+                with timer("scan.capture"):
+                    frame = next(frames, None)
+                if frame is None:
+                    break
+                while not self.frames.put(frame, block=self.lossless, timeout=0.1):
+                    if self._stop.is_set():
+                        return
+                self.frames_read += 1
+                self._meters["capture"].tick()
+                if self._stop.is_set():
+                    return
+            if is_live(self.source):
+                self.error = "Failed to read from camera."
+        except IOError as e:
+            self.error = str(e)
+        finally:
+            self._capture_done.set()
+
+    # A failed detection (model error, or the scheduler cancelling this
+    # source's frame) ends the scan with the reason in `error`
+    def _inference_loop(self):
+        names = self.model.names
+        try:
+            self._run_inference(names)
+        except Exception as e:
+            self.error = f"Detection failed: {e!r}"
+            self._stop.set()
+        finally:
+            self._inference_done.set()
+
+    def _run_inference(self, names):
+        while not self._stop.is_set():
+            frame = self.frames.get(timeout=0.1)
+            if frame is None:
+                if self._capture_done.is_set() and not len(self.frames):
+                    return
+                continue
+            with timer("scan.detect"):
+                if self.scheduler is not None:
+                    detections = self.scheduler.detect(self.name, frame, conf=self.tracker.low_conf)
+                else:
+                    detections = self.model.detect(frame, conf=self.tracker.low_conf)
+            with timer("scan.track"):
+                tracks = self.tracker.update(*detections)
+                crossings = self.counter.update(tracks, frame.shape)
+
+            # Track positions are copied now, the tracker moves on with the next frame
+            labels = [(track.track_id, track.centre) for track in tracks]
+            with self._latest_lock:
+                self._latest = (frame, detections, labels)
+            self.frames_processed += 1
+            self._meters["inference"].tick()
+
+            events = [(names[track.cls], direction) for track, direction in crossings]
+            if events:
+                self._put_events(events)
+
+    def _put_events(self, events):
+        while not self._stop.is_set():
+            try:
+                self.detections.put(events, timeout=0.1)
+                return
+            except queue.Full:
+                if not self.lossless:
+                    return
+
+    # Draw the counting line and track IDs over the detector's boxes
+    def _annotate(self, image, labels, scale=1.0):
+        if isinstance(self.counter, LineCounter):
+            start, end = self.counter.pixels(image.shape)
+            cv2.line(image, start, end, (0, 200, 255), 2)
+        for track_id, (x, y) in labels:
+            cv2.putText(image, f"#{track_id}", (int(x * scale), int(y * scale)),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 200, 255), 2)
+        return image
+
+    def _writer_loop(self):
+        writer = get_event_writer()
+        while not self._stop.is_set():
+            try:
+                events = self.detections.get(timeout=0.1)
+            except queue.Empty:
+                if self._inference_done.is_set() and self.detections.empty():
+                    return
+                continue
+            self.events += len(events)
+            count("scan.crossings", len(events))
+            for name, direction in events:
+                product_id = resolve_product(name)
+                if product_id:
+                    writer.submit(product_id, direction)
+                    change = "increased" if direction == "in" else "decreased"
+                    self.messages.append(("success", f"✅ {name} stock {change}."))
+                else:
+                    self.messages.append(("warning", f"⚠️ {name} not found. Add manually."))
+            self._meters["writer"].tick()
+
+    # JPEG preview of the most recent inference, or None before the first
+    def latest_preview(self):
+        with self._latest_lock:
+            latest = self._latest
+        if latest is None:
+            return None
+        frame, detections, labels = latest
+        return self.preview.encode(
+            frame, detections, self.model.names, lambda image, scale: self._annotate(image, labels, scale)
+        )
+
+    # Latest detection messages, newest first
+    def recent_messages(self, limit=10):
+        return list(self.messages)[::-1][:limit]
+
+    def stats(self):
+        stats = {
+            "capture_fps": round(self._meters["capture"].rate(), 1),
+            "inference_fps": round(self._meters["inference"].rate(), 1),
+            "writer_fps": round(self._meters["writer"].rate(), 1),
+            "frame_queue": len(self.frames),
+            "frames_dropped": self.frames.dropped,
+            "detection_queue": self.detections.qsize(),
+            "event_queue": get_event_writer().metrics()["pending"],
+            "counted_in": self.counter.counts["in"],
+            "counted_out": self.counter.counts["out"],
+            **self.preview.stats(),
+        }
+        if self.scheduler is not None:
+            source = self.scheduler.stats()["sources"].get(self.name, {})
+            stats["inference_p50_ms"] = source.get("p50_ms", 0.0)
+            stats["inference_p95_ms"] = source.get("p95_ms", 0.0)
+        return stats
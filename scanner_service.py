@@ -0,0 +1,131 @@
+# scanner_service.py
+# Headless product scanner: owns one or more cameras / video files / image
+# directories, runs detection continuously and writes stock events to the
+# shared store. Several sources in one process share one model through the
+# batching inference scheduler; the Streamlit dashboard only reads the store.
+#
+#   python scanner_service.py --source 0 --camera-id shelf-1
+#   python scanner_service.py --source 0 --source 1 --source rtsp://cam3/stream
+#   python scanner_service.py --source recordings/aisle3.mp4 --camera-id replay
+#   python scanner_service.py --source 0 --metrics-port 9108   # /metrics, /metrics.json
+import argparse
+import json
+import os
+import signal
+import threading
+import time
+
+from db_utils import init_db, report_scanner_status
+from frame_source import parse_source
+from inference_scheduler import InferenceScheduler
+from metrics import METRICS_HOST, get_metrics, serve_metrics
+from model_registry import get_model
+from object_tracker import SCAN_LINE, SCAN_ZONE, make_counter
+from scan_pipeline import ScanPipeline
+from stock_events import get_event_writer
+from stock_rollups import get_rollup_worker
+
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "0"))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Headless product scanner")
+    parser.add_argument("--source", action="append",
+                        help="camera index, video file, stream URL or image directory (repeatable)")
+    parser.add_argument("--camera-id", action="append", default=[],
+                        help="name shown on the dashboard, one per --source")
+    parser.add_argument("--line", default=SCAN_LINE, help="counting line as normalized x1,y1,x2,y2")
+    parser.add_argument("--zone", default=SCAN_ZONE, help="counting zone as normalized x,y;x,y;...")
+    parser.add_argument("--lossless", action="store_true",
+                        help="never drop frames, even from a live camera")
+    parser.add_argument("--report-every", type=float, default=2.0,
+                        help="seconds between status heartbeats")
+    parser.add_argument("--metrics-port", type=int, default=METRICS_PORT,
+                        help="serve Prometheus /metrics and /metrics.json on this port (0: off)")
+    parser.add_argument("--metrics-host", default=METRICS_HOST,
+                        help="interface for the metrics endpoint (0.0.0.0: all, unauthenticated)")
+    args = parser.parse_args(argv)
+    args.source = args.source or ["0"]
+    if len(args.camera_id) > len(args.source):
+        parser.error("more --camera-id values than --source values")
+    return args
+
+
+def run(args):
+    applied = init_db()
+    if applied:
+        print(f"Migrated database to v{applied[-1]}")
+    server = serve_metrics(args.metrics_port, args.metrics_host) if args.metrics_port else None
+    if server is not None:
+        print(f"Metrics on http://{args.metrics_host}:{args.metrics_port}/metrics")
+    model = get_model("yolo")
+    # A single camera keeps the direct path; several share batched passes
+    scheduler = InferenceScheduler(model).start() if len(args.source) > 1 else None
+
+    pipelines = {}
+    for i, spec in enumerate(args.source):
+        camera_id = args.camera_id[i] if i < len(args.camera_id) else str(spec)
+        pipelines[camera_id] = ScanPipeline(
+            model,
+            parse_source(spec),
+            counter=make_counter(args.line, args.zone),
+            lossless=True if args.lossless else None,
+            scheduler=scheduler,
+            name=camera_id,
+        )
+
+    stopping = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stopping.set())
+
+    # Keeps the Stock Movement rollups current while the dashboard only reads
+    get_rollup_worker()
+
+    started = time.perf_counter()
+    for camera_id, pipeline in pipelines.items():
+        pipeline.start()
+        print(f"Scanning {pipeline.source!r} as {camera_id!r} (Ctrl+C to stop)")
+
+    def running():
+        return any(pipeline.running for pipeline in pipelines.values())
+
+    while running() and not stopping.wait(args.report_every):
+        for camera_id, pipeline in pipelines.items():
+            report_scanner_status(camera_id, pipeline.source, {"state": "running", **pipeline.stats()})
+
+    for pipeline in pipelines.values():
+        if stopping.is_set():
+            pipeline.stop()
+        else:
+            pipeline.wait()
+    if not get_event_writer().flush():
+        print(f"Warning: stock events not written: {get_event_writer().metrics()['last_error']}")
+    get_rollup_worker().stop()
+    elapsed = time.perf_counter() - started
+
+    summaries = {}
+    for camera_id, pipeline in pipelines.items():
+        summary = {
+            "state": "stopped",
+            "error": pipeline.error,
+            "frames_read": pipeline.frames_read,
+            "frames_processed": pipeline.frames_processed,
+            "stock_events": pipeline.events,
+            "seconds": round(elapsed, 2),
+            "fps": round(pipeline.frames_processed / elapsed, 2) if elapsed else 0.0,
+            **pipeline.stats(),
+        }
+        report_scanner_status(camera_id, pipeline.source, summary)
+        summaries[camera_id] = summary
+    if scheduler is not None:
+        summaries["scheduler"] = scheduler.stats()
+        scheduler.stop()
+    summaries["metrics"] = get_metrics().snapshot()
+    if server is not None:
+        server.shutdown()
+    print(json.dumps(summaries, indent=2))
+    return summaries
+
+
+if __name__ == "__main__":
+    run(parse_args())
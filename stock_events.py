@@ -0,0 +1,318 @@
+# stock_events.py
+import atexit
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+from db_utils import apply_stock_events, now_ms
+
+# Coalescing window: flush after BATCH_SIZE events or WINDOW_MS, whichever first
+BATCH_SIZE = int(os.environ.get("STOCK_EVENT_BATCH_SIZE", "256"))
+WINDOW_MS = int(os.environ.get("STOCK_EVENT_WINDOW_MS", "250"))
+MAX_PENDING = int(os.environ.get("STOCK_EVENT_MAX_PENDING", "10000"))
+# A commit the database cannot take (busy, locked, unavailable) is retried
+# RETRIES times, waiting RETRY_MS and doubling up to RETRY_MAX_MS; after that
+# its events are held and retried with the next batch, or every RETRY_MAX_MS
+# when idle. At most MAX_HELD events are held; the rest go to DEAD_LETTER.
+RETRIES = int(os.environ.get("STOCK_EVENT_RETRIES", "5"))
+RETRY_MS = int(os.environ.get("STOCK_EVENT_RETRY_MS", "50"))
+RETRY_MAX_MS = int(os.environ.get("STOCK_EVENT_RETRY_MAX_MS", "2000"))
+MAX_HELD = int(os.environ.get("STOCK_EVENT_MAX_HELD", "10000"))
+# JSON-lines file for events that cannot be written: events rejected on their
+# own (e.g. by a constraint) and events over MAX_HELD
+DEAD_LETTER = os.environ.get("STOCK_EVENT_DEAD_LETTER", "stock_events.dead.jsonl")
+
+log = logging.getLogger(__name__)
+
+StockEvent = namedtuple("StockEvent", ["product_id", "direction", "quantity", "timestamp"])
+
+_STOP = object()
+
+
+# In-process queue of stock movements written in coalesced transactions.
+# A background thread drains the queue, waits up to `window_ms` for more
+# events (or until `batch_size` are pending) and hands the whole batch to
+# db_utils.apply_stock_events as one commit. When the database cannot take a
+# batch, its events are held and retried (up to `max_held` of them). When the
+# batch itself is rejected, it is split until the failing events are found;
+# those are appended to the `dead_letter` file and the rest are written.
+class StockEventWriter:
+    def __init__(self, batch_size=BATCH_SIZE, window_ms=WINDOW_MS, max_pending=MAX_PENDING,
+                 retries=RETRIES, retry_ms=RETRY_MS, retry_max_ms=RETRY_MAX_MS,
+                 max_held=MAX_HELD, dead_letter=DEAD_LETTER):
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        if max_held < 0:
+            raise ValueError("max_held must not be negative")
+
+        self.batch_size = batch_size
+        self.window = window_ms / 1000
+        self.retries = max(0, retries)
+        self.retry_delay = retry_ms / 1000
+        self.retry_max = retry_max_ms / 1000
+        self.max_held = max_held
+        self.dead_letter = dead_letter
+        self._held = []
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._lock = threading.Lock()
+        self._thread = None
+
+        self._submitted = 0
+        self._written = 0
+        self._failed = 0
+        self._retried = 0
+        self._dead_lettered = 0
+        self._rejected = 0
+        self._blocked_seconds = 0.0
+        self._batches = 0
+        self._last_batch_size = 0
+        self._last_flush_ms = 0.0
+        self._flush_seconds = 0.0
+        self._max_depth = 0
+        self._last_error = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="stock-event-writer", daemon=True)
+                self._thread.start()
+        return self
+
+    # Flush what is pending and stop the writer thread
+    def stop(self):
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            self._queue.put(_STOP)
+            thread.join()
+
+    # Queue a movement. With block=False (or when timeout expires) a full
+    # queue rejects the event and returns False instead of stalling the caller.
+    def submit(self, product_id, direction, quantity=1, block=True, timeout=None):
+        if direction not in ("in", "out"):
+            raise ValueError(f"Unknown direction: {direction}")
+        self.start()
+
+        event = StockEvent(product_id, direction, quantity, now_ms())
+        started = time.perf_counter()
+        try:
+            self._queue.put(event, block=block, timeout=timeout)
+        except queue.Full:
+            with self._lock:
+                self._rejected += 1
+            return False
+
+        waited = time.perf_counter() - started
+        depth = self._queue.qsize()
+        with self._lock:
+            self._submitted += 1
+            self._blocked_seconds += waited
+            self._max_depth = max(self._max_depth, depth)
+        return True
+
+    # Block until every event submitted before this call is committed.
+    # False if that did not happen within `timeout` or some events could not
+    # be written: held for retry (metrics()["held"]) or moved to the
+    # dead-letter file while flushing (metrics()["dead_lettered"]).
+    def flush(self, timeout=None):
+        if self._thread is None or not self._thread.is_alive():
+            return not self._held
+        with self._lock:
+            dead_lettered = self._dead_lettered
+        done = threading.Event()
+        self._queue.put(done)
+        if not done.wait(timeout):
+            return False
+        with self._lock:
+            return not self._held and self._dead_lettered == dead_lettered
+
+    def metrics(self):
+        with self._lock:
+            return {
+                "submitted": self._submitted,
+                "written": self._written,
+                "failed": self._failed,
+                "retried": self._retried,
+                "held": len(self._held),
+                "dead_lettered": self._dead_lettered,
+                "rejected": self._rejected,
+                "pending": self._queue.qsize(),
+                "max_pending": self._max_depth,
+                "capacity": self._queue.maxsize,
+                "blocked_seconds": round(self._blocked_seconds, 4),
+                "batches": self._batches,
+                "last_batch_size": self._last_batch_size,
+                "avg_batch_size": round(self._written / self._batches, 2) if self._batches else 0.0,
+                "last_flush_ms": round(self._last_flush_ms, 3),
+                "flush_seconds": round(self._flush_seconds, 6),
+                "last_error": self._last_error,
+            }
+
+    def _run(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=self.retry_max if self._held else None)
+            except queue.Empty:
+                self._write([])
+                continue
+            if item is _STOP:
+                self._shutdown()
+                return
+            if isinstance(item, threading.Event):
+                if self._held:
+                    self._write([])
+                item.set()
+                continue
+
+            batch = [item]
+            control = None
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP or isinstance(item, threading.Event):
+                    control = item
+                    break
+                batch.append(item)
+
+            self._write(batch)
+
+            if control is _STOP:
+                self._shutdown()
+                return
+            if control is not None:
+                control.set()
+
+    # Commit held events plus `batch` as one transaction, retrying with
+    # backoff while the database cannot take it; returns False if some events
+    # are held or dead-lettered
+    def _write(self, batch):
+        with self._lock:
+            batch = self._held + batch
+            self._held = []
+        if not batch:
+            return True
+
+        delay = self.retry_delay
+        for attempt in range(self.retries + 1):
+            try:
+                self._commit(batch)
+                break
+            except sqlite3.OperationalError as e:
+                self._record_error(e)
+                if attempt == self.retries:
+                    log.warning("Stock event batch of %d failed %d times, holding it for retry: %s",
+                                len(batch), attempt + 1, e)
+                    self._hold(batch, e)
+                    return False
+                time.sleep(delay)
+                delay = min(delay * 2, self.retry_max)
+            except Exception as e:
+                # Rejected for what is in it (a constraint, a bad value): retrying
+                # the same batch would fail the same way
+                self._record_error(e)
+                log.warning("Stock event batch of %d rejected, isolating the failing events: %s", len(batch), e)
+                held, dead = self._isolate(batch, e)
+                if held:
+                    self._hold(held, self._last_error)
+                return not (held or dead)
+        if attempt:
+            log.info("Stock event batch of %d written after %d retries", len(batch), attempt)
+        with self._lock:
+            self._retried += attempt
+        return True
+
+    def _commit(self, batch):
+        deltas = {}
+        events = []
+        for event in batch:
+            qty = event.quantity if event.direction == "in" else -event.quantity
+            deltas[event.product_id] = deltas.get(event.product_id, 0) + qty
+            events.append((event.product_id, event.timestamp, qty))
+
+        started = time.perf_counter()
+        apply_stock_events(deltas, events)
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self._written += len(batch)
+            self._batches += 1
+            self._last_batch_size = len(batch)
+            self._last_flush_ms = elapsed * 1000
+            self._flush_seconds += elapsed
+
+    def _record_error(self, error):
+        with self._lock:
+            self._failed += 1
+            self._last_error = str(error)
+
+    # Write a rejected batch in halves, down to single events; events rejected
+    # on their own are dead-lettered. Returns (events to hold because the
+    # database failed meanwhile, number dead-lettered).
+    def _isolate(self, batch, error):
+        if len(batch) == 1:
+            self._dead_letter(batch, error)
+            return [], 1
+        held, dead = [], 0
+        mid = len(batch) // 2
+        for half in (batch[:mid], batch[mid:]):
+            try:
+                self._commit(half)
+            except sqlite3.OperationalError as e:
+                self._record_error(e)
+                held.extend(half)
+            except Exception as e:
+                self._record_error(e)
+                half_held, half_dead = self._isolate(half, e)
+                held.extend(half_held)
+                dead += half_dead
+        return held, dead
+
+    # Keep up to max_held events for the next write; dead-letter the rest
+    def _hold(self, events, error):
+        with self._lock:
+            self._held = events[:self.max_held]
+        overflow = events[self.max_held:]
+        if overflow:
+            log.error("More than %d stock events held, dead-lettering %d", self.max_held, len(overflow))
+            self._dead_letter(overflow, error)
+
+    # Append events to the dead-letter file, one JSON object per line
+    def _dead_letter(self, events, error):
+        try:
+            with open(self.dead_letter, "a") as f:
+                for event in events:
+                    f.write(json.dumps({**event._asdict(), "error": str(error)}) + "\n")
+        except OSError as e:
+            log.error("Could not dead-letter %d stock events to %s (%s): %s", len(events), self.dead_letter, e, events)
+        else:
+            log.warning("Dead-lettered %d stock events to %s: %s", len(events), self.dead_letter, error)
+        with self._lock:
+            self._dead_lettered += len(events)
+
+    # Last attempt at held events when the writer stops
+    def _shutdown(self):
+        if self._held and not self._write([]):
+            log.error("Stopping with %d stock events not written: %s", len(self._held), self._last_error)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+# Shared process-wide writer
+def get_event_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = StockEventWriter()
+            atexit.register(_writer.stop)
+        return _writer
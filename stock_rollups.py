@@ -0,0 +1,255 @@
+# stock_rollups.py
+# Per-product per-minute/hour/day in/out quantities rolled up from events.
+#
+#   python stock_rollups.py                                   # roll up new logs
+#   python stock_rollups.py --compact-before 2025-01-01 --archive logs_2024.parquet
+#
+# Long-running processes fold new events in from a background thread
+# (get_rollup_worker) every ROLLUP_INTERVAL_SECONDS, so readers such as the
+# Stock Movement panel never write.
+import argparse
+import atexit
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+from inventory_store import get_pool
+
+ROLLUP_INTERVAL_SECONDS = float(os.environ.get("ROLLUP_INTERVAL_SECONDS", "30"))
+
+log = logging.getLogger(__name__)
+
+# grain -> local-time bucket label
+GRAINS = {"minute": "%Y-%m-%d %H:%M", "hour": "%Y-%m-%d %H", "day": "%Y-%m-%d"}
+
+ROLLUP_SCHEMA = [
+    *(f'''CREATE TABLE IF NOT EXISTS rollup_{grain} (
+        product_id TEXT NOT NULL,
+        bucket TEXT NOT NULL,
+        qty_in INTEGER NOT NULL,
+        qty_out INTEGER NOT NULL,
+        PRIMARY KEY (product_id, bucket)
+    ) WITHOUT ROWID''' for grain in GRAINS),
+    '''CREATE TABLE IF NOT EXISTS rollup_state (
+        name TEXT PRIMARY KEY,
+        last_log_id INTEGER NOT NULL
+    )''',
+    '''CREATE TABLE IF NOT EXISTS events_archive (
+        event_id INTEGER PRIMARY KEY,
+        product_key INTEGER NOT NULL,
+        ts INTEGER NOT NULL,
+        qty INTEGER NOT NULL
+    )''',
+]
+
+
+def ensure_rollups(conn):
+    for statement in ROLLUP_SCHEMA:
+        conn.execute(statement)
+
+
+def _last_rolled_up(conn):
+    row = conn.execute("SELECT last_log_id FROM rollup_state WHERE name = 'logs'").fetchone()
+    return row[0] if row else 0
+
+
+# Fold events newer than the last processed event_id into every rollup table,
+# at most `batch_size` ids per transaction; returns rows processed
+def run_rollups(batch_size=50000):
+    processed = 0
+    while True:
+        with get_pool().transaction() as conn:
+            last_id = _last_rolled_up(conn)
+            max_id = conn.execute("SELECT IFNULL(MAX(event_id), 0) FROM events").fetchone()[0]
+            if max_id <= last_id:
+                return processed
+            upper = min(max_id, last_id + batch_size)
+
+            for grain, fmt in GRAINS.items():
+                conn.execute(f'''INSERT INTO rollup_{grain} (product_id, bucket, qty_in, qty_out)
+                    SELECT k.product_id, strftime('{fmt}', e.ts / 1000, 'unixepoch', 'localtime'),
+                           SUM(MAX(e.qty, 0)), SUM(MAX(-e.qty, 0))
+                    FROM events e JOIN product_keys k ON k.product_key = e.product_key
+                    WHERE e.event_id > ? AND e.event_id <= ?
+                    GROUP BY 1, 2
+                    ON CONFLICT (product_id, bucket) DO UPDATE SET
+                        qty_in = qty_in + excluded.qty_in,
+                        qty_out = qty_out + excluded.qty_out''', (last_id, upper))
+
+            processed += conn.execute(
+                "SELECT COUNT(*) FROM events WHERE event_id > ? AND event_id <= ?", (last_id, upper)
+            ).fetchone()[0]
+            conn.execute(
+                "INSERT OR REPLACE INTO rollup_state (name, last_log_id) VALUES ('logs', ?)", (upper,)
+            )
+
+
+def _since(days):
+    return (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
+
+
+# (bucket, qty_in, qty_out) for one product, or summed over all products
+def get_movement(product_id=None, grain="day", start=None, end=None):
+    if grain not in GRAINS:
+        raise ValueError(f"Unknown grain: {grain}")
+    filters, params = [], []
+    if product_id is not None:
+        filters.append("product_id = ?")
+        params.append(product_id)
+    if start is not None:
+        filters.append("bucket >= ?")
+        params.append(start)
+    if end is not None:
+        filters.append("bucket <= ?")
+        params.append(end)
+    where = f"WHERE {' AND '.join(filters)}" if filters else ""
+    with get_pool().connection() as conn:
+        return conn.execute(
+            f"SELECT bucket, SUM(qty_in), SUM(qty_out) FROM rollup_{grain} {where} "
+            "GROUP BY bucket ORDER BY bucket",
+            params,
+        ).fetchall()
+
+
+# Per product over the last `days`: units in/out, velocity (out per day),
+# sell-through (out / (out + current stock)) and days of cover (stock / velocity),
+# fastest movers first
+def get_stock_velocity(days=7, product_id=None, limit=None):
+    sql = '''SELECT p.product_id, p.name, p.stock,
+                    IFNULL(SUM(r.qty_in), 0), IFNULL(SUM(r.qty_out), 0)
+             FROM products p
+             LEFT JOIN rollup_day r ON r.product_id = p.product_id AND r.bucket >= ?'''
+    params = [_since(days)]
+    if product_id is not None:
+        sql += " WHERE p.product_id = ?"
+        params.append(product_id)
+    sql += " GROUP BY p.product_id ORDER BY 5 DESC"
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(limit)
+
+    with get_pool().connection() as conn:
+        rows = conn.execute(sql, params).fetchall()
+
+    report = []
+    for pid, name, stock, qty_in, qty_out in rows:
+        velocity = qty_out / days
+        stock = stock or 0
+        report.append({
+            "product_id": pid,
+            "name": name,
+            "stock": stock,
+            "in": qty_in,
+            "out": qty_out,
+            "velocity_per_day": round(velocity, 3),
+            "sell_through": round(qty_out / (qty_out + stock), 3) if qty_out + stock > 0 else 0.0,
+            "days_of_cover": round(stock / velocity, 1) if velocity else None,
+        })
+    return report
+
+
+# Move rolled-up events older than `before` out of the hot table, either into
+# a file (CSV or Parquet, by extension) or into events_archive; returns rows moved
+def compact_logs(before, archive_path=None):
+    from db_utils import to_epoch_ms
+
+    run_rollups()
+    with get_pool().connection() as conn:
+        last_id = _last_rolled_up(conn)
+    condition = "event_id <= ? AND ts < ?"
+    params = (last_id, to_epoch_ms(before))
+
+    if archive_path:
+        from log_export import export_logs
+
+        fmt = "parquet" if archive_path.endswith(".parquet") else "csv"
+        export_logs(archive_path, fmt, end=before, max_log_id=last_id)
+
+    with get_pool().transaction() as conn:
+        if not archive_path:
+            conn.execute(f"INSERT OR IGNORE INTO events_archive SELECT * FROM events WHERE {condition}", params)
+        moved = conn.execute(f"DELETE FROM events WHERE {condition}", params).rowcount
+    return moved
+
+
+# Runs run_rollups() now and then every `interval` seconds on a daemon thread
+class RollupWorker:
+    def __init__(self, interval=ROLLUP_INTERVAL_SECONDS):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+        self.runs = 0
+        self.processed = 0
+        self.errors = 0
+        self.last_error = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="stock-rollups", daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            thread.join()
+
+    def _run(self):
+        while True:
+            try:
+                self.processed += run_rollups()
+            except sqlite3.Error as e:
+                self.errors += 1
+                self.last_error = str(e)
+                log.warning("Stock rollup failed: %s", e)
+            self.runs += 1
+            if self._stop.wait(self.interval):
+                return
+
+    def stats(self):
+        return {
+            "interval_seconds": self.interval,
+            "runs": self.runs,
+            "processed": self.processed,
+            "errors": self.errors,
+            "last_error": self.last_error,
+        }
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+# Shared process-wide rollup thread, started on first use
+def get_rollup_worker():
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = RollupWorker().start()
+            atexit.register(_worker.stop)
+        return _worker
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Roll up and compact stock movement logs")
+    parser.add_argument("--compact-before", help="archive rolled-up logs older than this date (YYYY-MM-DD)")
+    parser.add_argument("--archive", help="CSV/Parquet file for archived logs (default: events_archive table)")
+    args = parser.parse_args()
+
+    from db_utils import init_db
+
+    init_db()
+    print(f"Rolled up {run_rollups()} events")
+    if args.compact_before:
+        print(f"Compacted {compact_logs(args.compact_before, args.archive)} events")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,37 +1,116 @@
-import streamlit as st
-import pandas as pd
-import plotly.express as px
+import os
+import tempfile
+import threading
+
 import cv2
 import pandas as pd
+import plotly.express as px
 import streamlit as st
-from deepface import DeepFace
-from ultralytics import YOLO
 
-model = YOLO("yolov8n.pt")
+from bulk_import import import_products
+from db_utils import (
+    get_product,
+    get_products,
+    get_products_version,
+    get_top_stock,
+    init_db,
+    iter_products,
+    resolve_product,
+    save_product,
+)
+from frame_preview import PreviewEncoder
+from inference_scheduler import get_scheduler
+from inventory_summary import get_category_stock, get_low_stock, get_overview
+from object_tracker import ObjectTracker, make_counter
+from stock_events import get_event_writer
+
+PRODUCT_COLUMNS = ["Product ID", "Product Name", "Category", "Stock", "Reorder Level"]
+PAGE_SIZE = 500
+TOP_PRODUCTS = 50
+LOW_STOCK_LIMIT = 100
 
 # Page setup
 st.set_page_config(page_title="Inventory Dashboard", layout="wide")
 st.title("Dashboard")
 
 
-# Load initial sample data
-def load_data():
+# Create tables and indexes once per server process
+@st.cache_resource(show_spinner=False)
+def setup_db():
+    init_db()
+
+
+setup_db()
+
+
+# YOLO loads only when the Scan section is first used; every session's
+# frames are batched through one shared scheduler
+@st.cache_resource(show_spinner="Loading model…")
+def load_scheduler():
+    return get_scheduler()
+
+
+# Query results are cached once per server process and shared by every
+# session. Each takes the products version (bumped by a trigger on every
+# write to products, from any process), so a write turns the next read into
+# a fresh query and stale entries age out of max_entries.
+@st.cache_data(max_entries=64, show_spinner=False)
+def load_products(version, category=None, page=0):
+    rows = get_products(category, limit=PAGE_SIZE, offset=page * PAGE_SIZE)
+    return pd.DataFrame(rows, columns=PRODUCT_COLUMNS)
+
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def load_category_stock(version):
+    return pd.DataFrame(get_category_stock(), columns=["Category", "Products", "Stock", "Low Stock"])
+
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def load_overview(version):
+    return get_overview()
+
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def load_low_stock(version):
+    rows = [
+        (product_id, name, category, stock, threshold)
+        for product_id, name, stock, category, threshold in get_low_stock(limit=LOW_STOCK_LIMIT)
+    ]
+    return pd.DataFrame(rows, columns=PRODUCT_COLUMNS)
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def load_top_stock(version, category=None):
     return pd.DataFrame(
-        {
-            "Product ID": ["P001", "P002", "P003", "P004"],
-            "Product Name": ["Milk", "Eggs", "Bread", "Juice"],
-            "Category": ["Dairy", "Poultry", "Bakery", "Beverage"],
-            "Stock": [45, 12, 3, 25],
-            "Reorder Level": [20, 10, 5, 15],
-        }
+        get_top_stock(TOP_PRODUCTS, category), columns=["Product ID", "Product Name", "Category", "Stock"]
     )
 
 
-# Initialize session state
-if "inventory" not in st.session_state:
-    st.session_state.inventory = load_data()
+# One inventory CSV per server process, in a temp directory
+@st.cache_resource(show_spinner=False)
+def export_file():
+    path = os.path.join(tempfile.mkdtemp(prefix="inventory-export-"), "inventory.csv")
+    return {"path": path, "version": None, "lock": threading.Lock()}
 
-inventory = st.session_state.inventory
+
+# Path of the inventory CSV for this products version, written chunk by
+# chunk (keyset-paged) unless it is already current; only the path is
+# kept in memory, never the whole export
+def export_csv(version):
+    export = export_file()
+    with export["lock"]:
+        if export["version"] != version:
+            partial = export["path"] + ".tmp"
+            with open(partial, "w", newline="") as f:
+                pd.DataFrame(columns=PRODUCT_COLUMNS).to_csv(f, index=False)
+                for rows in iter_products():
+                    pd.DataFrame(rows, columns=PRODUCT_COLUMNS).to_csv(f, index=False, header=False)
+            os.replace(partial, export["path"])
+            export["version"] = version
+    return export["path"]
+
+
+version = get_products_version()
 
 # Sidebar
 st.sidebar.header("Navigation")
@@ -41,10 +120,10 @@ section = st.sidebar.radio(
 )
 
 
-# Row highlight for low stock
+# Row highlight for low stock (at or below the reorder level, as in the store)
 def highlight_low_stock(row):
     style = [""] * len(row)
-    if row["Stock"] < row["Reorder Level"]:
+    if row["Stock"] <= row["Reorder Level"]:
         style[row.index.get_loc("Stock")] = "background-color: #ffcccc"
     return style
 
@@ -52,28 +131,38 @@ def highlight_low_stock(row):
 # Section: Overview
 if section == "Overview":
     st.subheader("Overview")
-    total_products = len(inventory)
-    low_stock = (inventory["Stock"] < inventory["Reorder Level"]).sum()
+    overview = load_overview(version)
 
-    col1, col2 = st.columns(2)
-    col1.metric("Total Products", total_products)
-    col2.metric("Low Stock Items", low_stock)
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Total Products", overview["products"])
+    col2.metric("Units in Stock", overview["stock"])
+    col3.metric("Low Stock Items", overview["low_stock"])
 
-    st.dataframe(
-        inventory.style.apply(highlight_low_stock, axis=1), use_container_width=True
-    )
+    st.dataframe(load_category_stock(version), use_container_width=True)
+
+    low_stock = load_low_stock(version)
+    if not low_stock.empty:
+        st.markdown(f"**Lowest stock** (up to {LOW_STOCK_LIMIT})")
+        st.dataframe(
+            low_stock.style.apply(highlight_low_stock, axis=1), use_container_width=True
+        )
 
 # Section: Inventory
 elif section == "Inventory":
     st.subheader("Present State")
 
+    categories = load_category_stock(version)
     category_filter = st.selectbox(
-        "Filter by Category", options=["All"] + inventory["Category"].unique().tolist()
+        "Filter by Category", options=["All"] + [c for c in categories["Category"] if c]
     )
-    if category_filter != "All":
-        filtered = inventory[inventory["Category"] == category_filter]
-    else:
-        filtered = inventory
+    category = None if category_filter == "All" else category_filter
+    total = int(categories["Products"].sum() if category is None
+                else categories.loc[categories["Category"] == category, "Products"].sum())
+
+    pages = max(1, -(-total // PAGE_SIZE))
+    page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, step=1) - 1
+    filtered = load_products(version, category, page)
+    st.caption(f"{total} products")
 
     st.dataframe(
         filtered.style.apply(highlight_low_stock, axis=1), use_container_width=True
@@ -96,36 +185,21 @@ elif section == "Add/Update":
             if not product_id:
                 st.error("Product ID is required.")
             else:
-                idx = inventory[inventory["Product ID"] == product_id].index
-                if len(idx) > 0:
-                    st.session_state.inventory.loc[
-                        idx, ["Product Name", "Category", "Stock", "Reorder Level"]
-                    ] = [product_name, category, stock, reorder]
-                    st.success("Product updated!")
-                else:
-                    new_row = pd.DataFrame(
-                        {
-                            "Product ID": [product_id],
-                            "Product Name": [product_name],
-                            "Category": [category],
-                            "Stock": [stock],
-                            "Reorder Level": [reorder],
-                        }
-                    )
-                    st.session_state.inventory = pd.concat(
-                        [inventory, new_row], ignore_index=True
-                    )
-                    st.success("Product added!")
+                save_product(product_id, product_name, category or None, int(stock), int(reorder))
+                st.success("Product saved!")
 
 elif section == "Scan":
     st.subheader("Scan Inventory")
 
     if "scanning" not in st.session_state:
         st.session_state.scanning = False
-    if "detected" not in st.session_state:
-        st.session_state.detected = set()
+    if "tracker" not in st.session_state:
+        st.session_state.tracker = ObjectTracker()
+        st.session_state.counter = make_counter()
     if "cap" not in st.session_state:
         st.session_state.cap = None
+    if "preview" not in st.session_state:
+        st.session_state.preview = PreviewEncoder()
 
     start_scan = st.button("▶️ Start Scanning")
     stop_scan = st.button("🛑 Stop Scanning")
@@ -133,7 +207,9 @@ elif section == "Scan":
     if start_scan and not st.session_state.scanning:
         st.session_state.cap = cv2.VideoCapture(0)
         st.session_state.scanning = True
-        st.session_state.detected = set()
+        st.session_state.tracker = ObjectTracker()
+        st.session_state.counter = make_counter()
+        st.session_state.scan_id = f"dashboard-{id(st.session_state.tracker)}"
         st.success("Camera started. Scanning...")
 
     if stop_scan and st.session_state.cap:
@@ -141,6 +217,7 @@ elif section == "Scan":
         cv2.destroyAllWindows()
         st.session_state.scanning = False
         st.session_state.cap = None
+        load_scheduler().forget(st.session_state.scan_id)
         st.success("Camera stopped.")
 
     if st.session_state.scanning:
@@ -148,130 +225,92 @@ elif section == "Scan":
         ret, frame = cap.read()
 
         if ret:
-            results = model.predict(frame, verbose=False)
-            names = model.names
-            classes = results[0].boxes.cls.cpu().numpy().astype(int)
-
-            new_detections = set()
-
-            for cls in classes:
-                product_name = names[cls]
-
-                if product_name not in st.session_state.detected:
-                    new_detections.add(product_name)
-                    st.session_state.detected.add(product_name)
-
-                    matched_idx = inventory[inventory["Product Name"].str.lower() == product_name.lower()].index
-
-                    if len(matched_idx) > 0:
-                        row = matched_idx[0]
-                        current_stock = inventory.at[row, "Stock"]
-                        reorder_level = inventory.at[row, "Reorder Level"]
-
-                        st.success(f"Detected: **{product_name}** (Current Stock: {current_stock})")
-
-                        if current_stock < reorder_level:
-                            st.warning(f"Stock is **below reorder level** ({current_stock} < {reorder_level}). Consider reordering.")
-                        else:
-                            st.info("Stock is sufficient.")
-                    else:
-                        st.error(f"**{product_name.capitalize()}** not found in inventory.")
-                        st.markdown("Manually add from the **Add/Update** section.")
+            scheduler = load_scheduler()
+            tracker = st.session_state.tracker
+            detections = scheduler.detect(st.session_state.scan_id, frame, conf=tracker.low_conf)
+            names = scheduler.names
+
+            # Each tracked object counts once per crossing of the scan line
+            tracks = tracker.update(*detections)
+            crossings = st.session_state.counter.update(tracks, frame.shape)
+
+            # Resolved through the product index and written by the shared
+            # stock event writer, as ScanPipeline does; one flush per frame
+            # commits this frame's crossings together
+            writer = get_event_writer()
+            counted = []
+            for track, direction in crossings:
+                product_name = names[track.cls]
+                product_id = resolve_product(product_name)
+                if product_id is not None:
+                    writer.submit(product_id, direction)
+                    counted.append((product_name, product_id, direction))
+                else:
+                    st.error(f"**{product_name.capitalize()}** not found in inventory.")
+                    st.markdown("Manually add from the **Add/Update** section.")
+
+            if counted and not writer.flush():
+                st.warning(f"Stock update not saved (held for retry or dead-lettered): {writer.metrics()['last_error']}")
+                counted = []
+            for product_name, product_id, direction in counted:
+                product = get_product(product_id)
+                if product is None:
+                    continue
+                _, _, current_stock, _, reorder_level = product
+                st.success(f"Detected: **{product_name}** {direction} (Current Stock: {current_stock})")
+
+                if reorder_level is not None and current_stock is not None and current_stock <= reorder_level:
+                    st.warning(f"Stock is **at or below reorder level** ({current_stock} <= {reorder_level}). Consider reordering.")
+                else:
+                    st.info("Stock is sufficient.")
 
-            st.image(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB), channels="RGB", caption="Live Camera Feed")
+            # Downsized, boxed and JPEG-encoded for the browser; detection used the full frame
+            preview = st.session_state.preview
+            st.image(preview.encode(frame, detections, names), output_format="JPEG", caption="Live Camera Feed")
+            st.caption(" · ".join(f"{k}: {v}" for k, v in preview.stats().items()))
 
         else:
             st.error("Failed to read from camera.")
 
 
-
 # Section: Analytics
 elif section == "Analytics":
     st.subheader("Inventory Analytics")
 
+    # Both charts are aggregated in SQLite: the best-stocked products and
+    # the trigger-maintained per-category counts
     fig_bar = px.bar(
-        inventory,
+        load_top_stock(version),
         x="Product Name",
         y="Stock",
         color="Category",
-        title="Stock by Product",
+        title=f"Stock by Product (top {TOP_PRODUCTS})",
     )
     st.plotly_chart(fig_bar, use_container_width=True)
 
-    fig_pie = px.pie(inventory, names="Category", title="Category Distribution")
-    st.plotly_chart(fig_pie, use_container_width=True)
-
-# Section: Upload/Download
-elif section == "Upload/Download":
-    st.subheader("Download or Upload Inventory")
-
-    st.download_button(
-        "Download Inventory",
-        data=inventory.to_csv(index=False),
-        file_name="inventory.csv",
-    )
-
-    uploaded = st.file_uploader("Upload New Inventory", type="csv")
-    if uploaded:
-        try:
-            new_data = pd.read_csv(uploaded)
-            required_cols = {
-                "Product ID",
-                "Product Name",
-                "Category",
-                "Stock",
-                "Reorder Level",
-            }
-            if not required_cols.issubset(new_data.columns):
-                st.error("Uploaded file is missing required columns.")
-            else:
-                st.session_state.inventory = new_data
-                st.success("Inventory updated from uploaded file!")
-        except Exception as e:
-            st.error(f"Error: {e}")
-
-
-# Section: Analytics
-elif section == "Analytics":
-    st.subheader("Inventory Analytics")
-
-    fig_bar = px.bar(
-        inventory,
-        x="Product Name",
-        y="Stock",
-        color="Category",
-        title="Stock by Product",
+    fig_pie = px.pie(
+        load_category_stock(version), names="Category", values="Products", title="Category Distribution"
     )
-    st.plotly_chart(fig_bar, use_container_width=True)
-
-    fig_pie = px.pie(inventory, names="Category", title="Category Distribution")
     st.plotly_chart(fig_pie, use_container_width=True)
 
 # Section: Upload/Download
 elif section == "Upload/Download":
     st.subheader("Download or Upload Inventory")
 
-    st.download_button(
-        "Download Inventory",
-        data=inventory.to_csv(index=False),
-        file_name="inventory.csv",
-    )
+    # Written to disk only when asked for, not on every visit to this section
+    if st.button("Prepare Download"):
+        with st.spinner("Preparing download…"), open(export_csv(version), "rb") as f:
+            st.download_button("Download Inventory", data=f, file_name="inventory.csv")
 
-    uploaded = st.file_uploader("Upload New Inventory", type="csv")
-    if uploaded:
+    # Upserted into the store in chunks (bulk_import.py); bad rows go to a rejects file
+    uploaded = st.file_uploader("Upload Inventory", type=["csv", "parquet"])
+    if uploaded and st.button("📥 Import"):
         try:
-            new_data = pd.read_csv(uploaded)
-            required_cols = {
-                "Product ID",
-                "Product Name",
-                "Category",
-                "Stock",
-                "Reorder Level",
-            }
-            if not required_cols.issubset(new_data.columns):
-                st.error("Uploaded file is missing required columns.")
-            else:
-                st.session_state.inventory = new_data
-                st.success("Inventory updated from uploaded file!")
-        except Exception as e:
+            result = import_products(uploaded, rejects="inventory_upload.rejects.csv")
+        except ValueError as e:
             st.error(f"Error: {e}")
+        else:
+            st.success(f"Inventory updated from uploaded file: {result['upserted']} rows "
+                       f"({result['changed']} changed, {result['rows_per_sec']} rows/s)")
+            if result["rejected"]:
+                st.warning(f"{result['rejected']} rows rejected, see {result['rejects_path']}")
@@ -0,0 +1,170 @@
+# ui_panels.py
+# Streamlit panels shared by the app entry points (app.py and
+# init_and_insert.py): live scan status, scanner services, inventory
+# overview, stock movement, manual stock updates, the log view and exports.
+# Each panel renders where it is called.
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+import streamlit as st
+
+from db_utils import get_logs_page, get_logs_since, get_scanner_status, search_products, update_stock
+from inventory_summary import get_category_stock, get_low_stock, get_overview
+from log_export import EXPORTERS, LOG_COLUMNS, export_logs
+from stock_rollups import ROLLUP_INTERVAL_SECONDS, get_movement, get_rollup_worker, get_stock_velocity
+
+SCAN_POLL_SECONDS = 0.2
+SCANNER_STALE_SECONDS = 10
+LOG_PAGE_SIZE = 50
+LOW_STOCK_LIMIT = 20
+# Products listed per product picker; narrowed by typing a name prefix
+PRODUCT_CHOICES = 50
+
+
+# Live scan panel: reruns on its own timer and only reads pipeline state
+@st.fragment(run_every=SCAN_POLL_SECONDS)
+def scan_panel():
+    pipeline = st.session_state.pipeline
+    if pipeline is None:
+        return
+
+    if pipeline.error:
+        st.error(f"📷 {pipeline.error}")
+
+    preview = pipeline.latest_preview()
+    if preview is not None:
+        st.image(preview, output_format="JPEG")
+
+    for level, message in pipeline.recent_messages():
+        getattr(st, level)(message)
+
+    st.caption(" · ".join(f"{k}: {v}" for k, v in pipeline.stats().items()))
+
+
+# Headless scanners (scanner_service.py) writing to the same store
+def scanner_services():
+    scanners = get_scanner_status()
+    if scanners:
+        st.markdown("#### 🛰️ Scanner Services")
+        now = time.time()
+        for s in scanners:
+            s["online"] = s["state"] == "running" and now - s["updated_at"] < SCANNER_STALE_SECONDS
+        st.dataframe(pd.DataFrame(scanners).drop(columns=["updated_at"]), use_container_width=True)
+
+
+# Served from the trigger-maintained summary tables, not a products scan
+def inventory_overview():
+    st.subheader("📊 Inventory Overview")
+    if st.button("🔁 Refresh"):
+        st.rerun()
+
+    overview = get_overview()
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Products", overview["products"])
+    col2.metric("Units in Stock", overview["stock"])
+    col3.metric("Low Stock", overview["low_stock"])
+
+    st.dataframe(
+        pd.DataFrame(get_category_stock(), columns=["Category", "Products", "Stock", "Low Stock"]),
+        use_container_width=True,
+    )
+
+    low_stock = get_low_stock(limit=LOW_STOCK_LIMIT)
+    if low_stock:
+        names = ", ".join(f"{name} ({stock})" for _, name, stock, _, _ in low_stock)
+        more = overview["low_stock"] - len(low_stock)
+        st.error(f"🚨 Low stock: {names}" + (f" and {more} more" if more > 0 else ""))
+
+
+# Stock movement, served from rollups. New events are folded in by the
+# process-wide rollup thread, so rendering the panel only reads.
+def stock_movement():
+    get_rollup_worker()
+    with st.expander("📈 Stock Movement"):
+        st.caption(f"Rolled up every {ROLLUP_INTERVAL_SECONDS:g}s")
+        window = st.selectbox("Window (days)", [1, 7, 30], index=1)
+        st.dataframe(pd.DataFrame(get_stock_velocity(window, limit=LOW_STOCK_LIMIT)), use_container_width=True)
+        since = (datetime.now() - timedelta(days=window)).strftime("%Y-%m-%d")
+        movement = pd.DataFrame(get_movement(grain="hour", start=since), columns=["Hour", "In", "Out"])
+        if not movement.empty:
+            st.bar_chart(movement.set_index("Hour"))
+
+
+# product_id picked from the first PRODUCT_CHOICES products whose name
+# starts with the search text, or None (shown as `everything`, e.g. "All");
+# returns (product_id, name)
+def product_picker(label, key, container=st, everything=None):
+    search = container.text_input(f"{label} search", key=f"{key}_search", placeholder="Name starts with…")
+    names = dict(search_products(search, limit=PRODUCT_CHOICES))
+    options = ([None] if everything else []) + list(names)
+    product_id = container.selectbox(
+        label, options, key=key, format_func=lambda p: everything if p is None else names[p]
+    )
+    return product_id, names.get(product_id)
+
+
+def manual_stock_update():
+    st.subheader("🛠️ Manual Stock Update")
+    pid, name = product_picker("Select Product", "manual_product")
+
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("➕ Add 1", disabled=pid is None):
+            update_stock(pid, "in")
+            st.success(f"{name} stock increased")
+    with col2:
+        if st.button("➖ Remove 1", disabled=pid is None):
+            update_stock(pid, "out")
+            st.success(f"{name} stock decreased")
+
+
+# Newest page kept current by tailing, older pages by keyset cursor
+def recent_logs():
+    st.subheader("📜 Recent Logs")
+    if "log_cursor" not in st.session_state:
+        st.session_state.log_cursor = None  # None = newest page, kept current by tailing
+        st.session_state.log_tail = []
+
+    if st.session_state.log_cursor is None:
+        # Only rows newer than the last one already shown are fetched
+        tail = st.session_state.log_tail
+        fresh = get_logs_since(tail[0][0], limit=LOG_PAGE_SIZE) if tail else []
+        if tail and len(fresh) < LOG_PAGE_SIZE:
+            tail = (fresh[::-1] + tail)[:LOG_PAGE_SIZE]
+        else:
+            tail = get_logs_page(limit=LOG_PAGE_SIZE)
+        st.session_state.log_tail = logs = tail
+    else:
+        logs = get_logs_page(before_id=st.session_state.log_cursor, limit=LOG_PAGE_SIZE)
+
+    st.dataframe(pd.DataFrame(logs, columns=LOG_COLUMNS))
+
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("⏮ Newest", disabled=st.session_state.log_cursor is None):
+            st.session_state.log_cursor = None
+            st.rerun()
+    with col2:
+        if st.button("⬅ Older", disabled=len(logs) < LOG_PAGE_SIZE):
+            st.session_state.log_cursor = logs[-1][0]
+            st.rerun()
+
+
+# Exports stream from the database in chunks, never the whole table at once
+def export_logs_panel():
+    with st.expander("⬇ Export Logs"):
+        col1, col2, col3 = st.columns(3)
+        date_range = col1.date_input("Date range", value=())
+        export_product, _ = product_picker("Product", "export_product", container=col2, everything="All")
+        export_format = col3.selectbox("Format", list(EXPORTERS))
+        if st.button("⬇ Export Logs"):
+            path = f"logs_export.{export_format}"
+            count = export_logs(
+                path,
+                export_format,
+                start=f"{date_range[0]} 00:00:00" if date_range else None,
+                end=f"{date_range[-1] + timedelta(days=1)} 00:00:00" if date_range else None,
+                product_id=export_product,
+            )
+            st.success(f"Exported {count} rows as {path}")